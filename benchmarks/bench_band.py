@@ -0,0 +1,73 @@
+# benchmarks/bench_band.py
+"""
+整图复制 vs 局部（文字带）合成的对比基准。
+
+    python -m benchmarks.bench_band [--repeat 30] [--font path/to/font.ttf]
+"""
+import argparse
+import os
+import tempfile
+from typing import Dict, List
+
+from core.prebuild import prebuild_character
+from core.renderer import CharacterRenderer, _union_box
+
+from .fixtures import RESOLUTIONS, best_ms, make_character
+
+SAMPLE_TEXT = "今天也要元气满满地聊天哦！" * 3
+
+
+def bench_resolution(label: str, root: str, repeat: int, font: str = "") -> Dict[str, float]:
+    char_id = f"bench_{label}"
+    make_character(root, char_id, RESOLUTIONS[label], font_path=font or None)
+    prebuild_character(char_id, root, os.path.join(root, "cache"))
+
+    full = CharacterRenderer(char_id, root)
+    full.compositing = "full"
+    band = CharacterRenderer(char_id, root)
+    band.compositing = "band"
+
+    base = full._get_base_canvas("1", "1")
+    ops = band.plan.layout(SAMPLE_TEXT, None, band._wrapper)
+    text_area = tuple(band.layout["text_area"])
+    region = band._clamp_box(_union_box(band._ops_bbox(ops), text_area), base.size)  # type: ignore[arg-type]
+    assert region is not None
+    buffer = base.copy()
+
+    def band_copy() -> None:
+        buffer.paste(base.crop(region), (region[0], region[1]))
+
+    bpp = len(base.getbands())
+    full_bytes = base.width * base.height * bpp
+    band_bytes = (region[2] - region[0]) * (region[3] - region[1]) * bpp
+    return {
+        "copy_full_ms": best_ms(base.copy, repeat),
+        "copy_band_ms": best_ms(band_copy, repeat),
+        "alloc_full_mb": full_bytes / 1024 / 1024,
+        "alloc_band_mb": band_bytes / 1024 / 1024,
+        "render_full_ms": best_ms(lambda: full.render(SAMPLE_TEXT, "1", "1"), repeat),
+        "render_band_ms": best_ms(lambda: band.render(SAMPLE_TEXT, "1", "1"), repeat),
+    }
+
+
+def main(argv: List[str] = None) -> None:  # type: ignore[assignment]
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--font", default="", help="用于排版的 TTF 字体（默认使用 Pillow 内置字体）")
+    parser.add_argument("--resolutions", nargs="*", default=["1080p", "1440p", "4k"])
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"{'分辨率':<8}{'整图复制':>10}{'局部复制':>10}{'整图分配':>10}{'局部分配':>10}{'render整图':>12}{'render局部':>12}")
+        for label in args.resolutions:
+            r = bench_resolution(label, root, args.repeat, args.font)
+            print(
+                f"{label:<10}"
+                f"{r['copy_full_ms']:>9.2f}ms{r['copy_band_ms']:>9.2f}ms"
+                f"{r['alloc_full_mb']:>9.1f}MB{r['alloc_band_mb']:>9.1f}MB"
+                f"{r['render_full_ms']:>11.2f}ms{r['render_band_ms']:>11.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_composite.py
+"""
+Image.paste 与 numpy 预乘合成（benchmarks/compositing.py）的对比基准。
+
+    python -m benchmarks.bench_composite [--repeat 5] [--portraits 4] [--backgrounds 8]
+
+"预构建" 列为合成 portraits × backgrounds 张底图（不含编码与写盘）的总耗时，
+"单张" 列为实时渲染路径合成一张底图的耗时。
+"""
+import argparse
+import os
+import tempfile
+from typing import Dict, List
+
+from PIL import Image
+
+from .compositing import LayerCompositor, numpy_available
+from .fixtures import RESOLUTIONS, best_ms, make_character
+
+
+def _load(folder: str, mode: str = "RGBA") -> List[Image.Image]:
+    names = sorted(os.listdir(folder))
+    return [Image.open(os.path.join(folder, name)).convert(mode) for name in names]
+
+
+def bench_resolution(label: str, root: str, repeat: int, portraits: int, backgrounds: int) -> Dict[str, float]:
+    char_id = f"bench_{label}"
+    canvas_size = RESOLUTIONS[label]
+    make_character(root, char_id, canvas_size, portraits=portraits, backgrounds=backgrounds)
+    char_root = os.path.join(root, "characters", char_id)
+
+    portrait_imgs = _load(os.path.join(char_root, "portrait"))
+    bg_imgs = _load(os.path.join(char_root, "background"))
+    box = Image.open(os.path.join(char_root, "textbox_bg.png")).convert("RGBA")
+    # 与 fixtures 的布局一致：立绘位于 stand_pos，对话框贴底
+    stand_pos = (int(454 * canvas_size[0] / 1280), int(114 * canvas_size[1] / 720))
+    box_pos = (0, canvas_size[1] - box.height)
+
+    def prebuild(backend: str) -> None:
+        for portrait in portrait_imgs:
+            compositor = LayerCompositor([(portrait, stand_pos), (box, box_pos)], canvas_size, backend)
+            for _ in compositor.composite_many(bg_imgs):
+                pass
+
+    def single(backend: str) -> None:
+        compositor = LayerCompositor([(portrait_imgs[0], stand_pos), (box, box_pos)], canvas_size, backend)
+        compositor.composite(bg_imgs[0])
+
+    return {
+        "prebuild_paste_ms": best_ms(lambda: prebuild("paste"), repeat),
+        "prebuild_numpy_ms": best_ms(lambda: prebuild("numpy"), repeat),
+        "single_paste_ms": best_ms(lambda: single("paste"), repeat),
+        "single_numpy_ms": best_ms(lambda: single("numpy"), repeat),
+    }
+
+
+def main(argv: List[str] = None) -> None:  # type: ignore[assignment]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--portraits", type=int, default=4)
+    parser.add_argument("--backgrounds", type=int, default=8)
+    parser.add_argument("--resolutions", nargs="*", default=["720p", "1080p", "1440p", "4k"])
+    args = parser.parse_args(argv)
+
+    if not numpy_available():
+        print("❌ 未安装 numpy，无法对比")
+        return
+
+    combos = args.portraits * args.backgrounds
+    print(f"🧪 每个分辨率合成 {args.portraits} 张立绘 × {args.backgrounds} 张背景 = {combos} 张底图")
+    with tempfile.TemporaryDirectory() as root:
+        print(f"{'分辨率':<8}{'预构建paste':>13}{'预构建numpy':>13}{'加速':>8}{'单张paste':>12}{'单张numpy':>12}{'加速':>8}")
+        for label in args.resolutions:
+            r = bench_resolution(label, root, args.repeat, args.portraits, args.backgrounds)
+            print(
+                f"{label:<10}"
+                f"{r['prebuild_paste_ms']:>12.1f}ms{r['prebuild_numpy_ms']:>12.1f}ms"
+                f"{r['prebuild_paste_ms'] / r['prebuild_numpy_ms']:>9.2f}x"
+                f"{r['single_paste_ms']:>10.2f}ms{r['single_numpy_ms']:>10.2f}ms"
+                f"{r['single_paste_ms'] / r['single_numpy_ms']:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
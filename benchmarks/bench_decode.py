@@ -0,0 +1,100 @@
+# benchmarks/bench_decode.py
+"""
+缓存底图解码方式的对比基准：整张解码并转为 RGBA（旧方式）与
+core.renderer._decode_image（保持 RGB，缩小输出时用 JPEG DCT 缩放解码）。
+
+    python -m benchmarks.bench_decode [--repeat 10] [--resolutions 1440p 4k] [--quality 90]
+
+"内存" 为 RenderMemo / 底图缓存按 render_cache.image_nbytes 计入的字节数，
+"压缩" 为 canvas_cache_compress 开启时缓存实际保存的字节数。
+"""
+import argparse
+import os
+import tempfile
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from core.render_cache import image_nbytes
+from core.renderer import _decode_image
+
+from .fixtures import RESOLUTIONS, best_ms, make_character
+
+# 输出尺寸的目标宽度（与默认 output_profiles 一致），None 为原始尺寸
+TARGET_WIDTHS: Tuple[Optional[int], ...] = (None, 1600, 1280)
+
+
+def _legacy_decode(path: str, size: Optional[Tuple[int, int]]) -> Image.Image:
+    img = Image.open(path).convert("RGBA")
+    if size and img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    return img
+
+
+def _compressed_bytes(img: Image.Image) -> int:
+    return len(zlib.compress(img.tobytes(), 1))
+
+
+def make_base(root: str, label: str, quality: int) -> str:
+    """Composite one portrait over one background and save it like a prebuilt JPEG base."""
+    canvas_size = RESOLUTIONS[label]
+    char_id = f"bench_{label}"
+    make_character(root, char_id, canvas_size, portraits=1, backgrounds=1)
+    char_root = os.path.join(root, "characters", char_id)
+    bg_dir = os.path.join(char_root, "background")
+    canvas = Image.open(os.path.join(bg_dir, sorted(os.listdir(bg_dir))[0])).convert("RGBA")
+    portrait_dir = os.path.join(char_root, "portrait")
+    portrait = Image.open(os.path.join(portrait_dir, sorted(os.listdir(portrait_dir))[0])).convert("RGBA")
+    canvas.paste(portrait, (canvas_size[0] // 3, canvas_size[1] // 10), portrait)
+    path = os.path.join(root, f"{char_id}.jpg")
+    canvas.convert("RGB").save(path, "JPEG", quality=quality)
+    return path
+
+
+def bench_base(path: str, size: Optional[Tuple[int, int]], repeat: int) -> Dict[str, float]:
+    legacy = _legacy_decode(path, size)
+    fast = _decode_image(path, size)
+    return {
+        "legacy_ms": best_ms(lambda: _legacy_decode(path, size), repeat),
+        "fast_ms": best_ms(lambda: _decode_image(path, size), repeat),
+        "legacy_bytes": image_nbytes(legacy),
+        "fast_bytes": image_nbytes(fast),
+        "legacy_packed": _compressed_bytes(legacy),
+        "fast_packed": _compressed_bytes(fast),
+    }
+
+
+def main(argv: List[str] = None) -> None:  # type: ignore[assignment]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--resolutions", nargs="*", default=["1440p", "4k"], choices=list(RESOLUTIONS))
+    parser.add_argument("--quality", type=int, default=90)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        print(
+            f"{'底图':<8}{'输出':>11}{'旧解码':>10}{'新解码':>10}{'节省':>7}"
+            f"{'旧内存':>10}{'新内存':>10}{'节省':>7}{'旧压缩':>10}{'新压缩':>10}{'节省':>7}"
+        )
+        for label in args.resolutions:
+            path = make_base(root, label, args.quality)
+            canvas_w, canvas_h = RESOLUTIONS[label]
+            for width in TARGET_WIDTHS:
+                if width is not None and width >= canvas_w:
+                    continue
+                size = (width, round(canvas_h * width / canvas_w)) if width else None
+                r = bench_base(path, size, max(1, args.repeat))
+                shown = f"{size[0]}x{size[1]}" if size else "原始"
+                print(
+                    f"{label:<10}{shown:>11}"
+                    f"{r['legacy_ms']:>10.1f}{r['fast_ms']:>10.1f}{1 - r['fast_ms'] / r['legacy_ms']:>8.0%}"
+                    f"{r['legacy_bytes'] / 2**20:>9.1f}M{r['fast_bytes'] / 2**20:>9.1f}M"
+                    f"{1 - r['fast_bytes'] / r['legacy_bytes']:>8.0%}"
+                    f"{r['legacy_packed'] / 2**20:>9.1f}M{r['fast_packed'] / 2**20:>9.1f}M"
+                    f"{1 - r['fast_packed'] / r['legacy_packed']:>8.0%}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_layered.py
+"""
+整张底图缓存（cache_mode: prebuild，N × M 张）与分层缓存（cache_mode: layered，
+每张背景、每张立绘各一个图层，N + M 个文件）的对比基准。
+
+    python -m benchmarks.bench_layered [--repeat 10] [--resolutions 1080p 1440p 4k]
+        [--portraits 4] [--backgrounds 4]
+
+"未命中" 为内存画布缓存未命中时一条消息的渲染耗时（整张：解码底图；分层：解码背景
+并混合立绘 / 对话框，立绘贴图已在内存），"首次表情" 另外清空立绘贴图缓存，
+"命中" 为画布缓存命中时的耗时（两种方式相同）。
+"预构建" 包含背景缩放结果（assets/pre_scaled）的写入，两种方式都从空目录开始计时。
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+from core.prebuild import LAYER_DIR, prebuild_character
+from core.renderer import CharacterRenderer
+
+from .fixtures import RESOLUTIONS, best_ms, make_character
+
+TEXT = "今天也要元气满满地聊天哦！Let's go～"
+
+
+def _disk_usage(cache_dir: str, layered: bool) -> Dict[str, float]:
+    folder = os.path.join(cache_dir, LAYER_DIR) if layered else cache_dir
+    files = [
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if (layered or f.startswith("p_")) and os.path.isfile(os.path.join(folder, f))
+    ]
+    return {"files": len(files), "mb": sum(os.path.getsize(f) for f in files) / 2**20}
+
+
+def _bench_renderer(renderer: CharacterRenderer, repeat: int, layered: bool) -> Dict[str, float]:
+    def miss() -> None:
+        renderer._canvas_cache.clear()
+        renderer.render(TEXT, "1", "1")
+
+    def first_use() -> None:
+        renderer._canvas_cache.clear()
+        renderer._layer_sprites.clear()
+        renderer.render(TEXT, "1", "1")
+
+    results = {"miss_ms": best_ms(miss, repeat)}
+    results["first_ms"] = best_ms(first_use, repeat) if layered else results["miss_ms"]
+    renderer.render(TEXT, "1", "1")
+    results["hit_ms"] = best_ms(lambda: renderer.render(TEXT, "1", "1"), repeat)
+    return results
+
+
+def bench_case(root: str, label: str, portraits: int, backgrounds: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    char_id = f"bench_{label}"
+    make_character(root, char_id, RESOLUTIONS[label], portraits=portraits, backgrounds=backgrounds)
+    cache_path = os.path.join(root, "cache")
+    cache_dir = os.path.join(cache_path, char_id)
+    results: Dict[str, Dict[str, float]] = {}
+    for mode in ("prebuild", "layered"):
+        # 缩放后的背景只在首次预构建时写入，清掉后两种方式都按冷启动计时
+        shutil.rmtree(os.path.join(root, "pre_scaled", "characters", char_id), ignore_errors=True)
+        start = time.perf_counter()
+        prebuild_character(char_id, root, cache_path, force=True, jobs=1, cache_mode=mode)
+        case = {"prebuild_s": time.perf_counter() - start}
+        case.update(_disk_usage(cache_dir, mode == "layered"))
+        renderer = CharacterRenderer(char_id, root, output_profile="")
+        renderer.cache_mode = mode
+        case.update(_bench_renderer(renderer, repeat, mode == "layered"))
+        results[mode] = case
+    return results
+
+
+def main(argv: List[str] = None) -> None:  # type: ignore[assignment]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--resolutions", nargs="*", default=["1080p", "1440p", "4k"], choices=list(RESOLUTIONS))
+    parser.add_argument("--portraits", type=int, default=4)
+    parser.add_argument("--backgrounds", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as root:
+        for label in args.resolutions:
+            print(f"⏱️ 测量 {label} ...", flush=True)
+            rows.append((label, bench_case(root, label, max(1, args.portraits), max(1, args.backgrounds), max(1, args.repeat))))
+
+    print(
+        f"{'画布':<8}{'缓存':<10}{'文件':>6}{'磁盘':>10}{'预构建':>9}"
+        f"{'未命中':>9}{'首次表情':>9}{'命中':>9}{'未命中差值':>9}"
+    )
+    for label, results in rows:
+        flat_miss = results["prebuild"]["miss_ms"]
+        for mode, r in results.items():
+            delta = f"{r['miss_ms'] - flat_miss:>+10.1f}ms" if mode == "layered" else ""
+            print(
+                f"{label:<10}{mode:<10}{r['files']:>8.0f}{r['mb']:>11.1f}M{r['prebuild_s']:>10.1f}s"
+                f"{r['miss_ms']:>10.1f}ms{r['first_ms']:>9.1f}ms{r['hit_ms']:>9.1f}ms{delta}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# benchmarks/compositing.py
+"""
+numpy 预乘合成的实验实现，仅供 bench_composite.py 与 Image.paste 对比。
+实测 paste（Pillow 只处理图层区域的 C 循环）快 4~6 倍，所以渲染器与预构建都直接用 paste。
+"""
+
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 为可选依赖
+    np = None  # type: ignore[assignment]
+
+COMPOSITE_BACKENDS = ("paste", "numpy")
+# numpy 批量合成时，每批背景区域数据的上限（字节）
+BATCH_BYTES = 64 * 1024 * 1024
+
+Box = Tuple[int, int, int, int]
+# (RGBA 图层, 画布坐标)，按绘制顺序排列
+Placement = Tuple[Image.Image, Tuple[int, int]]
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def resolve_backend(name: Optional[str]) -> str:
+    """Map a composite_backend setting to an available backend."""
+    name = str(name or "paste").lower()
+    if name not in COMPOSITE_BACKENDS:
+        print(f"⚠️ 未知的合成方式 {name}，使用 paste")
+        return "paste"
+    if name == "numpy" and np is None:
+        print("⚠️ 未安装 numpy，合成回退到 paste")
+        return "paste"
+    return name
+
+
+def _union(a: Optional[Box], b: Optional[Box]) -> Optional[Box]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+class PremultipliedLayer:
+    """
+    An RGBA layer trimmed to its alpha bounds and clipped to the canvas, stored as
+    ``color * alpha`` and ``255 - alpha`` (uint16). Blending it is then
+    ``DIV255(dst * inverse + premultiplied)``, the exact formula of Image.paste
+    with an RGBA mask, for every channel including alpha.
+    """
+
+    def __init__(self, image: Image.Image, pos: Tuple[int, int], canvas_size: Tuple[int, int]):
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        self.box: Optional[Box] = None
+        alpha_box = image.getchannel("A").getbbox()
+        if alpha_box is None:
+            return
+        x, y = int(pos[0]), int(pos[1])
+        x1 = max(0, x + alpha_box[0])
+        y1 = max(0, y + alpha_box[1])
+        x2 = min(canvas_size[0], x + alpha_box[2])
+        y2 = min(canvas_size[1], y + alpha_box[3])
+        if x2 <= x1 or y2 <= y1:
+            return
+        self.box = (x1, y1, x2, y2)
+        pixels = np.asarray(image.crop((x1 - x, y1 - y, x2 - x, y2 - y)), dtype=np.uint16)
+        alpha = pixels[..., 3:4]
+        self.premultiplied = pixels * alpha
+        self.inverse = 255 - alpha
+
+    def blend_into(self, region: "np.ndarray", origin: Tuple[int, int]) -> None:
+        """Blend into region (..., H, W, 4 uint8) whose top-left is origin in canvas coordinates."""
+        if self.box is None:
+            return
+        x1, y1, x2, y2 = self.box
+        ox, oy = origin
+        target = region[..., y1 - oy:y2 - oy, x1 - ox:x2 - ox, :]
+        # 与 Pillow 的 BLEND 宏一致：DIV255(a) = ((a + 128) >> 8 + (a + 128)) >> 8，全程不超出 uint16
+        mixed = target.astype(np.uint16)
+        mixed *= self.inverse
+        mixed += self.premultiplied
+        mixed += 128
+        mixed += mixed >> 8
+        mixed >>= 8
+        target[...] = mixed
+
+
+class LayerCompositor:
+    """
+    Composites a fixed stack of layers (portrait, dialog box...) over backgrounds.
+    The numpy backend premultiplies and trims the layers once and blends only their
+    bounding region, for many backgrounds at a time; the paste backend replays the
+    original Image.paste calls. Both give identical pixels.
+    """
+
+    def __init__(
+        self,
+        placements: Sequence[Placement],
+        canvas_size: Tuple[int, int],
+        backend: str = "paste",
+    ):
+        self.canvas_size = canvas_size
+        self.backend = resolve_backend(backend)
+        self.placements = list(placements)
+        self.layers: List[PremultipliedLayer] = []
+        self.region: Optional[Box] = None
+        if self.backend == "numpy":
+            self.layers = [PremultipliedLayer(img, pos, canvas_size) for img, pos in self.placements]
+            for layer in self.layers:
+                self.region = _union(self.region, layer.box)
+
+    def _normalize(self, background: Optional[Image.Image]) -> Image.Image:
+        """Background as an RGBA canvas-sized image, laid out like Image.new + paste."""
+        if background is not None and background.mode == "RGBA" and background.size == self.canvas_size:
+            return background
+        canvas = Image.new("RGBA", self.canvas_size, (0, 0, 0, 0))
+        if background is not None:
+            canvas.paste(background, (0, 0))
+        return canvas
+
+    def composite(self, background: Optional[Image.Image]) -> Image.Image:
+        return next(self.composite_many([background]))
+
+    def composite_many(self, backgrounds: Sequence[Optional[Image.Image]]) -> Iterator[Image.Image]:
+        """Yield one composited canvas per background, in order."""
+        if self.backend == "paste":
+            for background in backgrounds:
+                canvas = self._normalize(background).copy()
+                for img, pos in self.placements:
+                    canvas.paste(img, pos, img)
+                yield canvas
+            return
+
+        region = self.region
+        if region is None:
+            for background in backgrounds:
+                yield self._normalize(background).copy()
+            return
+
+        x1, y1, x2, y2 = region
+        per_item = (x2 - x1) * (y2 - y1) * 4
+        batch = max(1, BATCH_BYTES // max(1, per_item))
+        for start in range(0, len(backgrounds), batch):
+            chunk = [self._normalize(bg) for bg in backgrounds[start:start + batch]]
+            # 只取图层覆盖的区域堆叠成 (B, H, W, 4)，整批一次混合
+            stack = np.stack([np.asarray(bg.crop(region)) for bg in chunk])
+            for layer in self.layers:
+                layer.blend_into(stack, (x1, y1))
+            for bg, pixels in zip(chunk, stack):
+                canvas = bg.copy()
+                canvas.paste(Image.fromarray(pixels, "RGBA"), (x1, y1))
+                yield canvas
@@ -0,0 +1,156 @@
+# benchmarks/fixtures.py
+"""合成角色素材，供性能基准使用（不依赖仓库内的真实角色）"""
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from core.utils import dump_yaml_inline
+
+# 以 1280x720 为基准的布局，生成时按分辨率等比缩放
+_REFERENCE_SIZE = (1280, 720)
+_REFERENCE_LAYOUT: Dict[str, Any] = {
+    "stand_scale": 1.0,
+    "stand_on_top": False,
+    "text_area": [239, 591, 1079, 716],
+    "name_pos": [344, 544],
+    "stand_pos": [454, 114],
+    "enable_crop": False,
+    "crop_area": [3, 513, 1280, 717],
+}
+
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+}
+
+
+def _scaled(value: Any, sx: float, sy: float) -> Any:
+    if isinstance(value, list) and len(value) == 2:
+        return [int(round(value[0] * sx)), int(round(value[1] * sy))]
+    if isinstance(value, list) and len(value) == 4:
+        return [
+            int(round(value[0] * sx)),
+            int(round(value[1] * sy)),
+            int(round(value[2] * sx)),
+            int(round(value[3] * sy)),
+        ]
+    return value
+
+
+def _noise_background(size: Tuple[int, int], seed: int) -> Image.Image:
+    """Gradient plus coarse noise, so JPEG/PNG sizes resemble real artwork."""
+    rng = random.Random(seed)
+    small = Image.new("RGB", (64, 36))
+    small.putdata([
+        (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        for _ in range(64 * 36)
+    ])
+    return small.resize(size, Image.Resampling.BICUBIC)
+
+
+def _portrait(size: Tuple[int, int], seed: int) -> Image.Image:
+    rng = random.Random(seed)
+    w, h = size
+    img = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    color = (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+    draw.ellipse((w * 0.25, 0, w * 0.75, h * 0.35), fill=color)
+    draw.rounded_rectangle((w * 0.1, h * 0.3, w * 0.9, h), radius=w // 8, fill=color)
+    return img
+
+
+def make_character(
+    root: str,
+    char_id: str,
+    canvas_size: Tuple[int, int],
+    portraits: int = 1,
+    backgrounds: int = 1,
+    name_mode: str = "basic",
+    font_path: Optional[str] = None,
+    crop: bool = False,
+) -> str:
+    """
+    Create ``<root>/characters/<char_id>`` with synthetic portraits, backgrounds,
+    dialog box and config.yaml. Returns the assets root (pass it as base_path).
+    """
+    char_root = os.path.join(root, "characters", char_id)
+    os.makedirs(os.path.join(char_root, "portrait"), exist_ok=True)
+    os.makedirs(os.path.join(char_root, "background"), exist_ok=True)
+
+    canvas_w, canvas_h = canvas_size
+    sx = canvas_w / _REFERENCE_SIZE[0]
+    sy = canvas_h / _REFERENCE_SIZE[1]
+
+    for idx in range(1, backgrounds + 1):
+        path = os.path.join(char_root, "background", f"{idx}.png")
+        if not os.path.exists(path):
+            _noise_background(canvas_size, idx).save(path, compress_level=1)
+    portrait_size = (int(canvas_w * 0.3), int(canvas_h * 0.85))
+    for idx in range(1, portraits + 1):
+        path = os.path.join(char_root, "portrait", f"{idx}.png")
+        if not os.path.exists(path):
+            _portrait(portrait_size, idx).save(path, compress_level=1)
+
+    box_path = os.path.join(char_root, "textbox_bg.png")
+    if not os.path.exists(box_path):
+        box = Image.new("RGBA", (canvas_w, int(canvas_h * 0.3)), (20, 20, 40, 200))
+        box.save(box_path, compress_level=1)
+
+    if font_path:
+        fonts_dir = os.path.join(root, "common", "fonts")
+        os.makedirs(fonts_dir, exist_ok=True)
+        target = os.path.join(fonts_dir, "LXGWWenKai-Medium.ttf")
+        if not os.path.exists(target):
+            with open(font_path, "rb") as src, open(target, "wb") as dst:
+                dst.write(src.read())
+
+    layout = {key: _scaled(value, sx, sy) for key, value in _REFERENCE_LAYOUT.items()}
+    layout["_canvas_size"] = [canvas_w, canvas_h]
+    layout["box_pos"] = [0, canvas_h - int(canvas_h * 0.3)]
+    layout["enable_crop"] = crop
+    font_size = max(12, int(39 * sy))
+    name_size = max(10, int(29 * sy))
+    style: Dict[str, Any] = {
+        "mode": name_mode,
+        "text_wrapper": {"type": "preset", "preset": "corner_double"},
+        "basic": {
+            "font_size": font_size,
+            "text_color": [255, 255, 255],
+            "name_font_size": name_size,
+            "name_color": [255, 0, 255],
+        },
+    }
+    if name_mode == "advanced":
+        style["advanced"] = {
+            "name_layers": {
+                "default": [
+                    {"text": "{name}", "position": [0, 0], "font_color": [255, 0, 125], "font_size": int(name_size * 1.5)},
+                    {"text": "★", "position": [-int(30 * sx), -int(15 * sy)], "font_color": [255, 255, 255], "font_size": name_size},
+                ]
+            }
+        }
+    config = {
+        "meta": {"name": "Bench"},
+        "style": style,
+        "layout": layout,
+        "assets": {"dialog_box": "textbox_bg.png"},
+    }
+    with open(os.path.join(char_root, "config.yaml"), "w", encoding="utf-8") as f:
+        dump_yaml_inline(config, f)
+    return root
+
+
+def best_ms(fn: Callable[[], object], repeat: int) -> float:
+    """Best of repeat timed calls of fn in milliseconds, after one warm-up call."""
+    fn()  # 预热
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
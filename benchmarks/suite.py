@@ -0,0 +1,262 @@
+# benchmarks/suite.py
+"""
+渲染器基准套件：在合成角色（N 张立绘 × M 张背景，720p ~ 4K，basic / advanced 名字模式）上测量
+冷启动、缓存命中渲染、实时合成、不同长度文本的断行与剪贴板编码，结果保存为 JSON 基线。
+
+    python -m benchmarks.suite run [-o results.json] [--baseline baseline.json]
+        [--resolutions 720p 1080p 1440p 4k] [--modes basic advanced]
+        [--portraits 3] [--backgrounds 3] [--repeat 20] [--font path/to/font.ttf]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.15]
+
+compare（以及 run --baseline）发现任一指标变慢超过阈值时以退出码 1 结束，可直接用于 CI。
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import PIL
+from PIL import Image
+
+from core.prebuild import prebuild_character
+from core.renderer import CharacterRenderer, _encode_image
+
+from .fixtures import RESOLUTIONS, best_ms, make_character
+
+try:
+    from core.clipboard import image_to_dib
+except ImportError:  # 非 Windows 环境没有 win32clipboard，按同样的 BMP 编码计时
+    def image_to_dib(image: Image.Image) -> bytes:
+        return _encode_image(image if image.mode == "RGB" else image.convert("RGB"), "BMP")[14:]
+
+SUITE_VERSION = 1
+NAME_MODES = ("basic", "advanced")
+WRAP_LENGTHS = (10, 50, 200, 1000)
+SAMPLE_SENTENCE = "今天也要元气满满地聊天哦！Let's go, 一起出发吧～"
+DEFAULT_THRESHOLD = 0.15
+# 小于该差值（毫秒）的变化视为计时噪声，不判定为退化
+DEFAULT_MIN_DELTA_MS = 0.05
+
+Results = Dict[str, Dict[str, float]]
+
+
+def sample_text(length: int) -> str:
+    return (SAMPLE_SENTENCE * (length // len(SAMPLE_SENTENCE) + 1))[:length]
+
+
+def bench_case(
+    root: str,
+    label: str,
+    mode: str,
+    portraits: int,
+    backgrounds: int,
+    repeat: int,
+    font: Optional[str] = None,
+) -> Dict[str, float]:
+    """Measure one resolution × name mode; every value is the best of repeat runs in ms."""
+    char_id = f"bench_{label}_{mode}"
+    make_character(
+        root, char_id, RESOLUTIONS[label],
+        portraits=portraits, backgrounds=backgrounds, name_mode=mode, font_path=font,
+    )
+    cache_path = os.path.join(root, "cache")
+    start = time.perf_counter()
+    prebuild_character(char_id, root, cache_path, force=True)
+    results: Dict[str, float] = {"prebuild_ms": (time.perf_counter() - start) * 1000}
+
+    text = sample_text(50)
+
+    def cold_start() -> None:
+        # 新建渲染器：读取配置、索引素材、编译样式，并从磁盘解码第一张底图
+        CharacterRenderer(char_id, root).render(text, "1", "1")
+
+    results["cold_start_ms"] = best_ms(cold_start, max(1, min(repeat, 5)))
+
+    renderer = CharacterRenderer(char_id, root)
+    renderer.render(text, "1", "1")
+    results["cache_hit_ms"] = best_ms(lambda: renderer.render(text, "1", "1"), repeat)
+    results["realtime_ms"] = best_ms(lambda: renderer._realtime_render("1", "1"), max(1, min(repeat, 5)))
+
+    plan = renderer.plan
+    wrapper = renderer._wrapper
+    for length in WRAP_LENGTHS:
+        body = f"{plan.prefix}{sample_text(length)}{plan.suffix}"
+
+        def wrap(body: str = body) -> None:
+            # 清掉结果缓存，只保留字宽缓存，测的是一次真正的断行
+            wrapper._results.clear()
+            wrapper.wrap(body, plan.text_font, plan.max_width)
+
+        results[f"wrap_{length}_ms"] = best_ms(wrap, repeat)
+
+    image = renderer.render(text, "1", "1")
+    results["clipboard_encode_ms"] = best_ms(lambda: image_to_dib(image), max(1, min(repeat, 10)))
+    return results
+
+
+def run_suite(
+    resolutions: List[str],
+    modes: List[str],
+    portraits: int,
+    backgrounds: int,
+    repeat: int,
+    font: Optional[str] = None,
+) -> Dict[str, Any]:
+    results: Results = {}
+    with tempfile.TemporaryDirectory() as root:
+        for label in resolutions:
+            for mode in modes:
+                case = f"{label}/{mode}"
+                print(f"⏱️ 测量 {case} ...", flush=True)
+                results[case] = bench_case(root, label, mode, portraits, backgrounds, repeat, font)
+    return {
+        "suite_version": SUITE_VERSION,
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "params": {
+            "portraits": portraits,
+            "backgrounds": backgrounds,
+            "repeat": repeat,
+            "font": os.path.basename(font) if font else None,
+        },
+        "results": results,
+    }
+
+
+def print_results(data: Dict[str, Any]) -> None:
+    results: Results = data["results"]
+    metrics = sorted({metric for values in results.values() for metric in values}, key=_metric_order)
+    width = max(len(case) for case in results) + 2
+    columns = [max(10, len(m) - 1) for m in metrics]
+    print(f"{'用例（ms）':<{width - 4}}" + "".join(f"{m[:-3]:>{c}}" for m, c in zip(metrics, columns)))
+    for case, values in results.items():
+        print(f"{case:<{width}}" + "".join(f"{values.get(m, float('nan')):>{c}.2f}" for m, c in zip(metrics, columns)))
+
+
+def _metric_order(metric: str) -> Tuple[int, int, str]:
+    order = ["prebuild_ms", "cold_start_ms", "cache_hit_ms", "realtime_ms", "wrap", "clipboard_encode_ms"]
+    for index, prefix in enumerate(order):
+        if metric.startswith(prefix):
+            digits = "".join(ch for ch in metric if ch.isdigit())
+            return index, int(digits or 0), metric
+    return len(order), 0, metric
+
+
+def compare(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+) -> List[Tuple[str, str, float, float, str]]:
+    """
+    Compare two result files metric by metric.
+    Returns (case, metric, baseline ms, current ms, status) where status is
+    "regression", "improvement" or "ok"; metrics missing on either side are skipped.
+    """
+    rows = []
+    for case, base_values in baseline.get("results", {}).items():
+        cur_values = current.get("results", {}).get(case)
+        if not cur_values:
+            continue
+        for metric in sorted(base_values, key=_metric_order):
+            if metric not in cur_values:
+                continue
+            base, cur = float(base_values[metric]), float(cur_values[metric])
+            status = "ok"
+            if abs(cur - base) >= min_delta_ms and base > 0:
+                if cur > base * (1 + threshold):
+                    status = "regression"
+                elif cur < base * (1 - threshold):
+                    status = "improvement"
+            rows.append((case, metric, base, cur, status))
+    return rows
+
+
+def report_comparison(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+) -> int:
+    """Print the comparison table; returns the number of regressions."""
+    if baseline.get("environment") != current.get("environment"):
+        print("⚠️ 基线与本次结果的运行环境不同，对比仅供参考")
+    if baseline.get("params") != current.get("params"):
+        print("⚠️ 基线与本次结果的测量参数不同，对比仅供参考")
+
+    rows = compare(baseline, current, threshold, min_delta_ms)
+    marks = {"regression": "❌ 退化", "improvement": "✅ 提升", "ok": ""}
+    print(f"{'用例':<16}{'指标':<22}{'基线':>10}{'本次':>10}{'变化':>9}")
+    for case, metric, base, cur, status in rows:
+        change = (cur / base - 1) * 100 if base > 0 else 0.0
+        print(f"{case:<18}{metric:<24}{base:>10.2f}{cur:>10.2f}{change:>+8.1f}%  {marks[status]}")
+
+    regressions = sum(1 for row in rows if row[4] == "regression")
+    if regressions:
+        print(f"❌ {regressions} 项指标变慢超过 {threshold:.0%}")
+    else:
+        print(f"✅ 没有变慢超过 {threshold:.0%} 的指标（共 {len(rows)} 项）")
+    return regressions
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="生成合成角色并测量，结果可保存为 JSON")
+    run.add_argument("-o", "--output", default=None, help="结果 JSON 的保存路径")
+    run.add_argument("--baseline", default=None, help="测量完成后与该基线对比")
+    run.add_argument("--resolutions", nargs="*", default=list(RESOLUTIONS), choices=list(RESOLUTIONS))
+    run.add_argument("--modes", nargs="*", default=list(NAME_MODES), choices=list(NAME_MODES))
+    run.add_argument("--portraits", type=int, default=3)
+    run.add_argument("--backgrounds", type=int, default=3)
+    run.add_argument("--repeat", type=int, default=20)
+    run.add_argument("--font", default=None, help="用于排版的 TTF 字体（默认使用 Pillow 内置字体）")
+
+    cmp = sub.add_parser("compare", help="对比两份结果，变慢超过阈值时退出码为 1")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+
+    for p in (run, cmp):
+        p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定退化的相对阈值（0.15 = 15%%）")
+        p.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA_MS, help="忽略小于该毫秒数的变化")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        regressions = report_comparison(_load(args.baseline), _load(args.current), args.threshold, args.min_delta)
+        return 1 if regressions else 0
+
+    data = run_suite(
+        args.resolutions, args.modes, max(1, args.portraits), max(1, args.backgrounds),
+        max(1, args.repeat), args.font,
+    )
+    print_results(data)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"💾 结果已保存到 {args.output}")
+    if args.baseline:
+        return 1 if report_comparison(_load(args.baseline), data, args.threshold, args.min_delta) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# core/assets.py
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from PIL import Image
+
+ImageLoader = Callable[[str], Image.Image]
+
+
+class LazyImageStore:
+    """
+    Mapping-like store of images that are listed up front but decoded on first use.
+    Decoded images are kept in an LRU of ``max_decoded`` entries; pinned keys are
+    never evicted.
+    """
+
+    def __init__(self, loader: ImageLoader, max_decoded: int = 8):
+        self._loader = loader
+        self.max_decoded = max(1, int(max_decoded))
+        self._paths: Dict[str, str] = {}
+        self._decoded: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self._pinned: Set[str] = set()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def add(self, key: str, path: str) -> None:
+        """Register a file; the first registration of a key wins."""
+        self._paths.setdefault(key, path)
+
+    def path(self, key: str) -> Optional[str]:
+        return self._paths.get(key)
+
+    def keys(self) -> List[str]:
+        return list(self._paths.keys())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._paths
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._paths.keys()))
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __getitem__(self, key: str) -> Image.Image:
+        img = self.get(key)
+        if img is None:
+            raise KeyError(key)
+        return img
+
+    def get(self, key: Optional[str], default: Optional[Image.Image] = None) -> Optional[Image.Image]:
+        if key is None or key not in self._paths:
+            return default
+        with self._lock:
+            img = self._decoded.get(key)
+            if img is not None:
+                self._decoded.move_to_end(key)
+                return img
+        img = self._loader(self._paths[key])
+        with self._lock:
+            self._decoded[key] = img
+            self._decoded.move_to_end(key)
+            self.loads += 1
+            self._evict()
+        return img
+
+    def pin(self, key: str) -> None:
+        """Keep key decoded regardless of the LRU limit (e.g. the current expression)."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def pinned(self) -> List[str]:
+        return list(self._pinned)
+
+    def clear_decoded(self) -> None:
+        """Drop every decoded image (e.g. after the target size changed); pins are kept."""
+        with self._lock:
+            self._decoded.clear()
+
+    def is_decoded(self, key: str) -> bool:
+        return key in self._decoded
+
+    def _evict(self) -> None:
+        for key in list(self._decoded.keys()):
+            if len(self._decoded) <= self.max_decoded:
+                break
+            if key in self._pinned:
+                continue
+            del self._decoded[key]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self._paths),
+            "decoded": len(self._decoded),
+            "pinned": len(self._pinned),
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,203 @@
+# core/async_renderer.py
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from .batch import OUTPUT_FORMATS
+from .prebuild import ensure_character_cache
+from .renderer import CharacterRenderer, _encode_image
+
+# (类型, 文本, 立绘, 背景, 说话人, 格式)
+RequestKey = Tuple[str, str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+class _Pending:
+    """One in-flight render shared by every coroutine that asked for the same key."""
+
+    def __init__(self, future: "asyncio.Future[Any]", cancelled: threading.Event):
+        self.future = future
+        self.cancelled = cancelled
+        self.waiters = 0
+
+
+# -----------------------
+# 进程模式下的工作进程
+# -----------------------
+_PROCESS_RENDERER: Optional[CharacterRenderer] = None
+
+
+def _init_process(char_id: str, base_path: str) -> None:
+    global _PROCESS_RENDERER
+    _PROCESS_RENDERER = CharacterRenderer(char_id, base_path)
+
+
+def _process_job(kind: str, text: str, portrait: Optional[str], bg: Optional[str],
+                 speaker: Optional[str], fmt: Optional[str]) -> Any:
+    assert _PROCESS_RENDERER is not None
+    image = _PROCESS_RENDERER.render(text, portrait, bg, speaker)
+    if kind == "bytes":
+        pil_format, _, options = OUTPUT_FORMATS[fmt or "png"]
+        return _encode_image(image, pil_format, **options)
+    return image
+
+
+class AsyncRenderer:
+    """
+    asyncio front end of CharacterRenderer: rendering and encoding run on a thread
+    or process pool so the event loop is never blocked.
+    Identical concurrent requests are coalesced into one render; a request whose
+    callers have all been cancelled is dropped if it has not started drawing yet.
+    """
+
+    def __init__(
+        self,
+        char_id: str,
+        base_path: str = "assets",
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"executor 只能是 thread 或 process: {executor}")
+        self.char_id = char_id
+        self.base_path = base_path
+        self.mode = executor
+        ensure_character_cache(char_id, base_path, os.path.join(base_path, "cache"))
+
+        self._renderer: Optional[CharacterRenderer] = None
+        self._executor: Executor
+        if executor == "thread":
+            # 同一个渲染器不能并发绘制，多个线程只用于让编码与下一次绘制重叠
+            self._renderer = CharacterRenderer(char_id, base_path)
+            self._render_lock = threading.Lock()
+            self._executor = ThreadPoolExecutor(max_workers=max_workers or 2, thread_name_prefix="async-render")
+        else:
+            # 每个进程各自加载一份素材，换取多核并行
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count() or 1,
+                initializer=_init_process,
+                initargs=(char_id, base_path),
+            )
+        self._pending: Dict[RequestKey, _Pending] = {}
+        self._counters = {"requests": 0, "jobs": 0, "coalesced": 0, "cancelled": 0}
+
+    @classmethod
+    async def create(cls, char_id: str, base_path: str = "assets", **kwargs: Any) -> "AsyncRenderer":
+        """Build the renderer (cache check + asset indexing) off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(cls, char_id, base_path, **kwargs))
+
+    @property
+    def renderer(self) -> Optional[CharacterRenderer]:
+        """The shared renderer in thread mode (None in process mode)."""
+        return self._renderer
+
+    async def render(
+        self,
+        text: str,
+        portrait_key: Optional[str] = None,
+        bg_key: Optional[str] = None,
+        speaker_name: Optional[str] = None,
+    ) -> Image.Image:
+        """Render one dialogue image; the returned image belongs to the caller."""
+        key: RequestKey = ("image", text, portrait_key, bg_key, speaker_name, None)
+        image, shared = await self._submit(key)
+        # 合并的请求拿到的是同一张图，复制一份避免互相修改
+        return image.copy() if shared else image
+
+    async def render_bytes(
+        self,
+        text: str,
+        portrait_key: Optional[str] = None,
+        bg_key: Optional[str] = None,
+        speaker_name: Optional[str] = None,
+        fmt: str = "png",
+    ) -> bytes:
+        """Render and encode (png / jpeg / webp / bmp) without touching the event loop."""
+        fmt = fmt.lower()
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {fmt}（可选 {', '.join(OUTPUT_FORMATS)}）")
+        key: RequestKey = ("bytes", text, portrait_key, bg_key, speaker_name, fmt)
+        data, _ = await self._submit(key)
+        return data
+
+    async def _submit(self, key: RequestKey) -> Tuple[Any, bool]:
+        self._counters["requests"] += 1
+        pending = self._pending.get(key)
+        shared = pending is not None
+        if pending is None:
+            pending = self._start(key)
+        else:
+            self._counters["coalesced"] += 1
+
+        pending.waiters += 1
+        try:
+            # shield: 一个调用方被取消不影响同一请求的其他调用方
+            result = await asyncio.shield(pending.future)
+        except asyncio.CancelledError:
+            pending.waiters -= 1
+            if pending.waiters == 0 and not pending.future.done():
+                # 已无人等待：还在排队的任务直接取消，已开始的任务在绘制前放弃
+                pending.cancelled.set()
+                pending.future.cancel()
+                self._drop(key, pending)
+                self._counters["cancelled"] += 1
+            raise
+        return result, shared or pending.waiters > 1
+
+    def _start(self, key: RequestKey) -> _Pending:
+        self._counters["jobs"] += 1
+        cancelled = threading.Event()
+        if self.mode == "thread":
+            job = self._executor.submit(self._thread_job, key, cancelled)
+        else:
+            job = self._executor.submit(_process_job, *key)
+        pending = _Pending(asyncio.wrap_future(job), cancelled)
+        self._pending[key] = pending
+        pending.future.add_done_callback(lambda _: self._drop(key, pending))
+        return pending
+
+    def _drop(self, key: RequestKey, pending: _Pending) -> None:
+        if self._pending.get(key) is pending:
+            del self._pending[key]
+
+    def _thread_job(self, key: RequestKey, cancelled: threading.Event) -> Any:
+        kind, text, portrait, bg, speaker, fmt = key
+        renderer = self._renderer
+        assert renderer is not None
+        with self._render_lock:
+            if cancelled.is_set():
+                return None
+            image = renderer.render(text, portrait, bg, speaker)
+            # band 模式的输出缓冲会被下一次渲染覆盖，离开锁之前复制
+            if renderer.is_shared_output(image):
+                image = image.copy()
+        if kind == "bytes":
+            pil_format, _, options = OUTPUT_FORMATS[fmt or "png"]
+            return _encode_image(image, pil_format, **options)
+        return image
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._counters)
+        stats["in_flight"] = len(self._pending)
+        if self._renderer is not None:
+            stats["cache"] = self._renderer.cache_stats()
+        return stats
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncRenderer":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
@@ -0,0 +1,290 @@
+# core/batch.py
+"""
+批量渲染台词脚本。
+
+    python -m core.batch script.jsonl -o output/ [--jobs 4] [--format png]
+        [--name "{index:04d}_{character}.{ext}"] [--character yuraa] [--profile qq]
+
+脚本支持 JSONL / CSV（带表头）/ YAML（列表），每行字段:
+    character, expression, background, speaker, text
+只有 text 必填；character 缺省时使用 --character，立绘 / 背景缺省时使用角色的第一张。
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from .prebuild import ensure_character_cache
+from .renderer import CharacterRenderer, _encode_image
+
+SCRIPT_FIELDS = ("character", "expression", "background", "speaker", "text")
+DEFAULT_NAME_TEMPLATE = "{index:04d}_{character}.{ext}"
+# 每个任务包含的台词条数：太小进程间通信开销大，太大进度更新不及时
+DEFAULT_CHUNK_SIZE = 32
+
+# 格式名 -> (Pillow 格式, 扩展名, 编码参数)
+# PNG 默认压缩级别 6 编码一张 720p 画布约 0.6 秒，级别 1 只需 1/4 的时间，体积大 20% 左右
+OUTPUT_FORMATS: Dict[str, Tuple[str, str, Dict[str, Any]]] = {
+    "png": ("PNG", "png", {"compress_level": 1}),
+    "jpeg": ("JPEG", "jpg", {"quality": 90}),
+    "jpg": ("JPEG", "jpg", {"quality": 90}),
+    "webp": ("WEBP", "webp", {"quality": 90}),
+    "bmp": ("BMP", "bmp", {}),
+}
+
+# (行号, 字段) —— 行号从 1 开始，对应脚本中的第几条台词
+ScriptLine = Tuple[int, Dict[str, Any]]
+
+
+def load_script(path: str, default_character: Optional[str] = None) -> List[ScriptLine]:
+    """Read a JSONL / CSV / YAML dialogue script into numbered rows."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if ext == ".csv":
+            rows: List[Any] = list(csv.DictReader(f))
+        elif ext in (".yaml", ".yml"):
+            data = yaml.safe_load(f) or []
+            rows = data.get("lines", []) if isinstance(data, dict) else data
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    lines: List[ScriptLine] = []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"第 {number} 条台词格式错误: {row!r}")
+        entry = {key: str(row[key]) if row.get(key) not in (None, "") else None for key in SCRIPT_FIELDS}
+        entry["character"] = entry["character"] or default_character
+        if not entry["character"]:
+            raise ValueError(f"第 {number} 条台词缺少 character，可使用 --character 指定默认角色")
+        entry["text"] = str(row.get("text") or "")
+        lines.append((number, entry))
+    return lines
+
+
+def _chunks(lines: List[ScriptLine], size: int) -> Iterator[Tuple[str, List[ScriptLine]]]:
+    """Split lines into per-character chunks so a worker renders one character at a time."""
+    by_char: Dict[str, List[ScriptLine]] = {}
+    for line in lines:
+        by_char.setdefault(line[1]["character"], []).append(line)
+    for char_id, char_lines in by_char.items():
+        for start in range(0, len(char_lines), size):
+            yield char_id, char_lines[start:start + size]
+
+
+# -----------------------
+# 工作进程
+# -----------------------
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(
+    base_path: str,
+    output_dir: str,
+    name_template: str,
+    fmt: str,
+    output_profile: Optional[str] = None,
+) -> None:
+    _WORKER.update(
+        base_path=base_path,
+        output_dir=output_dir,
+        name_template=name_template,
+        fmt=fmt,
+        output_profile=output_profile,
+        renderers={},
+    )
+
+
+def _get_renderer(char_id: str) -> CharacterRenderer:
+    # 每个进程每个角色只加载一次，后续任务复用已预热的字体 / 底图缓存
+    renderers: Dict[str, CharacterRenderer] = _WORKER["renderers"]
+    renderer = renderers.get(char_id)
+    if renderer is None:
+        renderer = CharacterRenderer(char_id, _WORKER["base_path"], _WORKER["output_profile"])
+        renderers[char_id] = renderer
+    return renderer
+
+
+def output_name(template: str, number: int, entry: Dict[str, Any], ext: str) -> str:
+    fields = {key: entry.get(key) or "" for key in SCRIPT_FIELDS if key != "text"}
+    return template.format(index=number, ext=ext, **fields)
+
+
+def check_options(fmt: str, name_template: str, output_profile: Optional[str] = None) -> str:
+    """Validate the output format, file name template and output profile; returns the normalized format."""
+    fmt = fmt.lower()
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}（可选 {', '.join(OUTPUT_FORMATS)}）")
+    sample = {key: key for key in SCRIPT_FIELDS}
+    try:
+        output_name(name_template, 1, sample, OUTPUT_FORMATS[fmt][1])
+    except KeyError as exc:
+        fields = ", ".join(["index", "ext", *(key for key in SCRIPT_FIELDS if key != "text")])
+        raise ValueError(f"文件名模板 {name_template} 含未知字段 {exc}（可选 {fields}）") from None
+    except (IndexError, ValueError, AttributeError) as exc:
+        raise ValueError(f"文件名模板 {name_template} 无效: {exc}") from None
+    profiles = CharacterRenderer.output_profiles()
+    if output_profile and output_profile not in profiles:
+        raise ValueError(f"未知的输出配置: {output_profile}（可选 {', '.join(profiles) or '无'}）")
+    return fmt
+
+
+def _render_chunk(char_id: str, lines: List[ScriptLine]) -> Tuple[int, List[str]]:
+    """Render one chunk inside a worker; returns (files written, error messages)."""
+    pil_format, ext, options = OUTPUT_FORMATS[_WORKER["fmt"]]
+    encoder = functools.partial(_encode_image, fmt=pil_format, **options)
+    try:
+        renderer = _get_renderer(char_id)
+    except Exception as exc:
+        return 0, [f"第 {number} 条: 无法加载角色 {char_id}: {exc}" for number, _ in lines]
+
+    errors: List[str] = []
+    items = []
+    valid: List[ScriptLine] = []
+    for number, entry in lines:
+        portrait, background = entry["expression"], entry["background"]
+        if portrait and portrait not in renderer.assets["portraits"]:
+            errors.append(f"第 {number} 条: 角色 {char_id} 没有立绘 {portrait}")
+            continue
+        if background and background not in renderer.assets["backgrounds"]:
+            errors.append(f"第 {number} 条: 角色 {char_id} 没有背景 {background}")
+            continue
+        items.append((entry["text"], portrait, background, entry["speaker"]))
+        valid.append((number, entry))
+
+    written = 0
+    try:
+        for index, data in renderer.render_many(items, encoder=encoder):
+            number, entry = valid[index]
+            path = os.path.join(_WORKER["output_dir"], output_name(_WORKER["name_template"], number, entry, ext))
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)  # type: ignore[arg-type]
+            written += 1
+    except Exception as exc:
+        errors.append(f"角色 {char_id} 渲染失败: {exc}")
+    return written, errors
+
+
+# -----------------------
+# 主进程
+# -----------------------
+def run_batch(
+    lines: List[ScriptLine],
+    output_dir: str,
+    base_path: str = "assets",
+    jobs: Optional[int] = None,
+    name_template: str = DEFAULT_NAME_TEMPLATE,
+    fmt: str = "png",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    output_profile: Optional[str] = None,
+) -> Tuple[int, List[str]]:
+    """
+    Render every script line into output_dir, printing progress and throughput.
+    jobs <= 1 renders in this process. output_profile names an entry of
+    render.output_profiles ("" for full size, None for render.output_profile).
+    Returns (files written, error messages).
+    """
+    fmt = check_options(fmt, name_template, output_profile)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+
+    # 缓存只在主进程检查 / 生成，避免多个进程同时预构建同一角色
+    characters = sorted({entry["character"] for _, entry in lines})
+    for char_id in characters:
+        ensure_character_cache(char_id, base_path, os.path.join(base_path, "cache"))
+
+    total = len(lines)
+    done = 0
+    written = 0
+    errors: List[str] = []
+    start = time.perf_counter()
+
+    def report(count: int, chunk_written: int, chunk_errors: List[str]) -> None:
+        nonlocal done, written
+        done += count
+        written += chunk_written
+        errors.extend(chunk_errors)
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        print(f"🖼️ [{done}/{total}] {rate:.1f} 张/秒", flush=True)
+
+    print(f"🚀 开始批量渲染 {total} 条台词（{len(characters)} 个角色，{jobs} 个进程）")
+    args = (base_path, output_dir, name_template, fmt, output_profile)
+    if jobs == 1:
+        _init_worker(*args)
+        for char_id, chunk in _chunks(lines, chunk_size):
+            report(len(chunk), *_render_chunk(char_id, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=args) as pool:
+            pending: Dict[Future, int] = {
+                pool.submit(_render_chunk, char_id, chunk): len(chunk)
+                for char_id, chunk in _chunks(lines, chunk_size)
+            }
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    report(pending.pop(future), *future.result())
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(f"✅ 批量渲染完成: {written}/{total} 张，用时 {elapsed:.1f} 秒，{rate:.1f} 张/秒")
+    for message in errors:
+        print(f"❌ {message}")
+    return written, errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script", help="台词脚本（.jsonl / .csv / .yaml）")
+    parser.add_argument("-o", "--output", default="output", help="输出目录")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数（默认 CPU 核心数，1 表示单进程）")
+    parser.add_argument("-f", "--format", default="png", help=f"输出格式: {' / '.join(OUTPUT_FORMATS)}")
+    parser.add_argument(
+        "-n", "--name", default=DEFAULT_NAME_TEMPLATE,
+        help="文件名模板，可用 {index} {character} {expression} {background} {speaker} {ext}",
+    )
+    parser.add_argument("-c", "--character", default=None, help="脚本未写 character 时使用的角色")
+    parser.add_argument("--assets", default="assets", help="素材根目录")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每个任务的台词条数")
+    parser.add_argument(
+        "-p", "--profile", default=None,
+        help="输出配置（render.output_profiles 中的名字，\"\" 表示原始尺寸；默认用 render.output_profile）",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        check_options(args.format, args.name, args.profile)
+    except ValueError as exc:
+        print(f"❌ {exc}")
+        return 1
+    try:
+        lines = load_script(args.script, args.character)
+    except (OSError, ValueError, yaml.YAMLError) as exc:
+        print(f"❌ 无法读取脚本 {args.script}: {exc}")
+        return 1
+    if not lines:
+        print("⚠️ 脚本中没有台词")
+        return 0
+
+    _, errors = run_batch(
+        lines,
+        args.output,
+        base_path=args.assets,
+        jobs=args.jobs,
+        name_template=args.name,
+        fmt=args.format,
+        chunk_size=max(1, args.chunk_size),
+        output_profile=args.profile,
+    )
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
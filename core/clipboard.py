@@ -5,6 +5,8 @@ import pyperclip
 import win32clipboard
 from PIL import Image
 
+from .profiling import PROFILER
+
 
 def get_text() -> str:
     """Read text content from the clipboard."""
@@ -23,15 +25,26 @@ def set_text(text: str) -> bool:
         return False
 
 
-def set_image(image: Image.Image, retries: int = 3, interval: float = 0.05) -> bool:
-    """Write a PIL image into the Windows clipboard with retry to avoid contention."""
+def image_to_dib(image: Image.Image) -> bytes:
+    """Encode a PIL image as CF_DIB clipboard data (BMP without file header)."""
+    with PROFILER.stage("clipboard.encode"):
+        buffer = BytesIO()
+        # 不透明底图本身就是 RGB，无需再复制一份
+        (image if image.mode == "RGB" else image.convert("RGB")).save(buffer, "BMP")
+        data = buffer.getvalue()[14:]  # remove BMP header, keep DIB data
+        buffer.close()
+    return data
+
+
+def set_dib(data: bytes, retries: int = 3, interval: float = 0.05) -> bool:
+    """Write pre-encoded DIB data into the Windows clipboard with retry."""
+    with PROFILER.stage("clipboard.write"):
+        return _set_dib(data, retries, interval)
+
+
+def _set_dib(data: bytes, retries: int, interval: float) -> bool:
     for attempt in range(retries):
         try:
-            buffer = BytesIO()
-            image.convert("RGB").save(buffer, "BMP")
-            data = buffer.getvalue()[14:]  # remove BMP header, keep DIB data
-            buffer.close()
-
             win32clipboard.OpenClipboard()
             win32clipboard.EmptyClipboard()
             win32clipboard.SetClipboardData(win32clipboard.CF_DIB, data)
@@ -45,3 +58,12 @@ def set_image(image: Image.Image, retries: int = 3, interval: float = 0.05) -> b
             if attempt < retries - 1:
                 time.sleep(interval)
     return False
+
+
+def set_image(image: Image.Image, retries: int = 3, interval: float = 0.05) -> bool:
+    """Write a PIL image into the Windows clipboard with retry to avoid contention."""
+    try:
+        data = image_to_dib(image)
+    except Exception:
+        return False
+    return set_dib(data, retries, interval)
@@ -1,11 +1,17 @@
+import threading
 import time
+from typing import Optional, Tuple
 
 import keyboard
+from PIL import Image
 
-from .clipboard import get_text, set_image, set_text
+from .clipboard import get_text, image_to_dib, set_dib, set_text
 from .listener import InputListener
 from .prebuild import ensure_character_cache
+from .profiling import PROFILER, dump_profile
+from .render_cache import RenderMemo
 from .renderer import CharacterRenderer
+from .utils import load_global_config
 
 
 class GalGameEngine:
@@ -23,11 +29,28 @@ class GalGameEngine:
         portrait_keys = sorted(list(self.renderer.assets["portraits"].keys()))
         if portrait_keys:
             self.current_expression = portrait_keys[0]
+            self.renderer.pin_portrait(self.current_expression)
             print(f"ℹ️ 默认加载立绘: {self.current_expression}")
         else:
             self.current_expression = "default"
             print("⚠️ 警告: 未找到任何立绘，使用默认占位符")
 
+        render_cfg = load_global_config().get("render", {})
+        try:
+            memo_cache_mb = float(render_cfg.get("memo_cache_mb", 64))
+        except (TypeError, ValueError):
+            memo_cache_mb = 64.0
+        self.memo = RenderMemo(
+            char_id,
+            base_path=self.renderer.base_path,
+            max_entries=int(render_cfg.get("memo_cache_entries", 16)),
+            use_disk=bool(render_cfg.get("memo_cache_disk", False)),
+            encoder=image_to_dib,
+            max_bytes=int(memo_cache_mb * 1024 * 1024) if memo_cache_mb > 0 else None,
+        )
+
+        # 渲染器的输出缓冲在两次渲染间复用，提交流程需串行
+        self._submit_lock = threading.Lock()
         self.listener = InputListener()
 
     def start(self):
@@ -38,6 +61,8 @@ class GalGameEngine:
         self.listener.start(
             submit_callback=self._on_submit,
             switch_callback=self._on_switch_expression,
+            profile_callback=self._on_dump_profile,
+            output_profile_callback=self._on_cycle_output_profile,
         )
 
     def _on_switch_expression(self, key: str):
@@ -53,19 +78,48 @@ class GalGameEngine:
         if 0 <= index < len(portrait_keys):
             target_key = portrait_keys[index]
             self.current_expression = target_key
+            # 当前表情常驻内存，其余立绘按 LRU 淘汰
+            self.renderer.pin_portrait(target_key)
             print(f"😉 已切换到第 [{key}] 号立绘: {target_key}")
         else:
             print(f"🤔 序号 {key} 超出范围 (当前只有 {len(portrait_keys)} 张立绘)")
 
+    def _on_dump_profile(self):
+        """回调：输出各阶段耗时统计并写入 JSON"""
+        if not PROFILER.enabled:
+            print("ℹ️ 未开启耗时统计，请在 global_config.yaml 中设置 render.profiling: true")
+            return
+        try:
+            dump_profile()
+        except OSError as e:
+            print(f"❌ 写入耗时统计失败: {e}")
+
+    def _on_cycle_output_profile(self):
+        """回调：在原始尺寸与各输出配置之间循环切换"""
+        names = [None] + list(self.renderer.output_profiles())
+        current = self.renderer.output_profile
+        target = names[(names.index(current) + 1) % len(names)] if current in names else None
+        # 切换会重置渲染器的缓冲与缓存，等待正在进行的提交完成
+        with self._submit_lock:
+            size = self.renderer.set_output_profile(target)
+        print(f"📐 输出尺寸: {target or '原始尺寸'} ({size[0]}x{size[1]})")
+
     def _on_submit(self):
-        # 1. 模拟 Ctrl+A 全选, Ctrl+X 剪切
-        keyboard.send("ctrl+a")
-        time.sleep(0.05)
-        keyboard.send("ctrl+x")
-        time.sleep(0.1)
+        # submit.total 包含等待上一次提交完成的时间
+        with PROFILER.stage("submit.total"):
+            with self._submit_lock:
+                self._submit()
+
+    def _submit(self):
+        with PROFILER.stage("submit.capture"):
+            # 1. 模拟 Ctrl+A 全选, Ctrl+X 剪切
+            keyboard.send("ctrl+a")
+            time.sleep(0.05)
+            keyboard.send("ctrl+x")
+            time.sleep(0.1)
 
-        # 2. 获取剪贴板文本
-        text = get_text().strip()
+            # 2. 获取剪贴板文本
+            text = get_text().strip()
 
         if not text:
             print("🔕 剪贴板为空或非文本，尝试还原...")
@@ -74,15 +128,20 @@ class GalGameEngine:
 
         print(f"📝 捕获文本: {text}")
 
-        # 3. 渲染图片
+        # 3. 渲染图片（命中记忆缓存时直接复用编码好的剪贴板数据）
         try:
-            image = self.renderer.render(text, self.current_expression)
+            with PROFILER.stage("submit.render"):
+                key, payload, image = self._render_payload(text)
         except Exception as e:
             print(f"⚠️ 渲染失败，尝试自动生成缓存: {e}")
             try:
                 ensure_character_cache(self.char_id)
-                self.renderer = CharacterRenderer(self.char_id)
-                image = self.renderer.render(text, self.current_expression)
+                self.renderer = CharacterRenderer(
+                    self.char_id, output_profile=self.renderer.output_profile or ""
+                )
+                self.renderer.pin_portrait(self.current_expression)
+                self.memo.clear()
+                key, payload, image = self._render_payload(text)
                 print("✅ 缓存已重建，继续发送")
             except Exception as inner:
                 print(f"❌ 渲染失败: {inner}")
@@ -91,11 +150,33 @@ class GalGameEngine:
                 return
 
         # 4. 将图片写入剪贴板并粘贴
-        if set_image(image):
-            time.sleep(0.1)
-            keyboard.send("ctrl+v")
+        if set_dib(payload):
+            with PROFILER.stage("submit.paste"):
+                time.sleep(0.1)
+                keyboard.send("ctrl+v")
             print("✅ 已执行粘贴发送指令")
+            self.memo.persist(key, image)
         else:
             print("❌ 图片写入剪贴板失败")
             if set_text(text):
                 keyboard.send("ctrl+v")
+
+    def _render_payload(self, text: str) -> Tuple[str, bytes, Optional[Image.Image]]:
+        """Render (or look up) the image for text; returns memo key, DIB payload and image."""
+        key = self.memo.make_key(
+            self.current_expression,
+            None,
+            text,
+            None,
+            self.renderer.config_signature(),
+        )
+        cached = self.memo.get(key)
+        if cached is not None and cached[1] is not None:
+            print("⚡ 命中渲染缓存")
+            return key, cached[1], None
+
+        image = self.renderer.render(text, self.current_expression)
+        payload = image_to_dib(image)
+        owned = None if self.renderer.is_shared_output(image) else image
+        self.memo.put(key, owned, payload)
+        return key, payload, image
@@ -0,0 +1,97 @@
+# core/file_hash.py
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+HASH_ALGORITHM = "blake2b-128"
+CHUNK_SIZE = 1 << 20
+# 修改时间距哈希时刻太近的文件可能在同一时间戳内再次被改写，这类条目不持久化
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def hash_file(path: str) -> str:
+    """BLAKE2b (128-bit) hex digest of the file's bytes."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FileHashCache:
+    """
+    Content hashes memoized by (path, size, mtime) and persisted as JSON, so an
+    unchanged file is never re-read and a touched-but-identical file keeps its hash.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, List] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get("algorithm") == HASH_ALGORITHM:
+            entries = data.get("files")
+            if isinstance(entries, dict):
+                self._entries = entries
+
+    def digest(self, file_path: str) -> str:
+        """Content hash of file_path, or "" when it does not exist."""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return ""
+        key = os.path.abspath(file_path).replace("\\", "/")
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+                self.hits += 1
+                return entry[2]
+        digest = hash_file(file_path)
+        with self._lock:
+            self.misses += 1
+            if time.time_ns() - stat.st_mtime_ns > RACY_WINDOW_NS:
+                self._entries[key] = [stat.st_size, stat.st_mtime_ns, digest]
+                self._dirty = True
+            else:
+                self._entries.pop(key, None)
+        return digest
+
+    def save(self) -> None:
+        """Write the cache (atomic replace) if anything changed; drops entries of deleted files."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._entries = {key: entry for key, entry in self._entries.items() if os.path.exists(key)}
+            data = {"algorithm": HASH_ALGORITHM, "files": dict(self._entries)}
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ 无法保存文件哈希缓存 {self.path}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"files": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,264 @@
+# core/font_fallback.py
+
+import hashlib
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from .text_layout import FontType
+
+# Unicode 码位总数（U+0000 ~ U+10FFFF）
+_CODEPOINTS = 0x110000
+_INDEX_VERSION = b"CMAP1"
+
+
+class CoverageIndex:
+    """
+    Codepoints mapped by a font's cmap, as a bitset of 0x110000 bits (136 KiB).
+    Built once per font file by parsing cmap subtables (formats 4, 6, 12) and cached
+    on disk zlib-compressed, so routing a character is a single bit test.
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: bytearray):
+        self.bits = bits
+
+    def __contains__(self, codepoint: int) -> bool:
+        return 0 <= codepoint < _CODEPOINTS and bool(self.bits[codepoint >> 3] & (1 << (codepoint & 7)))
+
+    def count(self) -> int:
+        return sum(bin(b).count("1") for b in self.bits if b)
+
+    @classmethod
+    def from_font_file(cls, path: str, index: int = 0) -> "CoverageIndex":
+        with open(path, "rb") as f:
+            data = f.read()
+        bits = bytearray(_CODEPOINTS >> 3)
+        for codepoint in _iter_cmap(data, index):
+            bits[codepoint >> 3] |= 1 << (codepoint & 7)
+        return cls(bits)
+
+    def to_bytes(self) -> bytes:
+        return _INDEX_VERSION + zlib.compress(bytes(self.bits), 6)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CoverageIndex":
+        if not data.startswith(_INDEX_VERSION):
+            raise ValueError("字形覆盖索引版本不匹配")
+        bits = bytearray(zlib.decompress(data[len(_INDEX_VERSION):]))
+        if len(bits) != _CODEPOINTS >> 3:
+            raise ValueError("字形覆盖索引已损坏")
+        return cls(bits)
+
+
+_INDEXES: Dict[Tuple[str, int, int, int], CoverageIndex] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def load_coverage(path: str, index: int = 0, cache_dir: Optional[str] = None) -> Optional[CoverageIndex]:
+    """
+    Coverage index of a font file, memoized in memory and (when cache_dir is given)
+    on disk under a name derived from the file path, size and mtime.
+    Returns None when the file cannot be parsed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (os.path.abspath(path), index, stat.st_size, stat.st_mtime_ns)
+    with _INDEX_LOCK:
+        cached = _INDEXES.get(key)
+    if cached is not None:
+        return cached
+
+    cache_file = None
+    if cache_dir:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:20]
+        cache_file = os.path.join(cache_dir, f"{os.path.basename(path)}.{digest}.cmap")
+    coverage = None
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                coverage = CoverageIndex.from_bytes(f.read())
+        except (OSError, ValueError, zlib.error):
+            coverage = None
+    if coverage is None:
+        try:
+            coverage = CoverageIndex.from_font_file(path, index)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️ 无法读取字体 {path} 的字符表: {e}")
+            return None
+        if cache_file:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)  # type: ignore[arg-type]
+                tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(coverage.to_bytes())
+                os.replace(tmp_path, cache_file)
+            except OSError:
+                pass
+    with _INDEX_LOCK:
+        _INDEXES[key] = coverage
+    return coverage
+
+
+def _iter_cmap(data: bytes, index: int = 0):
+    """Yield every codepoint with a non-zero glyph in the Unicode cmap subtables."""
+    offset = 0
+    if data[:4] == b"ttcf":
+        num_fonts = struct.unpack_from(">I", data, 8)[0]
+        if not 0 <= index < num_fonts:
+            raise ValueError(f"字体集合中没有第 {index} 个字体")
+        offset = struct.unpack_from(">I", data, 12 + 4 * index)[0]
+
+    num_tables = struct.unpack_from(">H", data, offset + 4)[0]
+    cmap_offset = None
+    for i in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from(">4sIII", data, offset + 12 + 16 * i)
+        if tag == b"cmap":
+            cmap_offset = table_offset
+            break
+    if cmap_offset is None:
+        raise ValueError("字体缺少 cmap 表")
+
+    num_subtables = struct.unpack_from(">H", data, cmap_offset + 2)[0]
+    seen = set()
+    for i in range(num_subtables):
+        platform, encoding, sub_offset = struct.unpack_from(">HHI", data, cmap_offset + 4 + 8 * i)
+        # 只读取 Unicode 子表：平台 0，或 Windows 平台的 BMP(1) / 完整(10) 编码
+        if not (platform == 0 or (platform == 3 and encoding in (1, 10))):
+            continue
+        start = cmap_offset + sub_offset
+        if start in seen:
+            continue
+        seen.add(start)
+        fmt = struct.unpack_from(">H", data, start)[0]
+        if fmt == 4:
+            yield from _cmap_format4(data, start)
+        elif fmt == 6:
+            yield from _cmap_format6(data, start)
+        elif fmt == 12:
+            yield from _cmap_format12(data, start)
+
+
+def _cmap_format4(data: bytes, start: int):
+    seg_count = struct.unpack_from(">H", data, start + 6)[0] // 2
+    ends = struct.unpack_from(f">{seg_count}H", data, start + 14)
+    starts_at = start + 16 + 2 * seg_count
+    starts = struct.unpack_from(f">{seg_count}H", data, starts_at)
+    deltas = struct.unpack_from(f">{seg_count}h", data, starts_at + 2 * seg_count)
+    range_at = starts_at + 4 * seg_count
+    ranges = struct.unpack_from(f">{seg_count}H", data, range_at)
+    for seg in range(seg_count):
+        first, last, delta, range_offset = starts[seg], ends[seg], deltas[seg], ranges[seg]
+        if first == 0xFFFF:
+            continue
+        for codepoint in range(first, last + 1):
+            if range_offset == 0:
+                glyph = (codepoint + delta) & 0xFFFF
+            else:
+                # idRangeOffset 是相对自身位置的偏移
+                address = range_at + 2 * seg + range_offset + 2 * (codepoint - first)
+                if address + 2 > len(data):
+                    continue
+                glyph = struct.unpack_from(">H", data, address)[0]
+                if glyph:
+                    glyph = (glyph + delta) & 0xFFFF
+            if glyph:
+                yield codepoint
+
+
+def _cmap_format6(data: bytes, start: int):
+    first, count = struct.unpack_from(">HH", data, start + 6)
+    glyphs = struct.unpack_from(f">{count}H", data, start + 10)
+    for i, glyph in enumerate(glyphs):
+        if glyph:
+            yield first + i
+
+
+def _cmap_format12(data: bytes, start: int):
+    num_groups = struct.unpack_from(">I", data, start + 12)[0]
+    for i in range(num_groups):
+        first, last, glyph = struct.unpack_from(">III", data, start + 16 + 12 * i)
+        last = min(last, _CODEPOINTS - 1)
+        # startGlyphID 为 0 时第一个码位映射到 .notdef
+        yield from range(first + (1 if glyph == 0 else 0), last + 1)
+
+
+class FontChain:
+    """
+    Primary font plus fallbacks. Each character is routed to the first font whose
+    coverage index contains it (the primary font when none does), so emoji or rare
+    ideographs missing from the primary font no longer render as tofu.
+    Size and vertical metrics are those of the primary font.
+    """
+
+    def __init__(self, fonts: List[FontType], coverages: List[Optional[CoverageIndex]]):
+        if not fonts:
+            raise ValueError("FontChain 至少需要一个字体")
+        self.fonts = fonts
+        self.coverages = coverages
+        self.primary = fonts[0]
+        self._routes: Dict[str, FontType] = {}
+        primary_ascent = self._ascent(self.primary)
+        # 各字体按基线对齐时相对主字体的纵向偏移
+        self.baseline_shift: Dict[int, int] = {
+            id(font): primary_ascent - self._ascent(font) for font in fonts
+        }
+
+    @staticmethod
+    def _ascent(font: FontType) -> int:
+        getmetrics = getattr(font, "getmetrics", None)
+        return int(getmetrics()[0]) if getmetrics else 0
+
+    @property
+    def path(self) -> Optional[str]:
+        return getattr(self.primary, "path", None)
+
+    @property
+    def size(self) -> Optional[float]:
+        return getattr(self.primary, "size", None)
+
+    @property
+    def fallback_paths(self) -> List[Optional[str]]:
+        return [getattr(font, "path", None) for font in self.fonts[1:]]
+
+    def font_for(self, ch: str) -> FontType:
+        font = self._routes.get(ch)
+        if font is None:
+            font = self.primary
+            codepoint = ord(ch[0]) if ch else 0
+            for candidate, coverage in zip(self.fonts, self.coverages):
+                # 无法解析字符表的字体（如 Pillow 内置位图字体）视为覆盖全部字符
+                if coverage is None or codepoint in coverage:
+                    font = candidate
+                    break
+            self._routes[ch] = font
+        return font
+
+    def runs(self, text: str) -> List[Tuple[int, int, FontType]]:
+        """Split text into (start, end, font) runs of consecutive characters sharing a font."""
+        runs: List[Tuple[int, int, FontType]] = []
+        start = 0
+        current: Optional[FontType] = None
+        for idx, ch in enumerate(text):
+            font = self.font_for(ch)
+            if font is not current:
+                if current is not None:
+                    runs.append((start, idx, current))
+                start, current = idx, font
+        if current is not None:
+            runs.append((start, len(text), current))
+        return runs
+
+    def getlength(self, text: str) -> float:
+        return sum(font.getlength(text[start:end]) for start, end, font in self.runs(text))
+
+    def getbbox(self, text: str, *args, **kwargs):
+        return self.primary.getbbox(text, *args, **kwargs)
+
+    def getmetrics(self):
+        return self.primary.getmetrics()  # type: ignore[union-attr]
@@ -0,0 +1,235 @@
+# core/glyph_atlas.py
+
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .font_fallback import FontChain
+from .text_layout import FontType, TextWrapper
+
+Color = Union[Tuple[int, int, int], Tuple[int, int, int, int]]
+GlyphEntry = Optional[Tuple[Image.Image, Tuple[int, int]]]
+# (遮罩, x, y)：一个字形在画布上的位置
+Placed = List[Tuple[Image.Image, int, int]]
+
+
+def _placed_bbox(placed: Placed) -> Optional[Tuple[int, int, int, int]]:
+    if not placed:
+        return None
+    return (
+        min(gx for _, gx, _ in placed),
+        min(gy for _, _, gy in placed),
+        max(gx + mask.width for mask, gx, _ in placed),
+        max(gy + mask.height for mask, _, gy in placed),
+    )
+
+
+def _pixel(units: int) -> int:
+    """26.6 定点数四舍五入到整像素（与 FreeType 的 PIXEL 宏一致）"""
+    return (units + 32) >> 6
+
+
+def _paint(image: Image.Image, placed: Placed, fill: Color) -> None:
+    box = _placed_bbox(placed)
+    if box is None:
+        return
+    if len(placed) == 1:
+        mask, gx, gy = placed[0]
+        image.paste(fill, (gx, gy, gx + mask.width, gy + mask.height), mask)
+        return
+    # 与 ImageDraw.text 一致：先把字形覆盖率合成为整行遮罩，再一次性上色，
+    # 否则相邻字形重叠处会被混合两次（误差 1 级灰度）
+    line_mask = Image.new("L", (box[2] - box[0], box[3] - box[1]), 0)
+    for mask, gx, gy in placed:
+        lx, ly = gx - box[0], gy - box[1]
+        line_mask.paste(255, (lx, ly, lx + mask.width, ly + mask.height), mask)
+    image.paste(fill, box, line_mask)
+
+
+class GlyphAtlas:
+    """Coverage masks and offsets of every glyph rasterized for one (font path, size)."""
+
+    def __init__(self, font: FontType):
+        self.font = font
+        self._glyphs: Dict[str, GlyphEntry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def glyph(self, ch: str) -> GlyphEntry:
+        if ch in self._glyphs:
+            self.hits += 1
+            return self._glyphs[ch]
+        self.misses += 1
+        entry = self._rasterize(ch)
+        self._glyphs[ch] = entry
+        return entry
+
+    def _rasterize(self, ch: str) -> GlyphEntry:
+        left, top, right, bottom = self.font.getbbox(ch)
+        width, height = int(right - left), int(bottom - top)
+        if width <= 0 or height <= 0:
+            return None
+        mask = Image.new("L", (width, height), 0)
+        ImageDraw.Draw(mask).text((-left, -top), ch, font=self.font, fill=255)
+        if mask.getbbox() is None:
+            return None
+        return mask, (int(left), int(top))
+
+    def _place(
+        self,
+        xy: Tuple[int, int],
+        text: str,
+        wrapper: TextWrapper,
+    ) -> Placed:
+        """(mask, x, y) of each visible glyph, at the origins computed by ``wrapper``."""
+        prefix, kern_in, _ = wrapper.prefix_widths(text, self.font)
+        x, y = xy
+        placed: Placed = []
+        for idx, ch in enumerate(text):
+            entry = self.glyph(ch)
+            if entry is None:
+                continue
+            mask, (off_x, off_y) = entry
+            placed.append((mask, x + _pixel(prefix[idx] + kern_in[idx]) + off_x, y + off_y))
+        return placed
+
+    def draw_line(
+        self,
+        image: Image.Image,
+        xy: Tuple[int, int],
+        text: str,
+        fill: Color,
+        wrapper: TextWrapper,
+    ) -> None:
+        """Paste cached masks at the glyph origins computed by ``wrapper``."""
+        _paint(image, self._place(xy, text, wrapper), fill)
+
+    def line_bbox(
+        self,
+        xy: Tuple[int, int],
+        text: str,
+        wrapper: TextWrapper,
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """Ink bbox of a line drawn by draw_line, computed from cached glyph metrics."""
+        return _placed_bbox(self._place(xy, text, wrapper))
+
+    def __len__(self) -> int:
+        return len(self._glyphs)
+
+
+class GlyphAtlasCache:
+    """One GlyphAtlas per (font path, size), with aggregated hit/miss counters."""
+
+    def __init__(self, wrapper: Optional[TextWrapper] = None):
+        self.wrapper = wrapper or TextWrapper()
+        self._atlases: Dict[Hashable, GlyphAtlas] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _font_key(font: FontType) -> Hashable:
+        path = getattr(font, "path", None)
+        if isinstance(path, (str, bytes)):
+            return path, getattr(font, "size", None), getattr(font, "index", 0)
+        return id(font)
+
+    def atlas(self, font: FontType) -> GlyphAtlas:
+        key = self._font_key(font)
+        atlas = self._atlases.get(key)
+        if atlas is None:
+            with self._lock:
+                atlas = self._atlases.setdefault(key, GlyphAtlas(font))
+        return atlas
+
+    def draw_text(
+        self,
+        image: Image.Image,
+        draw: ImageDraw.ImageDraw,
+        xy: Tuple[float, float],
+        text: str,
+        font: FontType,
+        fill: Color,
+    ) -> None:
+        """
+        Draw single-line text from the atlas.
+        Multi-line text and fractional coordinates go through ImageDraw as before.
+        """
+        if not self.supports(xy, text, font):
+            for run_xy, run, run_font in self._runs(xy, text, font):
+                draw.text(run_xy, run, font=run_font, fill=fill)
+            return
+        if isinstance(font, FontChain):
+            _paint(image, self._place_chain((int(xy[0]), int(xy[1])), text, font), fill)
+            return
+        self.atlas(font).draw_line(image, (int(xy[0]), int(xy[1])), text, fill, self.wrapper)
+
+    def text_bbox(
+        self,
+        draw: ImageDraw.ImageDraw,
+        xy: Tuple[float, float],
+        text: str,
+        font: FontType,
+    ) -> Optional[Tuple[int, int, int, int]]:
+        """Bounding box of what draw_text would paint, rounded outwards."""
+        if not self.supports(xy, text, font):
+            box: Optional[Tuple[int, int, int, int]] = None
+            for run_xy, run, run_font in self._runs(xy, text, font):
+                left, top, right, bottom = draw.textbbox(run_xy, run, font=run_font)
+                run_box = (int(left) - 1, int(top) - 1, int(right) + 1, int(bottom) + 1)
+                box = run_box if box is None else (
+                    min(box[0], run_box[0]), min(box[1], run_box[1]),
+                    max(box[2], run_box[2]), max(box[3], run_box[3]),
+                )
+            return box
+        if isinstance(font, FontChain):
+            return _placed_bbox(self._place_chain((int(xy[0]), int(xy[1])), text, font))
+        return self.atlas(font).line_bbox((int(xy[0]), int(xy[1])), text, self.wrapper)
+
+    def _place_chain(self, xy: Tuple[int, int], text: str, chain: FontChain) -> Placed:
+        """Like GlyphAtlas._place, taking each glyph from the atlas of its fallback font."""
+        prefix, kern_in, _ = self.wrapper.prefix_widths(text, chain)
+        x, y = xy
+        placed: Placed = []
+        for idx, ch in enumerate(text):
+            font = chain.font_for(ch)
+            entry = self.atlas(font).glyph(ch)
+            if entry is None:
+                continue
+            mask, (off_x, off_y) = entry
+            gx = x + _pixel(prefix[idx] + kern_in[idx]) + off_x
+            placed.append((mask, gx, y + chain.baseline_shift[id(font)] + off_y))
+        return placed
+
+    def _runs(
+        self,
+        xy: Tuple[float, float],
+        text: str,
+        font: FontType,
+    ) -> List[Tuple[Tuple[float, float], str, FontType]]:
+        """(xy, text, font) pieces for ImageDraw; a FontChain is split into same-font runs."""
+        if not isinstance(font, FontChain):
+            return [(xy, text, font)]
+        prefix, _, _ = self.wrapper.prefix_widths(text, font)
+        x, y = xy
+        return [
+            ((x + prefix[start] / 64, y + font.baseline_shift[id(run_font)]), text[start:end], run_font)
+            for start, end, run_font in font.runs(text)
+        ]
+
+    @staticmethod
+    def supports(xy: Tuple[float, float], text: str, font: FontType) -> bool:
+        return (
+            "\n" not in text
+            and isinstance(font, (ImageFont.FreeTypeFont, FontChain))
+            and float(xy[0]).is_integer()
+            and float(xy[1]).is_integer()
+        )
+
+    def stats(self) -> Dict[str, int]:
+        atlases = list(self._atlases.values())
+        return {
+            "atlases": len(atlases),
+            "glyphs": sum(len(a) for a in atlases),
+            "hits": sum(a.hits for a in atlases),
+            "misses": sum(a.misses for a in atlases),
+        }
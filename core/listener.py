@@ -4,6 +4,7 @@ import keyboard
 import threading
 from typing import Any, Callable, Optional
 
+from .profiling import reload_profiling_config
 from .utils import load_global_config
 
 
@@ -23,16 +24,26 @@ class InputListener:
         
         self.on_submit: Optional[Callable[[], None]] = None
         self.on_switch_expression: Optional[Callable[[str], None]] = None
+        self.on_dump_profile: Optional[Callable[[], None]] = None
+        self.on_cycle_output_profile: Optional[Callable[[], None]] = None
 
-    def start(self, submit_callback: Callable[[], Any], switch_callback: Callable[[str], None]):
+    def start(
+        self,
+        submit_callback: Callable[[], Any],
+        switch_callback: Callable[[str], None],
+        profile_callback: Optional[Callable[[], None]] = None,
+        output_profile_callback: Optional[Callable[[], None]] = None,
+    ):
         """启动监听"""
         self.on_submit = submit_callback
         self.on_switch_expression = switch_callback
+        self.on_dump_profile = profile_callback
+        self.on_cycle_output_profile = output_profile_callback
         self.running = True
 
         print("🎧 键盘监听已启动..")
         print(f"   触发快捷键: {self.trigger_hotkey}")
-        print("   Alt+1~9(切表情), Ctrl+F5(重载配置), Ctrl+F12(暂停), Esc(退出)")
+        print("   Alt+1~9(切表情), Ctrl+F5(重载配置), Ctrl+F6(输出尺寸), Ctrl+F9(耗时统计), Ctrl+F12(暂停), Esc(退出)")
 
         # 表情切换快捷键
         for i in range(1, 10):
@@ -44,6 +55,14 @@ class InputListener:
         # 热重载快捷键
         keyboard.add_hotkey("ctrl+f5", self.reload_config)
 
+        # 输出尺寸切换快捷键
+        if self.on_cycle_output_profile:
+            keyboard.add_hotkey("ctrl+f6", self._safe_cycle_output_profile)
+
+        # 耗时统计快捷键
+        if self.on_dump_profile:
+            keyboard.add_hotkey("ctrl+f9", self._safe_dump_profile)
+
         # 注册触发快捷键
         self._register_trigger_hotkey()
 
@@ -76,6 +95,20 @@ class InputListener:
             except Exception as e:
                 print(f"❌ 切换表情回调出错: {e}")
 
+    def _safe_cycle_output_profile(self):
+        if self.on_cycle_output_profile:
+            try:
+                self.on_cycle_output_profile()
+            except Exception as e:
+                print(f"❌ 切换输出尺寸出错: {e}")
+
+    def _safe_dump_profile(self):
+        if self.on_dump_profile:
+            try:
+                self.on_dump_profile()
+            except Exception as e:
+                print(f"❌ 输出耗时统计出错: {e}")
+
     def toggle_pause(self):
         """切换暂停/恢复拦截"""
         self.paused = not self.paused
@@ -87,6 +120,8 @@ class InputListener:
         try:
             config = load_global_config()
             new_hotkey = config.get("trigger_hotkey", "enter").lower().strip()
+            # 耗时统计开关随配置一起重载
+            reload_profiling_config()
             
             # 如果快捷键有变化，重新注册
             if new_hotkey != self.trigger_hotkey:
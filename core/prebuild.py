@@ -1,13 +1,27 @@
+import argparse
 import hashlib
 import json
 import os
-from typing import Callable, Dict, List, Tuple, Any, Optional
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Tuple, Any, Optional
 
 import yaml
-from PIL import Image
+from PIL import Image, PngImagePlugin
 
 try:
-    from .utils import load_global_config, normalize_layout
+    from .utils import (
+        load_global_config,
+        normalize_layout,
+        resolve_crop_box,
+        crop_cache_dirname,
+        load_output_profiles,
+        output_profile_size,
+        profile_cache_dirname,
+    )
 except Exception:  # pragma: no cover - fallback for standalone runs
     def load_global_config() -> Dict[str, object]:
         return {}
@@ -15,9 +29,27 @@ except Exception:  # pragma: no cover - fallback for standalone runs
     def normalize_layout(layout, canvas_size):
         return layout or {}
 
+    def resolve_crop_box(layout, canvas_size):
+        return None
+
+    def crop_cache_dirname(crop_box):
+        return "_".join(str(v) for v in crop_box)
+
+    def load_output_profiles(render):
+        return {}
+
+    def output_profile_size(canvas_size, profile):
+        return canvas_size
+
+    def profile_cache_dirname(canvas_size):
+        return f"{canvas_size[0]}x{canvas_size[1]}"
+
+from .file_hash import FileHashCache
+from .lru import LRUCache
+
 DEFAULT_CANVAS_SIZE: Tuple[int, int] = (2560, 1440)
 
-def _load_render_preferences() -> Tuple[str, str, int]:
+def _load_render_preferences() -> Tuple[str, str, int, bool]:
     cfg: dict = load_global_config() or {}
     render = cfg.get("render", {})
     cache_format = str(render.get("cache_format", "jpeg")).lower()
@@ -25,18 +57,20 @@ def _load_render_preferences() -> Tuple[str, str, int]:
         cache_format = "jpeg"
     cache_ext = ".jpg" if cache_format == "jpeg" else ".png"
     jpeg_quality = int(render.get("jpeg_quality", 90))
-    return cache_format, cache_ext, jpeg_quality
+    bake_names = bool(render.get("bake_name_layers", False))
+    return cache_format, cache_ext, jpeg_quality, bake_names
 
 CANVAS_SIZE: Tuple[int, int] = DEFAULT_CANVAS_SIZE
 CACHE_FORMAT: str = "jpeg"
 CACHE_EXT: str = ".jpg"
 JPEG_QUALITY: int = 90
+BAKE_NAME_LAYERS: bool = False
 SCALED_TAG: str = "@2560x1440"
 
 
 def _refresh_render_preferences() -> None:
-    global CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY
-    CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY = _load_render_preferences()
+    global CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY, BAKE_NAME_LAYERS
+    CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY, BAKE_NAME_LAYERS = _load_render_preferences()
 
 
 _refresh_render_preferences()
@@ -47,6 +81,23 @@ SCALED_TAG = f"@{CANVAS_SIZE[0]}x{CANVAS_SIZE[1]}"
 
 ProgressCallback = Callable[[str, int, int, str], None]
 
+# 每个任务包含同一张立绘的若干张背景：太少则进程间通信与图层准备开销占比高，太多则负载不均
+COMBOS_PER_TASK = 4
+# 子进程最多保留多少张解码后的背景
+WORKER_BACKGROUND_ENTRIES = 4
+# 影响底图像素的布局字段；text_area 等只影响台词，改动后无需重建底图
+BASE_LAYOUT_FIELDS = ("stand_pos", "stand_scale", "stand_on_top", "box_pos")
+CACHE_FILE_EXTS = (".jpg", ".png")
+# 素材内容哈希的持久化缓存（cache/_file_hashes.json），按 (路径, 大小, 修改时间) 复用
+HASH_CACHE_NAME = "_file_hashes.json"
+_HASH_CACHES: Dict[str, FileHashCache] = {}
+# _meta.json 也会被渲染器的后台写入线程更新（按需缓存模式）
+_META_LOCK = threading.Lock()
+CACHE_MODES = ("prebuild", "lazy", "layered")
+# layered 模式的图层目录：每张背景一张底图（b_<背景>），每张立绘一张裁掉透明边的贴图（p_<立绘>.png）
+LAYER_DIR = "_layers"
+SPRITE_OFFSET_KEY = "offset"
+
 
 def _apply_canvas_size(canvas: Tuple[int, int]) -> None:
     global CANVAS_SIZE, SCALED_TAG
@@ -159,44 +210,119 @@ def _collect_background_entries(char_id: str, base_path: str) -> List[Tuple[str,
     return entries
 
 
-def _expected_cache_count(portraits: List[str], backgrounds: List[str]) -> int:
-    return len(portraits) * len(backgrounds)
+def _cache_file_name(portrait: str, background: str) -> str:
+    return f"p_{os.path.splitext(portrait)[0]}__b_{os.path.splitext(background)[0]}{CACHE_EXT}"
+
+
+def _layer_file_name(kind: str, name: str) -> str:
+    """File name in _layers/: b_<stem><CACHE_EXT> for a background, p_<stem>.png for a portrait sprite."""
+    return f"{kind}_{os.path.splitext(name)[0]}{CACHE_EXT if kind == 'b' else '.png'}"
 
 
 def _cache_meta_path(char_id: str, cache_path: str = CACHE_PATH) -> str:
     return os.path.join(cache_path, char_id, "_meta.json")
 
 
-def _update_hash_with_file(h: "hashlib._Hash", path: str) -> None:
-    try:
-        stat = os.stat(path)
-    except FileNotFoundError:
-        return
-    normalized = path.replace("\\", "/")
-    h.update(normalized.encode("utf-8"))
-    h.update(str(stat.st_mtime_ns).encode("utf-8"))
-    h.update(str(stat.st_size).encode("utf-8"))
+def _file_hashes(cache_path: str) -> FileHashCache:
+    """Process-wide content hash cache of one cache directory."""
+    key = os.path.abspath(cache_path)
+    hashes = _HASH_CACHES.get(key)
+    if hashes is None:
+        hashes = _HASH_CACHES.setdefault(key, FileHashCache(os.path.join(cache_path, HASH_CACHE_NAME)))
+    return hashes
 
 
-def _compute_source_signature(char_id: str, base_path: str) -> str:
-    h = hashlib.sha1()
-    h.update(repr(CANVAS_SIZE).encode("utf-8"))
-    h.update(CACHE_FORMAT.encode("utf-8"))
+def _shared_signature(
+    char_id: str,
+    base_path: str,
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
+    bake_names: bool,
+    hashes: FileHashCache,
+) -> str:
+    """Dependencies common to every combination: output format, dialog box, base layout and the baked name."""
+    box_name = config.get("assets", {}).get("dialog_box", "textbox_bg.png")
+    deps: Dict[str, Any] = {
+        "canvas_size": list(CANVAS_SIZE),
+        "cache_format": CACHE_FORMAT,
+        "jpeg_quality": JPEG_QUALITY,
+        "dialog_box": [box_name, hashes.digest(os.path.join(base_path, "characters", char_id, box_name))],
+        "layout": {field: layout.get(field) for field in BASE_LAYOUT_FIELDS},
+        "bake_name_layers": bake_names,
+    }
+    if bake_names:
+        style = config.get("style", {})
+        deps["name"] = {
+            "speaker": config.get("meta", {}).get("name", char_id),
+            "name_pos": layout.get("name_pos"),
+            "style": {k: v for k, v in style.items() if k != "text_wrapper"} if isinstance(style, dict) else style,
+        }
+    return json.dumps(deps, sort_keys=True, ensure_ascii=False, default=str)
 
-    char_root = os.path.join(base_path, "characters", char_id)
-    config_path = _character_config_path(char_root)
-    if config_path:
-        _update_hash_with_file(h, config_path)
 
-    portrait_dir = os.path.join(char_root, "portrait")
-    for file in _list_images(portrait_dir):
-        _update_hash_with_file(h, os.path.join(portrait_dir, file))
+def _combination_signatures(
+    char_id: str,
+    base_path: str,
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
+    portraits: List[str],
+    bg_entries: List[Tuple[str, str]],
+    bake_names: bool,
+    hashes: FileHashCache,
+) -> Dict[Tuple[str, str], str]:
+    """
+    Signature of every (portrait, background) pair, portrait-major. Files enter it
+    by content hash, so touched or copied but identical files keep their signature.
+    """
+    shared = _shared_signature(char_id, base_path, config, layout, bake_names, hashes)
+    portrait_dir = os.path.join(base_path, "characters", char_id, "portrait")
+    bg_signatures = [(name, hashes.digest(path)) for name, path in bg_entries]
+    signatures: Dict[Tuple[str, str], str] = {}
+    for p_file in portraits:
+        p_signature = hashes.digest(os.path.join(portrait_dir, p_file))
+        for b_name, b_signature in bg_signatures:
+            raw = json.dumps([shared, p_file, p_signature, b_name, b_signature], ensure_ascii=False)
+            signatures[(p_file, b_name)] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return signatures
 
-    bg_entries = _collect_background_entries(char_id, base_path)
-    for _, bg_path in bg_entries:
-        _update_hash_with_file(h, bg_path)
 
-    return h.hexdigest()
+def _layer_signatures(
+    char_id: str,
+    base_path: str,
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
+    portraits: List[str],
+    bg_entries: List[Tuple[str, str]],
+    hashes: FileHashCache,
+) -> Dict[str, str]:
+    """
+    Signature of every file in _layers/. A background layer depends on the output
+    format (and on the dialog box when stand_on_top bakes it in), a portrait
+    sprite only on its file and stand_scale; positions are applied at render time.
+    """
+    stand_on_top = bool(layout.get("stand_on_top", False))
+    bg_deps: Dict[str, Any] = {
+        "canvas_size": list(CANVAS_SIZE),
+        "cache_format": CACHE_FORMAT,
+        "jpeg_quality": JPEG_QUALITY,
+        "stand_on_top": stand_on_top,
+    }
+    if stand_on_top:
+        box_name = config.get("assets", {}).get("dialog_box", "textbox_bg.png")
+        bg_deps["dialog_box"] = [box_name, hashes.digest(os.path.join(base_path, "characters", char_id, box_name))]
+        bg_deps["box_pos"] = layout.get("box_pos")
+    bg_shared = json.dumps(bg_deps, sort_keys=True, ensure_ascii=False, default=str)
+    p_shared = json.dumps({"stand_scale": layout.get("stand_scale", 1.0)}, sort_keys=True)
+
+    signatures: Dict[str, str] = {}
+    for b_name, b_path in bg_entries:
+        raw = json.dumps([bg_shared, b_name, hashes.digest(b_path)], ensure_ascii=False)
+        signatures[_layer_file_name("b", b_name)] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    portrait_dir = os.path.join(base_path, "characters", char_id, "portrait")
+    for p_file in portraits:
+        raw = json.dumps([p_shared, p_file, hashes.digest(os.path.join(portrait_dir, p_file))], ensure_ascii=False)
+        signatures[_layer_file_name("p", p_file)] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return signatures
 
 
 def _load_cache_meta(char_id: str, cache_path: str = CACHE_PATH) -> Dict[str, object]:
@@ -210,61 +336,231 @@ def _load_cache_meta(char_id: str, cache_path: str = CACHE_PATH) -> Dict[str, ob
         return {}
 
 
+def _save_cache_meta(char_id: str, cache_path: str, meta: Dict[str, Any]) -> None:
+    ensure_dir(os.path.join(cache_path, char_id))
+    meta_path = _cache_meta_path(char_id, cache_path)
+    tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
 def _write_cache_meta(
     char_id: str,
-    portraits: List[str],
-    backgrounds: List[str],
-    base_path: str,
     cache_path: str,
+    signatures: Dict[Tuple[str, str], str],
+    bake_names: bool = False,
+    name_bake: Optional[Dict[str, Any]] = None,
+    pending: Optional[set] = None,
 ) -> None:
-    cache_dir = os.path.join(cache_path, char_id)
-    ensure_dir(cache_dir)
-    meta = {
-        "source_signature": _compute_source_signature(char_id, base_path),
+    """
+    signatures holds every expected pair. In lazy mode pending lists the pairs not
+    on disk yet: they are left out of "combinations" and only kept in "manifest".
+    """
+    meta: Dict[str, Any] = {
         "canvas_size": list(CANVAS_SIZE),
         "cache_format": CACHE_FORMAT,
-        "portrait_count": len(portraits),
-        "background_count": len(backgrounds),
+        "cache_mode": "prebuild" if pending is None else "lazy",
+        "portrait_count": len({p for p, _ in signatures}),
+        "background_count": len({b for _, b in signatures}),
+        "bake_name_layers": bake_names,
+        "combinations": {
+            _cache_file_name(*combo): sig for combo, sig in signatures.items() if not pending or combo not in pending
+        },
     }
-    meta_path = _cache_meta_path(char_id, cache_path)
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    if pending is not None:
+        meta["manifest"] = {_cache_file_name(*combo): sig for combo, sig in signatures.items()}
+    if name_bake:
+        meta["name_bake"] = name_bake
+    with _META_LOCK:
+        _save_cache_meta(char_id, cache_path, meta)
+
+
+def record_cached_bases(char_id: str, cache_path: str, names: List[str]) -> None:
+    """Mark bases saved outside prebuild (lazy mode write-behind) as current in _meta.json."""
+    with _META_LOCK:
+        meta = _load_cache_meta(char_id, cache_path)
+        manifest = meta.get("manifest")
+        if not isinstance(manifest, dict):
+            return
+        combos = meta.setdefault("combinations", {})
+        changed = False
+        for name in names:
+            signature = manifest.get(name)
+            if signature and combos.get(name) != signature:  # type: ignore[union-attr]
+                combos[name] = signature  # type: ignore[index]
+                changed = True
+        if changed:
+            _save_cache_meta(char_id, cache_path, meta)  # type: ignore[arg-type]
+
+
+def _stale_combinations(
+    cache_dir: str,
+    signatures: Dict[Tuple[str, str], str],
+    meta: Dict[str, Any],
+) -> List[Tuple[str, str]]:
+    """Combinations whose signature changed or whose base or name patch is missing."""
+    recorded = meta.get("combinations")
+    if not isinstance(recorded, dict):
+        return list(signatures)
+    name_root = os.path.join(cache_dir, "_name") if meta.get("name_bake") else None
+    stale: List[Tuple[str, str]] = []
+    for combo, signature in signatures.items():
+        save_name = _cache_file_name(*combo)
+        if (
+            recorded.get(save_name) != signature
+            or not os.path.exists(os.path.join(cache_dir, save_name))
+            or (name_root and not os.path.exists(os.path.join(name_root, f"{os.path.splitext(save_name)[0]}.png")))
+        ):
+            stale.append(combo)
+    return stale
+
+
+def _missing_variants(
+    signatures: Dict[Tuple[str, str], str],
+    stale: List[Tuple[str, str]],
+    variant_dirs: List[str],
+) -> List[Tuple[str, str]]:
+    """Up-to-date combinations missing their crop / output profile file; their bases are kept as is."""
+    rebuilt = set(stale)
+    return [
+        combo for combo in signatures
+        if combo not in rebuilt
+        and any(not os.path.exists(os.path.join(folder, _cache_file_name(*combo))) for folder in variant_dirs)
+    ]
+
+
+def _orphaned_cache_files(cache_dir: str, expected: set) -> List[str]:
+    """Base canvases in cache_dir that no longer match a portrait × background pair."""
+    if not os.path.isdir(cache_dir):
+        return []
+    return sorted(
+        f for f in os.listdir(cache_dir)
+        if f.startswith("p_") and "__b_" in f and f.lower().endswith(CACHE_FILE_EXTS) and f not in expected
+    )
+
 
+def _purge_cache_files(
+    cache_dir: str,
+    signatures: Dict[Tuple[str, str], str],
+    stale: List[Tuple[str, str]],
+    orphans: List[str],
+    crop_dir: Optional[str],
+) -> None:
+    """
+    Delete orphaned bases and the files of stale combinations (base and every
+    variant), plus the layers left by a previous layered cache.
+    """
+    shutil.rmtree(os.path.join(cache_dir, LAYER_DIR), ignore_errors=True)
+    for name in orphans + [_cache_file_name(*combo) for combo in stale]:
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    valid_stems = {os.path.splitext(_cache_file_name(*combo))[0] for combo in signatures}
+    removed_stems = {os.path.splitext(_cache_file_name(*combo))[0] for combo in stale}
+    removed_stems.update(os.path.splitext(name)[0] for name in orphans if os.path.splitext(name)[0] not in valid_stems)
+    _remove_cache_variants(cache_dir, removed_stems, os.path.basename(crop_dir) if crop_dir else None)
+
+
+def _remove_cache_variants(cache_dir: str, stems: set, crop_dirname: Optional[str]) -> None:
+    """
+    Delete the _crop / _profiles / _name files of the given combinations, plus the
+    crop variants of crop boxes no longer in use.
+    """
+    crop_root = os.path.join(cache_dir, "_crop")
+    if os.path.isdir(crop_root):
+        for entry in os.listdir(crop_root):
+            if entry != crop_dirname:
+                shutil.rmtree(os.path.join(crop_root, entry), ignore_errors=True)
+    if not stems:
+        return
+    for sub in ("_crop", "_profiles", "_name"):
+        for root, _, files in os.walk(os.path.join(cache_dir, sub)):
+            for f in files:
+                if os.path.splitext(f)[0] in stems:
+                    os.remove(os.path.join(root, f))
 
-def _cache_is_complete(
+
+def _cache_state(
     char_id: str,
+    base_path: str,
+    cache_path: str,
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
     portraits: List[str],
-    backgrounds: List[str],
+    bg_entries: List[Tuple[str, str]],
+    bake_names: bool,
+    force: bool = False,
+) -> Tuple[Dict[Tuple[str, str], str], List[Tuple[str, str]], List[Tuple[str, str]], List[str]]:
+    """
+    (signatures, stale combinations, combinations missing only a crop / profile
+    variant, orphaned base files) of a character's cache.
+    """
+    cache_dir = os.path.join(cache_path, char_id)
+    hashes = _file_hashes(cache_path)
+    signatures = _combination_signatures(
+        char_id, base_path, config, layout, portraits, bg_entries, bake_names, hashes
+    )
+    hashes.save()
+    meta = {} if force else _load_cache_meta(char_id, cache_path)
+    stale = _stale_combinations(cache_dir, signatures, meta)
+    variant_dirs = [d for d in (_crop_dir(cache_dir, layout), _profile_dir(cache_dir)) if d]
+    variants = _missing_variants(signatures, stale, variant_dirs)
+    expected = {_cache_file_name(*combo) for combo in signatures}
+    return signatures, stale, variants, _orphaned_cache_files(cache_dir, expected)
+
+
+def _layer_state(
+    char_id: str,
     base_path: str,
     cache_path: str,
-) -> bool:
-    if not portraits or not backgrounds:
-        return False
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
+    portraits: List[str],
+    bg_entries: List[Tuple[str, str]],
+    force: bool = False,
+) -> Tuple[Dict[str, str], List[str], List[str]]:
+    """(signatures, stale layer files, orphaned layer files) of a layered cache."""
+    layer_dir = os.path.join(cache_path, char_id, LAYER_DIR)
+    hashes = _file_hashes(cache_path)
+    signatures = _layer_signatures(char_id, base_path, config, layout, portraits, bg_entries, hashes)
+    hashes.save()
+    meta = {} if force else _load_cache_meta(char_id, cache_path)
+    layers = meta.get("layers") if meta.get("cache_mode") == "layered" else None
+    recorded = layers.get("files") if isinstance(layers, dict) else None
+    if not isinstance(recorded, dict):
+        recorded = {}
+    stale = [
+        name for name, signature in signatures.items()
+        if recorded.get(name) != signature or not os.path.exists(os.path.join(layer_dir, name))
+    ]
+    orphans = sorted(
+        f for f in (os.listdir(layer_dir) if os.path.isdir(layer_dir) else [])
+        if f not in signatures
+    )
+    return signatures, stale, orphans
 
-    cache_dir = os.path.join(cache_path, char_id)
-    if not os.path.isdir(cache_dir):
-        return False
 
-    expected = _expected_cache_count(portraits, backgrounds)
-    existing = len([f for f in os.listdir(cache_dir) if f.lower().endswith(CACHE_EXT)])
-    if existing < expected:
-        return False
+def _crop_dir(cache_dir: str, layout: Dict[str, Any]) -> Optional[str]:
+    crop_box = resolve_crop_box(layout, CANVAS_SIZE)
+    return os.path.join(cache_dir, "_crop", crop_cache_dirname(crop_box)) if crop_box else None
+
+
+def _profile_dir(cache_dir: str) -> Optional[str]:
+    profile_size = _active_profile_size()
+    return os.path.join(cache_dir, "_profiles", profile_cache_dirname(profile_size)) if profile_size else None
+
+
+def _active_profile_size() -> Optional[Tuple[int, int]]:
+    """Canvas size of render.output_profile when it is smaller than CANVAS_SIZE."""
+    cfg: dict = load_global_config() or {}
+    render = cfg.get("render", {})
+    profile = load_output_profiles(render).get(str(render.get("output_profile") or ""))
+    if not profile:
+        return None
+    size = output_profile_size(CANVAS_SIZE, profile)
+    return size if size != CANVAS_SIZE else None
 
-    meta = _load_cache_meta(char_id, cache_path)
-    if not meta:
-        return False
-    if int(meta.get("portrait_count", -1)) != len(portraits): # type: ignore
-        return False
-    if int(meta.get("background_count", -1)) != len(backgrounds): # type: ignore
-        return False
-    if tuple(meta.get("canvas_size", [])) != CANVAS_SIZE: # type: ignore
-        return False
-    if meta.get("cache_format") != CACHE_FORMAT:
-        return False
-    if meta.get("source_signature") != _compute_source_signature(char_id, base_path):
-        return False
-
-    return True
 
 def _fit_dialog_box_to_canvas(box_img: Image.Image) -> Tuple[Image.Image, Tuple[int, int]]:
     """Resize dialog box to canvas width and bottom align."""
@@ -276,13 +572,25 @@ def _fit_dialog_box_to_canvas(box_img: Image.Image) -> Tuple[Image.Image, Tuple[
     box_pos = (0, canvas_h - box_img.height)
     return box_img, box_pos
 
+
+def _pre_scaled_background_path(char_id: str, base_path: str, name: str) -> str:
+    base, ext = os.path.splitext(name)
+    return os.path.join(
+        base_path, "pre_scaled", "characters", char_id, "background", f"{base}{SCALED_TAG}{ext}"
+    )
+
+
 def _prepare_background_images(
     char_id: str,
     base_path: str,
     progress: Optional[ProgressCallback],
+    names: Optional[set] = None,
 ) -> Dict[str, Image.Image]:
-    """Load/scale backgrounds and persist them into assets/pre_scaled."""
-    entries = _collect_background_entries(char_id, base_path)
+    """Load/scale backgrounds (only names when given) and persist them into assets/pre_scaled."""
+    entries = [
+        (name, path) for name, path in _collect_background_entries(char_id, base_path)
+        if names is None or name in names
+    ]
     if not entries:
         return {}
 
@@ -293,9 +601,7 @@ def _prepare_background_images(
     _notify_progress(progress, "prepare_bg", 0, len(entries), "正在预处理背景...")
 
     for idx, (name, src_path) in enumerate(entries, start=1):
-        base, ext = os.path.splitext(name)
-        scaled_name = f"{base}{SCALED_TAG}{ext}"
-        pre_scaled_path = os.path.join(pre_scaled_dir, scaled_name)
+        pre_scaled_path = _pre_scaled_background_path(char_id, base_path, name)
         legacy_path = os.path.join(pre_scaled_dir, name)
 
         if os.path.exists(pre_scaled_path):
@@ -333,8 +639,27 @@ def prebuild_character(
     cache_path: str = CACHE_PATH,
     force: bool = False,
     progress: Optional[ProgressCallback] = None,
+    bake_names: Optional[bool] = None,
+    jobs: Optional[int] = None,
+    pool: Optional[Executor] = None,
+    cache_mode: Optional[str] = None,
 ) -> None:
+    """
+    Composite portrait × background pairs into cache/<char>/. Only pairs whose
+    signature in _meta.json is stale are rebuilt (all of them with force) and files
+    of removed portraits / backgrounds are deleted.
+    bake_names (default: render.bake_name_layers) also draws the default speaker's
+    name into the canvases and keeps the unbaked pixels in cache/<char>/_name.
+    Combinations are sharded over jobs processes (default: render.prebuild_jobs) or
+    over pool when given; the selected portrait × background is built first.
+    With cache_mode (default: render.cache_mode) layered the cache holds layers
+    instead (see _prebuild_layers).
+    """
     _refresh_render_preferences()
+    start = time.perf_counter()
+    mode = cache_mode if cache_mode in CACHE_MODES else _cache_mode()
+    if bake_names is None:
+        bake_names = _default_bake_names(mode)
     print(f"🚧 开始预处理角色: {char_id}")
     _notify_progress(progress, "start", 0, 0, f"开始预处理角色 {char_id}")
 
@@ -362,22 +687,41 @@ def prebuild_character(
 
     portrait_dir = os.path.join(char_root, "portrait")
     portraits = _list_images(portrait_dir)
-
-    bg_images = _prepare_background_images(char_id, base_path, progress)
-    backgrounds = list(bg_images.keys())
+    bg_entries = _collect_background_entries(char_id, base_path)
 
     if not portraits:
         msg = "⚠️ 没有立绘，跳过预处理"
         print(msg)
         _notify_progress(progress, "error", 0, 0, msg)
         return
-    if not backgrounds:
+    if not bg_entries:
         msg = "⚠️ 没有背景，跳过预处理"
         print(msg)
         _notify_progress(progress, "error", 0, 0, msg)
         return
 
-    if not force and _cache_is_complete(char_id, portraits, backgrounds, base_path, cache_path):
+    if mode == "layered":
+        _prebuild_layers(char_id, base_path, cache_path, config, layout, portraits, bg_entries, force, progress, start)
+        return
+
+    char_cache_dir = os.path.join(cache_path, char_id)
+    crop_box = resolve_crop_box(layout, CANVAS_SIZE)
+    crop_dir = _crop_dir(char_cache_dir, layout)
+    signatures, stale, variants, orphans = _cache_state(
+        char_id, base_path, cache_path, config, layout, portraits, bg_entries, bake_names, force
+    )
+
+    # 删除已不存在的立绘 / 背景对应的底图，以及待重建组合的底图与裁剪、缩放、名字文件
+    _purge_cache_files(char_cache_dir, signatures, stale, orphans, crop_dir)
+    if not bake_names:
+        shutil.rmtree(os.path.join(char_cache_dir, "_name"), ignore_errors=True)
+
+    if not stale and not variants:
+        if orphans:
+            meta = _load_cache_meta(char_id, cache_path)
+            _write_cache_meta(char_id, cache_path, signatures, bake_names, meta.get("name_bake"))  # type: ignore[arg-type]
+            shutil.rmtree(os.path.join(char_cache_dir, "_renders"), ignore_errors=True)
+            print(f"🧹 已清理 {len(orphans)} 张多余的底图")
         print("✅ 缓存已存在，跳过预处理")
         _notify_progress(progress, "skip", 0, 0, "缓存已存在，无需重新生成")
         return
@@ -390,63 +734,419 @@ def prebuild_character(
         _notify_progress(progress, "error", 0, 0, msg)
         return
 
+    # 只准备待重建组合用到的背景
+    bg_images = _prepare_background_images(char_id, base_path, progress, {b for _, b in stale + variants})
+
     raw_box_img = Image.open(box_path).convert("RGBA")
     box_img = _scale_box_to_canvas(raw_box_img)
     box_pos = _resolve_box_position(layout, box_img)
 
-    char_cache_dir = os.path.join(cache_path, char_id)
     ensure_dir(char_cache_dir)
-
-    total = _expected_cache_count(portraits, backgrounds)
+    # 启用裁剪时额外保存裁剪后的底图，渲染时无需解码整张画布
+    if crop_dir:
+        ensure_dir(crop_dir)
+
+    # 输出配置的缩放底图由渲染器按需生成；当前使用的配置在这里一并生成
+    profile_size = _active_profile_size()
+    profile_dir = _profile_dir(char_cache_dir)
+    if profile_dir:
+        ensure_dir(profile_dir)
+
+    # 预烘焙默认说话人的名字；_name 下保存名字区域烘焙前的像素，供其他说话人还原
+    name_root = os.path.join(char_cache_dir, "_name")
+    name_renderer, name_bake = _prepare_name_bake(char_id, base_path) if bake_names else (None, None)
+    name_box: Optional[Tuple[int, int, int, int]] = None
+    if name_bake:
+        name_box = tuple(name_bake["box"])  # type: ignore[assignment]
+        ensure_dir(name_root)
+
+    # 底图未过期、只缺裁剪 / 缩放文件的组合只补写这些文件，底图与签名保持不变
+    total = len(stale) + len(variants)
     count = 0
     _notify_progress(progress, "composite", 0, total, "开始生成底图")
 
-    for p_file in portraits:
-        portrait_img = Image.open(os.path.join(portrait_dir, p_file)).convert("RGBA")
-        if stand_scale != 1.0:
-            new_w = int(portrait_img.width * stand_scale)
-            new_h = int(portrait_img.height * stand_scale)
-            portrait_img = portrait_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    spec: Dict[str, Any] = {
+        "build_id": f"{char_id}:{os.getpid()}:{time.time_ns()}",
+        "char_id": char_id,
+        "base_path": base_path,
+        "canvas_size": CANVAS_SIZE,
+        "preferences": (CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY, BAKE_NAME_LAYERS),
+        "portrait_dir": portrait_dir,
+        "stand_pos": stand_pos,
+        "stand_scale": stand_scale,
+        "stand_on_top": stand_on_top,
+        "box_path": box_path,
+        "box_pos": box_pos,
+        "backgrounds": {b: _pre_scaled_background_path(char_id, base_path, b) for b in bg_images},
+        "cache_dir": char_cache_dir,
+        "crop_box": crop_box,
+        "crop_dir": crop_dir,
+        "profile_size": profile_size,
+        "profile_dir": profile_dir,
+        "name_box": name_box if name_renderer else None,
+        "name_root": name_root,
+        "variant_only": set(variants),
+    }
+    # 本进程已准备好的图层直接交给在本进程执行的任务（fork 出的子进程也会继承）
+    state = _worker_state(spec)
+    state["preloaded"] = bg_images
+    state["box"] = box_img
+    state["name_renderer"] = name_renderer
+
+    variant_names = {_cache_file_name(*combo) for combo in variants}
+    tasks = _plan_tasks(stale + variants, _selected_combination(layout))
+    workers = _resolve_jobs(jobs)
+    try:
+        for saved in _run_tasks(spec, tasks, workers, pool):
+            for save_name in saved:
+                count += 1
+                action = "已补全裁剪 / 缩放底图" if save_name in variant_names else "已生成"
+                _notify_progress(
+                    progress,
+                    "composite",
+                    count,
+                    total,
+                    f"[{count}/{total}] {action} {save_name}",
+                )
+    finally:
+        # 释放本进程持有的图层
+        _WORKER.clear()
+
+    _write_cache_meta(char_id, cache_path, signatures, bake_names, name_bake)
+    if stale or orphans:
+        # 底图已变化，旧的渲染结果缓存一并作废
+        shutil.rmtree(os.path.join(char_cache_dir, "_renders"), ignore_errors=True)
+    elapsed = time.perf_counter() - start
+    summary = f"重新生成 {len(stale)}/{len(signatures)} 张底图"
+    if variants:
+        summary += f"，补全 {len(variants)} 张底图的裁剪 / 缩放文件"
+    print(f"✅ {char_id} 预处理完成，{summary}，用时 {elapsed:.1f} 秒。\n")
+    _notify_progress(progress, "done", count, total, f"{char_id} 预处理完成")
 
-        p_key = os.path.splitext(p_file)[0]
 
-        for b_name in backgrounds:
-            canvas = Image.new("RGBA", CANVAS_SIZE)
-            canvas.paste(bg_images[b_name], (0, 0))
+def _prebuild_layers(
+    char_id: str,
+    base_path: str,
+    cache_path: str,
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
+    portraits: List[str],
+    bg_entries: List[Tuple[str, str]],
+    force: bool,
+    progress: Optional[ProgressCallback],
+    start: float,
+) -> None:
+    """
+    Layered cache: one base per background (with the dialog box baked in when
+    stand_on_top puts it under the portrait) plus one alpha-trimmed sprite per
+    portrait, N + M files instead of N × M. The renderer blends them per message.
+    """
+    cache_dir = os.path.join(cache_path, char_id)
+    layer_dir = os.path.join(cache_dir, LAYER_DIR)
+    signatures, stale, orphans = _layer_state(
+        char_id, base_path, cache_path, config, layout, portraits, bg_entries, force
+    )
 
-            if stand_on_top:
-                canvas.paste(box_img, box_pos, box_img)
-                canvas.paste(portrait_img, stand_pos, portrait_img)
-            else:
-                canvas.paste(portrait_img, stand_pos, portrait_img)
-                canvas.paste(box_img, box_pos, box_img)
-
-            save_name = f"p_{p_key}__b_{os.path.splitext(b_name)[0]}{CACHE_EXT}"
-            save_path = os.path.join(char_cache_dir, save_name)
-
-            if CACHE_FORMAT == "jpeg":
-                canvas_rgb = canvas.convert("RGB")
-                canvas_rgb.save(
-                    save_path,
-                    "JPEG",
-                    quality=JPEG_QUALITY,
-                    optimize=True,
-                )
-            else:
-                canvas.save(save_path, "PNG", optimize=True)
-
-            count += 1
-            _notify_progress(
-                progress,
-                "composite",
-                count,
-                total,
-                f"[{count}/{total}] 已生成 {save_name}",
-            )
-
-    _write_cache_meta(char_id, portraits, backgrounds, base_path, cache_path)
-    print(f"✅ {char_id} 预处理完成，共生成 {count} 张底图。\n")
-    _notify_progress(progress, "done", count, total, f"{char_id} 预处理完成")
+    # 整张的 立绘 × 背景 底图及其裁剪 / 缩放 / 名字文件在分层模式下不再使用
+    flat_files = _orphaned_cache_files(cache_dir, set())
+    for name in flat_files:
+        os.remove(os.path.join(cache_dir, name))
+    for sub in ("_crop", "_profiles", "_name"):
+        shutil.rmtree(os.path.join(cache_dir, sub), ignore_errors=True)
+    for name in orphans:
+        os.remove(os.path.join(layer_dir, name))
+
+    stand_on_top = bool(layout.get("stand_on_top", False))
+    if not stale:
+        if orphans or flat_files:
+            _write_layer_meta(char_id, cache_path, signatures, stand_on_top)
+            shutil.rmtree(os.path.join(cache_dir, "_renders"), ignore_errors=True)
+            print(f"🧹 已清理 {len(orphans) + len(flat_files)} 个不再使用的缓存文件")
+        print("✅ 缓存已存在，跳过预处理")
+        _notify_progress(progress, "skip", 0, 0, "缓存已存在，无需重新生成")
+        return
+
+    sources = {_layer_file_name("b", b_name): b_name for b_name, _ in bg_entries}
+    sources.update({_layer_file_name("p", p_file): p_file for p_file in portraits})
+    stale_bgs = {sources[name] for name in stale if name.startswith("b_")}
+
+    box_layers: List[Tuple[Image.Image, Tuple[int, int]]] = []
+    if stand_on_top and stale_bgs:
+        box_name = config.get("assets", {}).get("dialog_box", "textbox_bg.png")
+        box_path = os.path.join(base_path, "characters", char_id, box_name)
+        if not os.path.exists(box_path):
+            msg = f"❗ 找不到对话框图片 {box_path}"
+            print(msg)
+            _notify_progress(progress, "error", 0, 0, msg)
+            return
+        box_img = _scale_box_to_canvas(Image.open(box_path).convert("RGBA"))
+        box_layers.append((box_img, _resolve_box_position(layout, box_img)))
+
+    bg_images = _prepare_background_images(char_id, base_path, progress, stale_bgs) if stale_bgs else {}
+    portrait_dir = os.path.join(base_path, "characters", char_id, "portrait")
+    stand_scale = layout.get("stand_scale", 1.0)
+    ensure_dir(layer_dir)
+
+    total = len(stale)
+    _notify_progress(progress, "composite", 0, total, "开始生成图层")
+    for count, name in enumerate(stale, start=1):
+        save_path = os.path.join(layer_dir, name)
+        if name.startswith("b_"):
+            _save_canvas(_composite_layers(bg_images[sources[name]], box_layers), save_path)
+        else:
+            sprite, offset = _portrait_sprite(os.path.join(portrait_dir, sources[name]), stand_scale)
+            # 裁掉的透明边的偏移记在贴图里，渲染时加到 stand_pos 上
+            info = PngImagePlugin.PngInfo()
+            info.add_text(SPRITE_OFFSET_KEY, f"{offset[0]},{offset[1]}")
+            sprite.save(save_path, "PNG", compress_level=1, pnginfo=info)
+        _notify_progress(progress, "composite", count, total, f"[{count}/{total}] 已生成 {name}")
+
+    _write_layer_meta(char_id, cache_path, signatures, stand_on_top)
+    shutil.rmtree(os.path.join(cache_dir, "_renders"), ignore_errors=True)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {char_id} 预处理完成，重新生成 {total}/{len(signatures)} 个图层，用时 {elapsed:.1f} 秒。\n")
+    _notify_progress(progress, "done", total, total, f"{char_id} 预处理完成")
+
+
+def _portrait_sprite(path: str, stand_scale: float) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Portrait scaled by stand_scale and trimmed to its alpha bounds; returns (sprite, offset)."""
+    img = Image.open(path).convert("RGBA")
+    if stand_scale != 1.0:
+        new_w = int(img.width * stand_scale)
+        new_h = int(img.height * stand_scale)
+        img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    bbox = img.getchannel("A").getbbox()
+    if bbox is None:
+        return img.crop((0, 0, 1, 1)), (0, 0)
+    return img.crop(bbox), (bbox[0], bbox[1])
+
+
+def _write_layer_meta(char_id: str, cache_path: str, signatures: Dict[str, str], box_baked: bool) -> None:
+    meta: Dict[str, Any] = {
+        "canvas_size": list(CANVAS_SIZE),
+        "cache_format": CACHE_FORMAT,
+        "cache_mode": "layered",
+        "portrait_count": sum(1 for name in signatures if name.startswith("p_")),
+        "background_count": sum(1 for name in signatures if name.startswith("b_")),
+        "bake_name_layers": False,
+        "layers": {"box_baked": box_baked, "files": signatures},
+    }
+    with _META_LOCK:
+        _save_cache_meta(char_id, cache_path, meta)
+
+
+def _cache_mode() -> str:
+    cfg: dict = load_global_config() or {}
+    mode = str(cfg.get("render", {}).get("cache_mode", "prebuild")).lower()
+    return mode if mode in CACHE_MODES else "prebuild"
+
+
+def _default_bake_names(mode: Optional[str] = None) -> bool:
+    # 按需缓存的底图由实时合成得到、分层缓存没有整张底图，两者都不烘焙名字
+    return BAKE_NAME_LAYERS and (mode or _cache_mode()) == "prebuild"
+
+
+def _selected_combination(layout: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Portrait / background file currently selected in the editor (layout.current_*)."""
+    portrait = layout.get("current_portrait") or None
+    background = layout.get("current_background") or None
+    return portrait, background
+
+
+def _plan_tasks(
+    combinations: List[Tuple[str, str]],
+    selected: Tuple[Optional[str], Optional[str]] = (None, None),
+    per_task: int = COMBOS_PER_TASK,
+) -> List[Tuple[str, List[str]]]:
+    """
+    Shard portrait-major (portrait, background) pairs into (portrait, backgrounds)
+    tasks of at most per_task combinations. The selected combination is a task of
+    its own and comes first, followed by the rest of the selected portrait, the
+    selected background with other portraits, then everything else.
+    """
+    cur_p, cur_b = selected
+    combos = sorted(
+        combinations,
+        key=lambda combo: (combo[0] != cur_p, combo[1] != cur_b),
+    )
+    alone = bool(combos) and combos[0] == (cur_p, cur_b)
+    tasks: List[Tuple[str, List[str]]] = []
+    for p_file, b_name in combos:
+        last = tasks[-1] if tasks else None
+        if last and last[0] == p_file and len(last[1]) < per_task and not (alone and len(tasks) == 1):
+            last[1].append(b_name)
+        else:
+            tasks.append((p_file, [b_name]))
+    return tasks
+
+
+def _resolve_jobs(jobs: Optional[int]) -> int:
+    if jobs is None:
+        cfg: dict = load_global_config() or {}
+        try:
+            jobs = int(cfg.get("render", {}).get("prebuild_jobs", 0))
+        except (TypeError, ValueError):
+            jobs = 0
+    # 0 表示使用全部 CPU 核心
+    return max(1, jobs or os.cpu_count() or 1)
+
+
+def _run_tasks(
+    spec: Dict[str, Any],
+    tasks: List[Tuple[str, List[str]]],
+    jobs: int,
+    pool: Optional[Executor] = None,
+) -> Iterator[List[str]]:
+    """Yield the file names saved by each task as it finishes."""
+    if not tasks:
+        return
+    if pool is None and (jobs <= 1 or len(tasks) == 1):
+        for p_file, b_names in tasks:
+            yield _build_combinations(spec, p_file, b_names)
+        return
+
+    owned = pool is None
+    executor: Executor = pool or ProcessPoolExecutor(max_workers=min(jobs, len(tasks) - 1))
+    try:
+        futures = [executor.submit(_build_combinations, spec, p_file, b_names) for p_file, b_names in tasks[1:]]
+        # 第一个任务（当前选中的组合）在本进程里用已准备好的图层立即生成，不等子进程启动
+        yield _build_combinations(spec, *tasks[0])
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        if owned:
+            executor.shutdown(cancel_futures=True)
+
+
+# 预构建任务在各进程中的状态：同一次预构建的图层在首次用到时解码，之后只读复用
+_WORKER: Dict[str, Any] = {}
+
+
+def _worker_state(spec: Dict[str, Any]) -> Dict[str, Any]:
+    global CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY, BAKE_NAME_LAYERS
+    if _WORKER.get("build_id") != spec["build_id"]:
+        _WORKER.clear()
+        _WORKER.update(
+            build_id=spec["build_id"],
+            preloaded={},
+            backgrounds=LRUCache(WORKER_BACKGROUND_ENTRIES),
+            portrait=None,
+            box=None,
+            name_renderer=None,
+        )
+        # 子进程按主进程的画布与缓存格式生成
+        _apply_canvas_size(tuple(spec["canvas_size"]))  # type: ignore[arg-type]
+        CACHE_FORMAT, CACHE_EXT, JPEG_QUALITY, BAKE_NAME_LAYERS = spec["preferences"]
+    return _WORKER
+
+
+def _background_layer(state: Dict[str, Any], spec: Dict[str, Any], b_name: str) -> Image.Image:
+    img = state["preloaded"].get(b_name)
+    if img is None:
+        img = state["backgrounds"].get(b_name)
+    if img is None:
+        img = Image.open(spec["backgrounds"][b_name]).convert("RGBA")
+        if img.size != CANVAS_SIZE:
+            img = img.resize(CANVAS_SIZE, Image.Resampling.LANCZOS)
+        state["backgrounds"].put(b_name, img)
+    return img
+
+
+def _portrait_layer(state: Dict[str, Any], spec: Dict[str, Any], p_file: str) -> Image.Image:
+    cached = state["portrait"]
+    if cached is not None and cached[0] == p_file:
+        return cached[1]
+    portrait_img = Image.open(os.path.join(spec["portrait_dir"], p_file)).convert("RGBA")
+    stand_scale = spec["stand_scale"]
+    if stand_scale != 1.0:
+        new_w = int(portrait_img.width * stand_scale)
+        new_h = int(portrait_img.height * stand_scale)
+        portrait_img = portrait_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+    state["portrait"] = (p_file, portrait_img)
+    return portrait_img
+
+
+def _composite_layers(
+    background: Image.Image,
+    layers: List[Tuple[Image.Image, Tuple[int, int]]],
+) -> Image.Image:
+    """Copy of a canvas-sized RGBA background with the RGBA layers pasted in order."""
+    canvas = background.copy()
+    for img, pos in layers:
+        canvas.paste(img, pos, img)
+    return canvas
+
+
+def _build_combinations(spec: Dict[str, Any], p_file: str, b_names: List[str]) -> List[str]:
+    """
+    Composite one portrait over b_names and save every variant; returns the saved
+    file names. Pairs in spec["variant_only"] only get their missing crop / profile
+    files written, their base and name patch are left alone.
+    """
+    state = _worker_state(spec)
+    if state["box"] is None:
+        state["box"] = _scale_box_to_canvas(Image.open(spec["box_path"]).convert("RGBA"))
+    name_box = spec["name_box"]
+    if name_box and state["name_renderer"] is None:
+        state["name_renderer"] = _prepare_name_bake(spec["char_id"], spec["base_path"])[0]
+    name_renderer = state["name_renderer"] if name_box else None
+
+    layers = [(_portrait_layer(state, spec, p_file), spec["stand_pos"]), (state["box"], spec["box_pos"])]
+    if spec["stand_on_top"]:
+        layers.reverse()
+
+    crop_box, crop_dir = spec["crop_box"], spec["crop_dir"]
+    profile_size, profile_dir = spec["profile_size"], spec["profile_dir"]
+    saved: List[str] = []
+    for b_name in b_names:
+        canvas = _composite_layers(_background_layer(state, spec, b_name), layers)
+        save_name = _cache_file_name(p_file, b_name)
+        save_stem = os.path.splitext(save_name)[0]
+        full = (p_file, b_name) not in spec["variant_only"]
+        profile_path = os.path.join(profile_dir, save_name) if profile_dir and profile_size else None
+        crop_path = os.path.join(crop_dir, save_name) if crop_dir and crop_box else None
+        if profile_path and (full or not os.path.exists(profile_path)):
+            # 在烘焙名字之前缩放，名字按目标尺寸的字号现画
+            _save_canvas(canvas.resize(tuple(profile_size), Image.Resampling.LANCZOS), profile_path)
+        if name_renderer and name_box:
+            if full:
+                patch_path = os.path.join(spec["name_root"], f"{save_stem}.png")
+                canvas.crop(tuple(name_box)).save(patch_path, "PNG", compress_level=1)
+            name_renderer.draw_default_name(canvas)
+        if full:
+            _save_canvas(canvas, os.path.join(spec["cache_dir"], save_name))
+        if crop_path and (full or not os.path.exists(crop_path)):
+            _save_canvas(canvas.crop(tuple(crop_box)), crop_path)
+        saved.append(save_name)
+    return saved
+
+
+def _prepare_name_bake(char_id: str, base_path: str) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """Renderer used to draw the default name, plus the name_bake entry for _meta.json."""
+    from .renderer import CharacterRenderer
+
+    renderer = CharacterRenderer(char_id, base_path, output_profile="")
+    if tuple(renderer.canvas_size) != CANVAS_SIZE:
+        print("⚠️ 渲染器画布尺寸与预处理不一致，跳过名字预烘焙")
+        return None, None
+    name_bake = renderer.name_bake_layer()
+    if not name_bake:
+        return None, None
+    print(f"🏷️ 预烘焙名字: {name_bake['speaker']}")
+    return renderer, name_bake
+
+
+def _save_canvas(canvas: Image.Image, save_path: str) -> None:
+    if CACHE_FORMAT == "jpeg":
+        canvas_rgb = canvas.convert("RGB")
+        canvas_rgb.save(
+            save_path,
+            "JPEG",
+            quality=JPEG_QUALITY,
+            optimize=True,
+        )
+    else:
+        canvas.save(save_path, "PNG", optimize=True)
 
 
 def _scale_box_to_canvas(box_img: Image.Image) -> Image.Image:
@@ -478,25 +1178,137 @@ def ensure_character_cache(
     base_path: str = BASE_PATH,
     cache_path: str = CACHE_PATH,
 ) -> None:
+    """
+    Bring the cache up to date, rebuilding only stale combinations (or stale
+    layers with render.cache_mode: layered). With render.cache_mode: lazy nothing
+    is composited here: stale files are dropped and the renderer fills in missing
+    bases on first use.
+    """
     _refresh_render_preferences()
-    _configure_canvas_for_character(char_id, base_path)
-    portrait_dir = os.path.join(base_path, "characters", char_id, "portrait")
-    portraits = _list_images(portrait_dir)
-    backgrounds = [name for name, _ in _collect_background_entries(char_id, base_path)]
+    config = _configure_canvas_for_character(char_id, base_path)
+    layout = normalize_layout(config.get("layout", {}), CANVAS_SIZE)
+    portraits = _list_images(os.path.join(base_path, "characters", char_id, "portrait"))
+    bg_entries = _collect_background_entries(char_id, base_path)
 
-    if _cache_is_complete(char_id, portraits, backgrounds, base_path, cache_path):
+    mode = _cache_mode()
+    if mode == "lazy":
+        _sync_lazy_cache(char_id, base_path, cache_path, config, layout, portraits, bg_entries)
+        return
+
+    if mode == "layered":
+        _, stale, orphans = _layer_state(char_id, base_path, cache_path, config, layout, portraits, bg_entries)
+        # 切换模式后留下的整张底图也需要清理
+        orphans += _orphaned_cache_files(os.path.join(cache_path, char_id), set())
+    else:
+        _, stale, variants, orphans = _cache_state(
+            char_id, base_path, cache_path, config, layout, portraits, bg_entries, _default_bake_names()
+        )
+        stale += variants
+    if not stale and not orphans:
         return
 
     prebuild_character(
         char_id,
         base_path=base_path,
         cache_path=cache_path,
-        force=True,
     )
 
 
+def _sync_lazy_cache(
+    char_id: str,
+    base_path: str,
+    cache_path: str,
+    config: Dict[str, Any],
+    layout: Dict[str, Any],
+    portraits: List[str],
+    bg_entries: List[Tuple[str, str]],
+) -> None:
+    """
+    Manifest check of lazy mode: delete files whose signature changed (or that
+    cannot be verified) and orphans, then record the expected signatures so
+    bases written later by the renderer can be marked current.
+    """
+    cache_dir = os.path.join(cache_path, char_id)
+    hashes = _file_hashes(cache_path)
+    signatures = _combination_signatures(char_id, base_path, config, layout, portraits, bg_entries, False, hashes)
+    hashes.save()
+
+    meta = _load_cache_meta(char_id, cache_path)
+    recorded = meta.get("combinations") if isinstance(meta.get("combinations"), dict) else {}
+    known = meta.get("manifest") if isinstance(meta.get("manifest"), dict) else recorded
+    expected = {_cache_file_name(*combo): combo for combo in signatures}
+    changed: List[Tuple[str, str]] = []
+    pending: set = set()
+    for name, combo in expected.items():
+        signature = signatures[combo]
+        exists = os.path.exists(os.path.join(cache_dir, name))
+        # 签名变化，或文件存在却没有任何记录（无法确认是否过期）
+        if known.get(name, signature if not exists else None) != signature:  # type: ignore[union-attr]
+            changed.append(combo)
+        if not exists or recorded.get(name) != signature:  # type: ignore[union-attr]
+            pending.add(combo)
+    orphans = _orphaned_cache_files(cache_dir, set(expected))
+
+    manifest = {name: signatures[combo] for name, combo in expected.items()}
+    if not changed and not orphans and meta.get("cache_mode") == "lazy" and meta.get("manifest") == manifest:
+        return
+    _purge_cache_files(cache_dir, signatures, changed, orphans, _crop_dir(cache_dir, layout))
+    if changed or orphans:
+        shutil.rmtree(os.path.join(cache_dir, "_renders"), ignore_errors=True)
+    _write_cache_meta(char_id, cache_path, signatures, False, None, pending)
+    ready = len(signatures) - len(pending)
+    print(f"🗂️ {char_id} 按需缓存：{ready}/{len(signatures)} 张底图可用，其余首次使用时生成")
+
+
+def list_characters(base_path: str = BASE_PATH) -> List[str]:
+    characters_root = os.path.join(base_path, "characters")
+    if not os.path.isdir(characters_root):
+        return []
+    return sorted(
+        folder for folder in os.listdir(characters_root)
+        if os.path.isdir(os.path.join(characters_root, folder))
+    )
+
+
+def prebuild_all(
+    characters: List[str],
+    base_path: str = BASE_PATH,
+    cache_path: str = CACHE_PATH,
+    force: bool = False,
+    jobs: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> None:
+    """Prebuild several characters, sharing one process pool across all of them."""
+    workers = _resolve_jobs(jobs)
+    if workers <= 1:
+        for char_id in characters:
+            prebuild_character(char_id, base_path, cache_path, force=force, progress=progress, jobs=1)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for char_id in characters:
+            prebuild_character(char_id, base_path, cache_path, force=force, progress=progress, pool=pool)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="预生成角色底图缓存（立绘 × 背景），多进程并行。",
+    )
+    parser.add_argument("characters", nargs="*", help="要预构建的角色（默认全部）")
+    parser.add_argument("--all", action="store_true", help="预构建 characters/ 下的全部角色")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="进程数（默认 render.prebuild_jobs，0 为 CPU 核心数）")
+    parser.add_argument("-f", "--force", action="store_true", help="忽略签名，全部重新生成")
+    parser.add_argument("--assets", default=BASE_PATH, help="素材根目录")
+    args = parser.parse_args(argv)
+
+    available = list_characters(args.assets)
+    characters = available if args.all or not args.characters else args.characters
+    missing = [char_id for char_id in characters if char_id not in available]
+    if missing:
+        print(f"❌ 找不到角色: {', '.join(missing)}")
+        return 1
+    prebuild_all(characters, args.assets, os.path.join(args.assets, "cache"), args.force, args.jobs)
+    return 0
+
+
 if __name__ == "__main__":
-    characters_root = os.path.join(BASE_PATH, "characters")
-    for folder in os.listdir(characters_root):
-        if os.path.isdir(os.path.join(characters_root, folder)):
-            prebuild_character(folder)
+    sys.exit(main())
@@ -0,0 +1,216 @@
+# core/profiling.py
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    from .utils import load_global_config
+except Exception:  # pragma: no cover - fallback for standalone runs
+    def load_global_config() -> Dict[str, object]:
+        return {}
+
+# 直方图的桶上限（毫秒），最后一个桶收集所有更慢的样本
+BUCKET_EDGES_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+DEFAULT_WINDOW = 512
+DEFAULT_DUMP_PATH = os.path.join("logs", "render_profile.json")
+
+
+class _NullStage:
+    """Shared no-op context manager returned while profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: "StageProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+class StageHistogram:
+    """The last ``window`` samples of one stage (milliseconds) plus lifetime totals."""
+
+    __slots__ = ("samples", "count", "total_ms")
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.samples.append(ms)
+        self.count += 1
+        self.total_ms += ms
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def pct(p: float) -> float:
+            return ordered[min(n - 1, int(p * n))] if n else 0.0
+
+        buckets: Dict[str, int] = {}
+        lower = 0.0
+        index = 0
+        for edge in BUCKET_EDGES_MS:
+            hits = 0
+            while index < n and ordered[index] < edge:
+                hits += 1
+                index += 1
+            buckets[f"{lower:g}-{edge:g}ms"] = hits
+            lower = edge
+        buckets[f">={lower:g}ms"] = n - index
+        return {
+            "count": self.count,
+            "window": n,
+            "mean_ms": sum(ordered) / n if n else 0.0,
+            "p50_ms": pct(0.5),
+            "p90_ms": pct(0.9),
+            "p99_ms": pct(0.99),
+            "max_ms": ordered[-1] if n else 0.0,
+            "total_ms": self.total_ms,
+            "buckets": buckets,
+        }
+
+
+class StageProfiler:
+    """
+    Per-stage wall-clock timers feeding rolling histograms.
+    ``with PROFILER.stage("render.draw"): ...`` costs one attribute check and a
+    shared no-op context manager while disabled.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = DEFAULT_WINDOW):
+        self.enabled = enabled
+        self.window = max(1, int(window))
+        self._stages: Dict[str, StageHistogram] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: Optional[bool] = None, window: Optional[int] = None) -> None:
+        with self._lock:
+            if window is not None and max(1, int(window)) != self.window:
+                self.window = max(1, int(window))
+                # 窗口大小改变时保留最近的样本
+                for name, hist in self._stages.items():
+                    resized = StageHistogram(self.window)
+                    resized.samples.extend(hist.samples)
+                    resized.count, resized.total_ms = hist.count, hist.total_ms
+                    self._stages[name] = resized
+            if enabled is not None:
+                self.enabled = bool(enabled)
+
+    def stage(self, name: str):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        ms = seconds * 1000.0
+        with self._lock:
+            hist = self._stages.get(name)
+            if hist is None:
+                hist = self._stages[name] = StageHistogram(self.window)
+            hist.add(ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: self._stages[name].summary() for name in sorted(self._stages)}
+
+    def report(self) -> str:
+        """Plain-text table of every stage, one line each."""
+        summary = self.summary()
+        if not summary:
+            return "（暂无性能数据，确认 render.profiling 已开启）"
+        width = max(len(name) for name in summary)
+        lines: List[str] = [
+            f"{'阶段':<{width}}{'次数':>10}{'平均':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'最大':>10}"
+        ]
+        for name, s in summary.items():
+            lines.append(
+                f"{name:<{width}}{s['count']:>10}"
+                f"{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}"
+                f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}"
+            )
+        return "\n".join(lines)
+
+    def dump_json(self, path: str = DEFAULT_DUMP_PATH) -> str:
+        """Write the summary (with histogram buckets) to path; returns the path."""
+        data = {
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "window": self.window,
+            "stages": self.summary(),
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _load_profiling_config() -> Dict[str, Any]:
+    cfg: dict = load_global_config() or {}
+    render = cfg.get("render", {})
+    try:
+        window = int(render.get("profiling_window", DEFAULT_WINDOW))
+    except (TypeError, ValueError):
+        window = DEFAULT_WINDOW
+    return {
+        "enabled": bool(render.get("profiling", False)),
+        "window": window,
+        "path": str(render.get("profiling_output") or DEFAULT_DUMP_PATH),
+    }
+
+
+# 进程内共享的计时器；渲染、剪贴板与提交流程都记录到这里
+PROFILER = StageProfiler()
+DUMP_PATH: str = DEFAULT_DUMP_PATH
+
+
+def reload_profiling_config() -> None:
+    """Apply render.profiling / profiling_window / profiling_output from global_config."""
+    global DUMP_PATH
+    cfg = _load_profiling_config()
+    PROFILER.configure(cfg["enabled"], cfg["window"])
+    DUMP_PATH = cfg["path"]
+
+
+reload_profiling_config()
+
+
+def dump_profile(path: Optional[str] = None) -> str:
+    """Print the stage table and write it as JSON (render.profiling_output by default)."""
+    print(f"⏱️ 渲染耗时统计（最近 {PROFILER.window} 次，单位 ms）")
+    print(PROFILER.report())
+    target = PROFILER.dump_json(path or DUMP_PATH)
+    print(f"💾 已写入 {target}")
+    return target
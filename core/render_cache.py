@@ -0,0 +1,278 @@
+# core/render_cache.py
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import zlib
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from PIL import Image
+
+from .lru import LRUCache
+
+PayloadEncoder = Callable[[Image.Image], bytes]
+MemoEntry = Tuple[Optional[Image.Image], Optional[bytes]]
+# 压缩存储的画布：(mode, size, zlib 压缩后的像素数据)
+PackedCanvas = Tuple[str, Tuple[int, int], bytes]
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Approximate memory held by a decoded image (Pillow pads RGB to 4 bytes per pixel)."""
+    bands = len(image.getbands())
+    return image.width * image.height * (4 if bands > 1 else bands)
+
+
+def save_image_atomic(image: Image.Image, path: str, jpeg_quality: int = 90) -> None:
+    """Save as JPEG (.jpg) or PNG next to path, then rename over it so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if path.lower().endswith((".jpg", ".jpeg")):
+            rgb = image if image.mode == "RGB" else image.convert("RGB")
+            rgb.save(tmp_path, "JPEG", quality=jpeg_quality)
+        else:
+            image.save(tmp_path, "PNG", compress_level=1)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class CacheWriter:
+    """
+    Write-behind saver: submit() queues an image and returns at once, a daemon
+    thread encodes it and saves it atomically, then calls on_saved(path).
+    """
+
+    def __init__(self, jpeg_quality: int = 90):
+        self.jpeg_quality = jpeg_quality
+        self._queue: "queue.Queue[Tuple[str, Image.Image, Optional[Callable[[str], None]]]]" = queue.Queue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.failed = 0
+
+    def submit(
+        self,
+        path: str,
+        image: Image.Image,
+        on_saved: Optional[Callable[[str], None]] = None,
+    ) -> bool:
+        """Queue image for path; returns False when the path is already pending. image must not be modified afterwards."""
+        with self._lock:
+            if path in self._pending:
+                return False
+            self._pending.add(path)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="cache-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((path, image, on_saved))
+        return True
+
+    def _run(self) -> None:
+        while True:
+            path, image, on_saved = self._queue.get()
+            try:
+                save_image_atomic(image, path, self.jpeg_quality)
+                self.written += 1
+                if on_saved:
+                    on_saved(path)
+            except Exception as e:
+                self.failed += 1
+                print(f"⚠️ 底图写入失败 {path}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued image has been written."""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {"pending": pending, "written": self.written, "failed": self.failed}
+
+
+class CanvasCache:
+    """
+    Base canvases bounded by a byte budget (LRU).
+    With ``compress=True`` entries are held as zlib-compressed pixel data; the most
+    recently inflated canvas is kept decoded so consecutive renders on the same
+    base do not pay for decompression again.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, compress: bool = False):
+        self.compress = compress
+        self._lru = LRUCache(None, max_bytes=max_bytes, sizeof=self._sizeof)
+        self._hot: Optional[Tuple[Hashable, Image.Image]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(value: Any) -> int:
+        if isinstance(value, Image.Image):
+            return image_nbytes(value)
+        return len(value[2])
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        value = self._lru.get(key)
+        if value is None or isinstance(value, Image.Image):
+            return value
+        with self._lock:
+            if self._hot is not None and self._hot[0] == key:
+                return self._hot[1]
+        mode, size, data = value
+        img = Image.frombytes(mode, size, zlib.decompress(data))
+        with self._lock:
+            self._hot = (key, img)
+        return img
+
+    def put(self, key: Hashable, image: Image.Image) -> None:
+        if not self.compress:
+            self._lru.put(key, image)
+            return
+        packed: PackedCanvas = (image.mode, image.size, zlib.compress(image.tobytes(), 1))
+        self._lru.put(key, packed)
+        with self._lock:
+            self._hot = (key, image)
+
+    def pop(self, key: Hashable) -> None:
+        self._lru.pop(key)
+        with self._lock:
+            if self._hot is not None and self._hot[0] == key:
+                self._hot = None
+
+    def clear(self) -> None:
+        self._lru.clear()
+        with self._lock:
+            self._hot = None
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._lru
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._lru.stats())
+        stats["compress"] = self.compress
+        return stats
+
+
+class RenderMemo:
+    """
+    Memoized render outputs (encoded clipboard payload, plus the finished image
+    until it has been written to the disk tier).
+    Memory tier is an LRU bounded by entry count and bytes; the optional disk tier
+    lives in assets/cache/<char>/_renders.
+    """
+
+    def __init__(
+        self,
+        char_id: str,
+        base_path: str = "assets",
+        max_entries: int = 16,
+        use_disk: bool = False,
+        encoder: Optional[PayloadEncoder] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.char_id = char_id
+        self.encoder = encoder
+        self.memory = LRUCache(max_entries, max_bytes=max_bytes, sizeof=self._sizeof)
+        self.disk_dir: Optional[str] = (
+            os.path.join(base_path, "cache", char_id, "_renders") if use_disk else None
+        )
+        self.disk_hits = 0
+
+    @staticmethod
+    def _sizeof(entry: MemoEntry) -> int:
+        image, payload = entry
+        return (image_nbytes(image) if image is not None else 0) + len(payload or b"")
+
+    def make_key(
+        self,
+        portrait_key: Optional[str],
+        bg_key: Optional[str],
+        text: str,
+        speaker_name: Optional[str],
+        config_signature: str,
+    ) -> str:
+        raw = json.dumps(
+            [self.char_id, portrait_key, bg_key, text, speaker_name, config_signature],
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[MemoEntry]:
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+
+        path = self._disk_path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with Image.open(path) as img:
+                image = img.copy()
+        except Exception:
+            return None
+        payload = self.encoder(image) if self.encoder else None
+        # 磁盘上已有图片，内存里只留剪贴板数据
+        self.memory.put(key, (None if payload is not None else image, payload))
+        self.disk_hits += 1
+        return image, payload
+
+    def put(self, key: str, image: Optional[Image.Image], payload: Optional[bytes] = None) -> None:
+        """
+        Store an entry; image may be None when the caller does not own it.
+        The image is only kept while it is still waiting to be written to the disk
+        tier, otherwise just the payload is held in memory.
+        """
+        path = self._disk_path(key)
+        if payload is not None and (not path or os.path.exists(path)):
+            image = None
+        self.memory.put(key, (image, payload))
+
+    def persist(self, key: str, image: Optional[Image.Image] = None) -> None:
+        """Write an entry to the disk tier (atomic replace)."""
+        path = self._disk_path(key)
+        if not path or os.path.exists(path):
+            return
+        if image is None:
+            entry = self.memory.get(key)
+            image = entry[0] if entry is not None else None
+        if image is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        try:
+            image.save(tmp_path, "PNG", compress_level=1)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ 渲染缓存写入失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        # 已落盘，释放内存中的图片
+        entry = self.memory.pop(key)
+        if entry is not None and entry[1] is not None:
+            self.memory.put(key, (None, entry[1]))
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, f"{key}.png")
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "memory": self.memory.stats(),
+            "disk_hits": self.disk_hits,
+            "disk": bool(self.disk_dir),
+        }
@@ -0,0 +1,108 @@
+# core/render_plan.py
+
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple, Union
+
+from .lru import LRUCache
+from .text_layout import FontType, TextWrapper
+
+Color = Tuple[int, int, int]
+TextOp = Tuple[Tuple[float, float], str, FontType, Color]
+# 名字图层模板：(绝对坐标, 文本模板（可含 {name}）, 字体, 颜色)
+NameLayer = Tuple[Tuple[float, float], str, FontType, Color]
+
+
+class RenderPlan:
+    """
+    Style and layout of one character resolved once: fonts, colors, wrapper tokens,
+    line metrics and name-layer templates. Per message only the text is wrapped;
+    name ops are memoized per speaker.
+    """
+
+    def __init__(
+        self,
+        text_font: FontType,
+        text_color: Color,
+        line_height: Union[int, float],
+        text_area: Tuple[int, int, int, int],
+        name_pos: Tuple[float, float],
+        name_font: FontType,
+        name_color: Color,
+        wrapper_tokens: Tuple[str, str],
+        default_speaker: Optional[str],
+        name_layers: Optional[Dict[str, List[NameLayer]]] = None,
+    ):
+        self.text_font = text_font
+        self.text_color = text_color
+        self.line_height = line_height
+        self.text_area = text_area
+        self.max_width = max(10, text_area[2] - text_area[0])
+        self.name_pos = name_pos
+        self.name_font = name_font
+        self.name_color = name_color
+        self.prefix, self.suffix = wrapper_tokens
+        self.default_speaker = default_speaker
+        # None 表示 basic 模式；advanced 模式下为 {说话人 / "default": 图层模板}
+        self.name_layers = name_layers
+        self._name_ops = LRUCache(64)
+
+    def name_ops(self, speaker_name: Optional[str]) -> List[TextOp]:
+        """Draw ops of the name block for speaker_name (shared list, do not mutate)."""
+        ops = self._name_ops.get(speaker_name)
+        if ops is None:
+            ops = self._build_name_ops(speaker_name)
+            self._name_ops.put(speaker_name, ops)
+        return ops
+
+    def _build_name_ops(self, speaker_name: Optional[str]) -> List[TextOp]:
+        ops: List[TextOp] = []
+        if self.name_layers is not None:
+            layers: List[NameLayer] = []
+            if speaker_name and speaker_name in self.name_layers:
+                layers = self.name_layers[speaker_name]
+            elif "default" in self.name_layers:
+                layers = self.name_layers["default"]
+            for xy, template, font, color in layers:
+                value = template.replace("{name}", speaker_name) if speaker_name is not None else template
+                ops.append((xy, value, font, color))
+        # advanced 没有可用图层时回退到 basic 名字
+        if not ops and speaker_name:
+            ops.append((self.name_pos, speaker_name, self.name_font, self.name_color))
+        return ops
+
+    def name_signature(self, speaker_name: Optional[str] = None) -> str:
+        """Hash of the name ops of speaker_name (default speaker when None)."""
+        if speaker_name is None:
+            speaker_name = self.default_speaker
+        raw = []
+        for xy, value, font, color in self.name_ops(speaker_name):
+            entry = [list(xy), value, getattr(font, "path", None), getattr(font, "size", None), list(color)]
+            fallback_paths = getattr(font, "fallback_paths", None)
+            if fallback_paths:
+                entry.append(fallback_paths)
+            raw.append(entry)
+        data = json.dumps(raw, ensure_ascii=False, default=str)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def layout(
+        self,
+        text: str,
+        speaker_name: Optional[str],
+        wrapper: TextWrapper,
+        include_name: bool = True,
+    ) -> List[TextOp]:
+        """Resolve name + body text into absolute-position draw ops."""
+        if speaker_name is None:
+            speaker_name = self.default_speaker
+        ops = list(self.name_ops(speaker_name)) if include_name else []
+
+        text = f"{self.prefix}{text}{self.suffix}"
+        x1, y1, _, y2 = self.text_area
+        line_height = self.line_height
+        for i, line in enumerate(wrapper.wrap(text, self.text_font, self.max_width)):
+            y = y1 + i * line_height
+            if y > y2 - line_height:
+                break
+            ops.append(((x1, y), line, self.text_font, self.text_color))
+        return ops
@@ -1,17 +1,32 @@
+import functools
+import hashlib
+import io
 import os
 import json
-from typing import Dict, Optional, Tuple, Any, List, Union
+import threading
+from copy import deepcopy
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Any, List, Set, Union
 
 import yaml
 from PIL import Image, ImageDraw, ImageFont
 
 FontType = Union[ImageFont.FreeTypeFont, ImageFont.ImageFont]
+Box = Tuple[int, int, int, int]
+# (text, portrait_key, bg_key, speaker)，后三项可省略
+RenderItem = Tuple[Any, ...]
+# 写字前贴到画布上的图层：(图片, 画布坐标, 颜色)。颜色为 None 时直接贴图，
+# 否则图片是覆盖率遮罩，按该颜色上色（与 draw.text 的混合方式一致）
+NameOverlay = Tuple[Image.Image, Tuple[int, int], Optional[Tuple[int, int, int]]]
+# 预烘焙名字的补丁区域向外扩展的像素，覆盖 JPEG 8x8/16x16 块的振铃
+NAME_BAKE_MARGIN = 16
 
 try:
     from .utils import (
         load_global_config,
         normalize_layout,
         normalize_style,
+        resolve_crop_box,
+        crop_cache_dirname,
         DEFAULT_CANVAS_SIZE
     )
 except Exception:  # pragma: no cover - fallback for standalone runs
@@ -24,8 +39,26 @@ except Exception:  # pragma: no cover - fallback for standalone runs
     def normalize_style(style):
         return style or {}
 
+    def resolve_crop_box(layout, canvas_size):
+        return None
+
+    def crop_cache_dirname(crop_box):
+        return "_".join(str(v) for v in crop_box)
+
     DEFAULT_CANVAS_SIZE = (2560, 1440)
 
+from .animation import ANIMATION_FORMATS, encode_animation, frame_durations, reveal_schedule
+from .assets import LazyImageStore
+from .font_fallback import FontChain, load_coverage
+from .glyph_atlas import GlyphAtlasCache
+from .lru import LRUCache
+from .profiling import PROFILER
+from .prebuild import CACHE_MODES, LAYER_DIR, SPRITE_OFFSET_KEY, _file_hashes, record_cached_bases
+from .render_cache import CacheWriter, CanvasCache, save_image_atomic
+from .render_plan import NameLayer, RenderPlan, TextOp
+from .text_layout import TextWrapper
+from .utils import load_output_profiles, output_profile_size, profile_cache_dirname, scale_style
+
 def _load_render_config() -> Tuple[Tuple[int, int], str, str, bool]:
     cfg:dict = load_global_config() or {}
     render = cfg.get("render", {})
@@ -37,15 +70,124 @@ def _load_render_config() -> Tuple[Tuple[int, int], str, str, bool]:
     use_memory = bool(render.get("use_memory_canvas_cache", True))
     return canvas_size, cache_format, cache_ext, use_memory
 
+
+def _load_render_options() -> Dict[str, Any]:
+    """Performance-related render options (compositing mode, asset cache size...)."""
+    cfg: dict = load_global_config() or {}
+    render = cfg.get("render", {})
+    compositing = str(render.get("compositing", "full")).lower()
+    if compositing not in {"full", "band"}:
+        compositing = "full"
+    try:
+        asset_entries = max(1, int(render.get("asset_cache_entries", 8)))
+    except (TypeError, ValueError):
+        asset_entries = 8
+    try:
+        canvas_cache_mb = float(render.get("canvas_cache_mb", 512))
+    except (TypeError, ValueError):
+        canvas_cache_mb = 512.0
+    typewriter = {}
+    for key, default in (("typewriter_frame_ms", 50), ("typewriter_max_frames", 60), ("typewriter_hold_ms", 1500)):
+        try:
+            typewriter[key] = max(1, int(render.get(key, default)))
+        except (TypeError, ValueError):
+            typewriter[key] = default
+    typewriter_format = str(render.get("typewriter_format", "gif")).lower()
+    if typewriter_format not in ANIMATION_FORMATS:
+        typewriter_format = "gif"
+    cache_mode = str(render.get("cache_mode", "prebuild")).lower()
+    if cache_mode not in CACHE_MODES:
+        cache_mode = "prebuild"
+    return {
+        "compositing": compositing,
+        "asset_cache_entries": asset_entries,
+        # <= 0 表示不限制
+        "canvas_cache_bytes": int(canvas_cache_mb * 1024 * 1024) if canvas_cache_mb > 0 else None,
+        "canvas_cache_compress": bool(render.get("canvas_cache_compress", False)),
+        "jpeg_quality": int(render.get("jpeg_quality", 90)),
+        "output_profile": str(render.get("output_profile") or ""),
+        "output_profiles": load_output_profiles(render),
+        "cache_mode": cache_mode,
+        "typewriter_format": typewriter_format,
+        **typewriter,
+    }
+
 CANVAS_SIZE, CACHE_FORMAT, CACHE_EXT, USE_MEMORY_CACHE = _load_render_config()
+RENDER_OPTIONS = _load_render_options()
+
+# 按需缓存模式下实时合成的底图由这个后台线程编码并写入 cache/<角色>
+_CACHE_WRITER: Optional[CacheWriter] = None
+_CACHE_WRITER_LOCK = threading.Lock()
+
+
+def _cache_writer() -> CacheWriter:
+    global _CACHE_WRITER
+    with _CACHE_WRITER_LOCK:
+        if _CACHE_WRITER is None:
+            _CACHE_WRITER = CacheWriter(RENDER_OPTIONS["jpeg_quality"])
+        return _CACHE_WRITER
+
+
+def _encode_image(image: Image.Image, fmt: str, **options: Any) -> bytes:
+    buffer = io.BytesIO()
+    if fmt.upper() in {"JPEG", "JPG"} and image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _decode_image(path: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """
+    Decode an image, resized to size when given. JPEGs that only need fewer pixels
+    are decoded with DCT scaling (1/2, 1/4, 1/8) before the final resize; images
+    without transparency come back as RGB instead of carrying an opaque alpha channel.
+    """
+    img = Image.open(path)
+    if size and img.format == "JPEG" and (img.width > size[0] or img.height > size[1]):
+        img.draft("RGB", size)
+    img = _drop_opaque_alpha(img)
+    if size and img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    return img
+
+
+def _drop_opaque_alpha(img: Image.Image) -> Image.Image:
+    """img as RGB when every pixel is opaque, otherwise as RGBA."""
+    if img.mode == "RGB":
+        img.load()
+        return img
+    if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info:
+        rgba = img if img.mode == "RGBA" else img.convert("RGBA")
+        if rgba.getchannel("A").getextrema() != (255, 255):
+            return rgba
+        return rgba.convert("RGB")
+    return img.convert("RGB")
+
+
+def _union_box(a: Optional[Box], b: Optional[Box]) -> Optional[Box]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
 
 
 class CharacterRenderer:
-    def __init__(self, char_id: str, base_path: str = "assets"):
+    def __init__(self, char_id: str, base_path: str = "assets", output_profile: Optional[str] = None):
+        """
+        output_profile: name in render.output_profiles to render at (see
+        set_output_profile); None uses render.output_profile, "" means full size.
+        """
         self.char_id = char_id
         self.base_path = base_path
         self.char_root = os.path.join(base_path, "characters", char_id)
         self.font_cache: Dict[Tuple[int, Optional[str]], FontType] = {}
+        # 主字体 + 回退字体组成的字体链，键为各字体对象的 id
+        self._font_chains: Dict[Tuple[int, ...], FontChain] = {}
+        self._missing_fonts: Set[str] = set()
+        self._wrapper = TextWrapper()
+        self.glyph_atlas = GlyphAtlasCache(self._wrapper)
+        self._measure_draw = ImageDraw.Draw(Image.new("L", (1, 1)))
         self.default_font_name = "LXGWWenKai-Medium.ttf"
         self.default_font_path: Optional[str] = os.path.join(
             self.base_path, "common", "fonts", self.default_font_name
@@ -54,7 +196,17 @@ class CharacterRenderer:
         self.canvas_size = CANVAS_SIZE
         self.cache_ext = CACHE_EXT
         self.use_memory_cache = USE_MEMORY_CACHE
-        self._canvas_cache: Dict[Tuple[str, str], Image.Image] = {}
+        self.cache_mode = RENDER_OPTIONS["cache_mode"]
+        # 键为 (立绘, 背景) 或 (立绘, 背景, 裁剪框)，按字节预算做 LRU 淘汰
+        self._canvas_cache = CanvasCache(
+            RENDER_OPTIONS["canvas_cache_bytes"],
+            compress=RENDER_OPTIONS["canvas_cache_compress"],
+        )
+        # 局部合成（compositing: band）：复用的输出缓冲及上一次写入文字的区域
+        self.compositing = RENDER_OPTIONS["compositing"]
+        self._output_buffer: Optional[Image.Image] = None
+        self._output_key: Optional[Tuple[Any, ...]] = None
+        self._output_dirty: Optional[Box] = None
         self._scaled_suffix = f"{self.canvas_size[0]}x{self.canvas_size[1]}"
 
         print(f"--- 开始加载角色 {char_id} ---")
@@ -81,14 +233,38 @@ class CharacterRenderer:
         style_raw = self.config.get("style", {})
         self.config["style"] = normalize_style(style_raw)
         self.style = self.config["style"]
+        # 原始尺寸的布局 / 样式；输出配置按比例缩放它们
+        self.full_canvas_size = self.canvas_size
+        self._full_layout = deepcopy(self.layout)
+        self._full_style = deepcopy(self.style)
+        self.output_profile: Optional[str] = None
+        # 立绘 / 背景只在启动时建立索引，首次用到时才解码
+        asset_entries = RENDER_OPTIONS["asset_cache_entries"]
         self.assets: Dict[str, Any] = {
             "dialog_box": None,
-            "portraits": {},
-            "backgrounds": {},
+            "portraits": LazyImageStore(self._load_portrait, asset_entries),
+            "backgrounds": LazyImageStore(self._load_background, asset_entries),
             "font": None,
         }
+        self._dialog_box_loaded = False
+        # 样式 / 布局编译后的渲染计划，首次渲染时生成
+        self._plan: Optional[RenderPlan] = None
+        # 预烘焙名字（_meta.json 中的 name_bake）及其他说话人的名字贴图
+        self._name_bake: Optional[Dict[str, Any]] = None
+        self._name_bake_loaded = False
+        self._name_bake_state: Optional[Tuple[RenderPlan, str]] = None
+        self._name_sprites = LRUCache(32)
+        # cache/<char>/_meta.json（首次用到时读取）与分层缓存的立绘贴图
+        self._cache_meta: Optional[Dict[str, Any]] = None
+        self._layer_sprites = LRUCache(asset_entries)
 
         self._load_resources()
+        profile = RENDER_OPTIONS["output_profile"] if output_profile is None else output_profile
+        if profile:
+            try:
+                self.set_output_profile(profile)
+            except ValueError as e:
+                print(f"⚠️ {e}，使用原始尺寸")
         print("--- 资源加载完成 ---\n")
 
     # -----------------------
@@ -97,16 +273,13 @@ class CharacterRenderer:
     def _load_resources(self):
         # 立绘
         portrait_dir = os.path.join(self.char_root, "portrait")
+        portraits: LazyImageStore = self.assets["portraits"]
         if os.path.exists(portrait_dir):
-            count = 0
-            for file in os.listdir(portrait_dir):
+            for file in sorted(os.listdir(portrait_dir)):
                 if file.lower().endswith((".png", ".jpg", ".jpeg")):
                     key = os.path.splitext(file)[0]
-                    full_path = os.path.join(portrait_dir, file)
-                    portraits = self.assets.setdefault("portraits", {})
-                    portraits[key] = Image.open(full_path).convert("RGBA")  # type: ignore[index]
-                    count += 1
-            print(f"✅ 已加载 {count} 张立绘")
+                    portraits.add(key, os.path.join(portrait_dir, file))
+            print(f"✅ 已索引 {len(portraits)} 张立绘（按需解码）")
         else:
             print(f"⚠️ 警告: 找不到立绘文件夹 {portrait_dir}")
 
@@ -125,13 +298,12 @@ class CharacterRenderer:
         if os.path.isdir(common_bg_dir):
             bg_dirs_to_try.append(common_bg_dir)
 
-        count = 0
-        self.assets["backgrounds"] = {}
+        backgrounds: LazyImageStore = self.assets["backgrounds"]
         for bg_dir in bg_dirs_to_try:
-            files = [
+            files = sorted(
                 f for f in os.listdir(bg_dir)
                 if f.lower().endswith((".png", ".jpg", ".jpeg"))
-            ]
+            )
             for file in files:
                 base_name, ext = os.path.splitext(file)
                 key = base_name
@@ -141,25 +313,17 @@ class CharacterRenderer:
                         continue
                     key = prefix
 
-                if key in self.assets["backgrounds"]:  # type: ignore[index]
-                    continue
-                full_path = os.path.join(bg_dir, file)
-                img = Image.open(full_path).convert("RGBA")
-                self.assets["backgrounds"][key] = self._resize_to_canvas(img)  # type: ignore[index]
-                count += 1
+                backgrounds.add(key, os.path.join(bg_dir, file))
 
-        if count:
-            print(f"✅ 已加载 {count} 张背景")
+        if len(backgrounds):
+            print(f"✅ 已索引 {len(backgrounds)} 张背景（按需解码）")
         else:
             print("⚠️ 警告: 找不到任何背景文件夹")
 
-        # 对话框
-        box_filename = self.config.get("assets", {}).get("dialog_box", "textbox_bg.png")
-        box_path = os.path.join(self.char_root, box_filename)
+        # 对话框只检查是否存在，实时合成时再解码
+        box_path = self._dialog_box_path()
         if os.path.exists(box_path):
-            box_img = Image.open(box_path).convert("RGBA")
-            self.assets["dialog_box"] = self._fit_dialog_box_to_canvas(box_img)
-            print(f"✅ 对话框已加载: {box_filename}")
+            print(f"✅ 对话框已就绪: {os.path.basename(box_path)}")
         else:
             print(f"⚠️ 警告: 找不到对话框图片 {box_path}")
 
@@ -170,6 +334,94 @@ class CharacterRenderer:
         text_font_file = self.style.get("font_file")
         self.assets["font"] = self._get_font(font_size, self._resolve_font_path(text_font_file))
 
+    def _load_portrait(self, path: str) -> Image.Image:
+        return Image.open(path).convert("RGBA")
+
+    def _load_background(self, path: str) -> Image.Image:
+        return _decode_image(path, self.canvas_size)
+
+    def _dialog_box_path(self) -> str:
+        box_filename = self.config.get("assets", {}).get("dialog_box", "textbox_bg.png")
+        return os.path.join(self.char_root, box_filename)
+
+    def _get_dialog_box(self) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """Decode and fit the dialog box on first use; returns (image, position)."""
+        if not self._dialog_box_loaded:
+            box_path = self._dialog_box_path()
+            if os.path.exists(box_path):
+                box_img = Image.open(box_path).convert("RGBA")
+                box_img, _ = self._fit_dialog_box_to_canvas(box_img)
+                self.assets["dialog_box"] = (box_img, self._resolve_box_position(box_img))
+            self._dialog_box_loaded = True
+        return self.assets["dialog_box"]
+
+    def pin_portrait(self, portrait_key: str) -> None:
+        """Keep only this portrait pinned in memory (the current expression)."""
+        portraits: LazyImageStore = self.assets["portraits"]
+        for key in portraits.pinned():
+            if key != portrait_key:
+                portraits.unpin(key)
+        if portrait_key in portraits:
+            portraits.pin(portrait_key)
+
+    # -----------------------
+    # 输出配置
+    # -----------------------
+    @staticmethod
+    def output_profiles() -> Dict[str, Dict[str, int]]:
+        return dict(RENDER_OPTIONS["output_profiles"])
+
+    def set_output_profile(self, name: Optional[str]) -> Tuple[int, int]:
+        """
+        Render at a named output profile (render.output_profiles) or back at full
+        size (None / ""). Layout, font sizes and stand_scale are scaled to the profile
+        canvas and bases come prescaled from cache/<char>/_profiles/<WxH>/, so text is
+        drawn at the target resolution instead of resizing the finished image.
+        Returns the new canvas size.
+        """
+        profiles = RENDER_OPTIONS["output_profiles"]
+        if name and name not in profiles:
+            raise ValueError(f"未知的输出配置 {name}（可选: {', '.join(profiles) or '无'}）")
+        size = output_profile_size(self.full_canvas_size, profiles[name]) if name else self.full_canvas_size
+        self.output_profile = name or None
+        if size == self.canvas_size:
+            return size
+
+        self.canvas_size = size
+        if size == self.full_canvas_size:
+            layout = deepcopy(self._full_layout)
+            style = deepcopy(self._full_style)
+        else:
+            scale = size[0] / self.full_canvas_size[0]
+            layout = normalize_layout(deepcopy(self._full_layout), size)
+            layout["stand_scale"] = float(layout.get("stand_scale", 1.0)) * scale
+            style = scale_style(self._full_style, scale)
+        self.layout = self.config["layout"] = layout
+        self.style = self.config["style"] = style
+
+        # 与画布尺寸相关的缓存全部作废
+        self.invalidate_plan()
+        self._canvas_cache.clear()
+        self._output_buffer = None
+        self._output_key = None
+        self._output_dirty = None
+        self._dialog_box_loaded = False
+        self.assets["dialog_box"] = None
+        self.assets["backgrounds"].clear_decoded()
+        self._name_bake_state = None
+        return size
+
+    @property
+    def is_scaled(self) -> bool:
+        return self.canvas_size != self.full_canvas_size
+
+    def _cache_dir(self) -> str:
+        """Directory of the base canvases for the current canvas size."""
+        root = os.path.join(self.base_path, "cache", self.char_id)
+        if self.is_scaled:
+            root = os.path.join(root, "_profiles", profile_cache_dirname(self.canvas_size))
+        return root
+
     # -----------------------
     # 渲染主流程
     # -----------------------
@@ -180,45 +432,453 @@ class CharacterRenderer:
         bg_key: Optional[str] = None,
         speaker_name: Optional[str] = None,
     ) -> Image.Image:
+        """
+        Render one dialogue image.
+        When cropping is enabled the base canvas is fetched pre-cropped and text is
+        drawn directly in the cropped frame.
+        With ``compositing: band`` the returned image is a buffer owned by the
+        renderer that the next render() call overwrites; copy it to keep it.
+        """
+        portrait_key, bg_key = self._resolve_keys(portrait_key, bg_key)
+        crop_box = resolve_crop_box(self.layout, self.canvas_size)
+        with PROFILER.stage("render.total"):
+            canvas = self._render_on_base(
+                text, portrait_key, bg_key, speaker_name, crop_box, self.compositing == "band"
+            )
+
+        if crop_box:
+            x1, y1, x2, y2 = crop_box
+            print(f"✂️ 已裁剪图片: ({x1}, {y1}) → ({x2}, {y2}), 输出尺寸: {canvas.size}")
+        return canvas
+
+    def _resolve_keys(self, portrait_key: Optional[str], bg_key: Optional[str]) -> Tuple[str, str]:
         portrait_key = portrait_key or self._first_key(self.assets["portraits"])
         bg_key = bg_key or self._first_key(self.assets["backgrounds"])
         if not portrait_key or not bg_key:
             raise ValueError("无法渲染: 未提供立绘或背景")
-        canvas = self._get_base_canvas(portrait_key, bg_key).copy()
-        draw = ImageDraw.Draw(canvas)
-        self._draw_text(draw, text, speaker_name)
+        return portrait_key, bg_key
+
+    def render_many(
+        self,
+        items: Iterable[RenderItem],
+        encoder: Union[None, str, Callable[[Image.Image], bytes]] = None,
+    ) -> Iterator[Tuple[int, Union[Image.Image, bytes]]]:
+        """
+        Render many lines, yielding ``(index, image_or_bytes)`` one at a time.
+        Items are ``(text, portrait_key, bg_key, speaker)`` tuples (trailing fields
+        optional) and are processed grouped by base canvas, so results arrive out of
+        order; ``index`` is the position in ``items``.
+        ``encoder`` may be an image format name ("PNG", "JPEG"...) or a callable
+        returning bytes. When encoding, or with ``compositing: band``, a single
+        output buffer is reused and yielded images are only valid until the next
+        item; otherwise every image is a fresh copy.
+        """
+        if isinstance(encoder, str):
+            encoder = functools.partial(_encode_image, fmt=encoder)
+        default_portrait = self._first_key(self.assets["portraits"])
+        default_bg = self._first_key(self.assets["backgrounds"])
+
+        groups: Dict[Tuple[str, str], List[Tuple[int, str, Optional[str]]]] = {}
+        for index, item in enumerate(items):
+            text, portrait_key, bg_key, speaker_name = (tuple(item) + (None, None, None))[:4]
+            portrait_key = portrait_key or default_portrait
+            bg_key = bg_key or default_bg
+            if not portrait_key or not bg_key:
+                raise ValueError(f"无法渲染第 {index} 条: 未提供立绘或背景")
+            groups.setdefault((portrait_key, bg_key), []).append((index, text, speaker_name))
+
+        crop_box = resolve_crop_box(self.layout, self.canvas_size)
+        reuse_buffer = encoder is not None or self.compositing == "band"
+        for (portrait_key, bg_key), group in groups.items():
+            for index, text, speaker_name in group:
+                canvas = self._render_on_base(
+                    text, portrait_key, bg_key, speaker_name, crop_box, reuse_buffer
+                )
+                yield index, encoder(canvas) if encoder else canvas
+
+    def render_typewriter(
+        self,
+        text: str,
+        portrait_key: Optional[str] = None,
+        bg_key: Optional[str] = None,
+        speaker_name: Optional[str] = None,
+        fmt: Optional[str] = None,
+        frame_ms: Optional[int] = None,
+        max_frames: Optional[int] = None,
+    ) -> bytes:
+        """
+        Encode a "text appears character by character" animation (GIF / APNG / WebP).
+        Defaults come from the typewriter_* keys under render: in global_config.yaml.
+        """
+        fmt = (fmt or RENDER_OPTIONS["typewriter_format"]).lower()
+        frame_ms = frame_ms or RENDER_OPTIONS["typewriter_frame_ms"]
+        max_frames = max_frames or RENDER_OPTIONS["typewriter_max_frames"]
+        portrait_key, bg_key = self._resolve_keys(portrait_key, bg_key)
+        crop_box = resolve_crop_box(self.layout, self.canvas_size)
+
+        _, _, body_ops = self._message_ops(text, speaker_name, portrait_key, bg_key)
+        frame_count = len(reveal_schedule(sum(len(op[1]) for op in body_ops), max_frames))
+        durations = frame_durations(frame_count, frame_ms, RENDER_OPTIONS["typewriter_hold_ms"])
+        steps = self._iter_typewriter(text, portrait_key, bg_key, speaker_name, crop_box, max_frames)
+        final = functools.partial(
+            self._render_on_base, text, portrait_key, bg_key, speaker_name, crop_box, False
+        )
+        return encode_animation(self._encoded_frames(steps, fmt, final), fmt, durations)
+
+    def _encoded_frames(
+        self,
+        steps: Iterator[Tuple[Image.Image, Optional[Box]]],
+        fmt: str,
+        final: Callable[[], Image.Image],
+    ) -> Iterator[Image.Image]:
+        """
+        Convert frames to the encoder's mode, re-converting only the dirty region of
+        each step. GIF frames share one palette taken from the finished image, so
+        unchanged pixels keep the same index and the writer's frame diff stays small.
+        """
+        encoded: Optional[Image.Image] = None
+        palette: Optional[Image.Image] = None
+        for frame, dirty in steps:
+            if encoded is None:
+                if fmt == "gif":
+                    palette = final().convert("RGB").quantize(256, method=Image.Quantize.FASTOCTREE)
+                encoded = self._convert_frame(frame, palette)
+            elif dirty:
+                encoded.paste(self._convert_frame(frame.crop(dirty), palette), dirty[:2])
+            yield encoded.copy()
+
+    @staticmethod
+    def _convert_frame(image: Image.Image, palette: Optional[Image.Image]) -> Image.Image:
+        rgb = image.convert("RGB")
+        if palette is None:
+            return rgb
+        return rgb.quantize(palette=palette, dither=Image.Dither.NONE)
 
-        # 应用裁剪（如果启用）
-        canvas = self._apply_crop(canvas)
+    def iter_typewriter_frames(
+        self,
+        text: str,
+        portrait_key: Optional[str] = None,
+        bg_key: Optional[str] = None,
+        speaker_name: Optional[str] = None,
+        max_frames: Optional[int] = None,
+    ) -> Iterator[Image.Image]:
+        """
+        Yield typewriter frames drawn incrementally into one buffer: each frame only
+        pastes the glyphs revealed since the previous one, so total drawing work is
+        the same as a single render(). The yielded image is that shared buffer.
+        """
+        portrait_key, bg_key = self._resolve_keys(portrait_key, bg_key)
+        crop_box = resolve_crop_box(self.layout, self.canvas_size)
+        max_frames = max_frames or RENDER_OPTIONS["typewriter_max_frames"]
+        for frame, _ in self._iter_typewriter(text, portrait_key, bg_key, speaker_name, crop_box, max_frames):
+            yield frame
+
+    def _iter_typewriter(
+        self,
+        text: str,
+        portrait_key: str,
+        bg_key: str,
+        speaker_name: Optional[str],
+        crop_box: Optional[Box],
+        max_frames: int,
+    ) -> Iterator[Tuple[Image.Image, Optional[Box]]]:
+        """Yield (frame buffer, region changed since the previous frame)."""
+        origin = (crop_box[0], crop_box[1]) if crop_box else (0, 0)
+        base = self._get_base_canvas(portrait_key, bg_key, crop_box)
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+
+        overlays, name_ops, body_ops = self._message_ops(text, speaker_name, portrait_key, bg_key)
+        self._apply_overlays(frame, overlays, origin)
+        self._draw_ops(frame, draw, name_ops, origin)
+
+        # 当前正在显示的行：已显示字数，以及开始画这一行之前该行区域的像素
+        shown = 0
+        op_index = 0
+        line_box: Optional[Box] = None
+        snapshot: Optional[Image.Image] = None
+        for count in reveal_schedule(sum(len(op[1]) for op in body_ops), max_frames):
+            remaining = count - sum(len(op[1]) for op in body_ops[:op_index]) - shown
+            dirty: Optional[Box] = None
+            while remaining > 0 and op_index < len(body_ops):
+                (x, y), line, font, color = body_ops[op_index]
+                xy = (x - origin[0], y - origin[1])
+                if shown == 0:
+                    line_box = self._clamp_box(self.glyph_atlas.text_bbox(draw, xy, line, font), frame.size)
+                    snapshot = frame.crop(line_box) if line_box else None
+                end = min(len(line), shown + remaining)
+                # 重叠字形的覆盖率要整行合成，所以每帧还原该行后重画已显示的前缀
+                if snapshot is not None and line_box is not None:
+                    frame.paste(snapshot, line_box[:2])
+                self.glyph_atlas.draw_text(frame, draw, xy, line[:end], font, color)
+                dirty = _union_box(dirty, line_box)
+                remaining -= end - shown
+                shown = end
+                if end >= len(line):
+                    op_index += 1
+                    shown = 0
+            yield frame, dirty
+
+    def _render_on_base(
+        self,
+        text: str,
+        portrait_key: str,
+        bg_key: str,
+        speaker_name: Optional[str],
+        crop_box: Optional[Box],
+        reuse_buffer: bool,
+    ) -> Image.Image:
+        origin = (crop_box[0], crop_box[1]) if crop_box else (0, 0)
+        # render.base 包含内存命中；解码 / 实时合成 / 裁剪另有子阶段
+        with PROFILER.stage("render.base"):
+            base = self._get_base_canvas(portrait_key, bg_key, crop_box)
+        if reuse_buffer:
+            return self._render_band(base, (portrait_key, bg_key, crop_box), text, speaker_name, origin)
+        with PROFILER.stage("render.layout"):
+            overlays, name_ops, body_ops = self._message_ops(text, speaker_name, portrait_key, bg_key)
+        with PROFILER.stage("render.copy"):
+            canvas = base.copy()
+        with PROFILER.stage("render.draw"):
+            self._apply_overlays(canvas, overlays, origin)
+            draw = ImageDraw.Draw(canvas)
+            self._draw_ops(canvas, draw, name_ops + body_ops, origin)
         return canvas
 
-    def _get_base_canvas(self, portrait_key: str, bg_key: str) -> Image.Image:
+    def _render_band(
+        self,
+        base: Image.Image,
+        base_key: Tuple[Any, ...],
+        text: str,
+        speaker_name: Optional[str],
+        origin: Tuple[int, int] = (0, 0),
+    ) -> Image.Image:
+        """
+        Dirty-rectangle compositing: only the text band (name bbox ∪ text_area) is
+        copied from the base canvas, drawn, and pasted into a reusable output buffer.
+        ``origin`` is the top-left of base in canvas coordinates (non-zero when cropped).
+        """
+        with PROFILER.stage("render.layout"):
+            overlays, name_ops, body_ops = self._message_ops(text, speaker_name, base_key[0], base_key[1])
+        ops = name_ops + body_ops
+        band = _union_box(self._ops_bbox(ops), tuple(self.layout.get("text_area", [0, 0, 0, 0])))
+        for image, (x, y), _ in overlays:
+            band = _union_box(band, (x, y, x + image.width, y + image.height))
+        if band is not None:
+            band = (band[0] - origin[0], band[1] - origin[1], band[2] - origin[0], band[3] - origin[1])
+        band = self._clamp_box(band, base.size)
+
+        buffer = self._output_buffer
+        if buffer is None or self._output_key != base_key or buffer.size != base.size:
+            with PROFILER.stage("render.copy"):
+                buffer = base.copy()
+            self._output_buffer = buffer
+            self._output_key = base_key
+            self._output_dirty = None
+
+        # 上一条消息写过的区域也要恢复成底图
+        region = self._clamp_box(_union_box(band, self._output_dirty), base.size)
+        if region:
+            with PROFILER.stage("render.copy"):
+                patch = base.crop(region)
+            with PROFILER.stage("render.draw"):
+                patch_origin = (origin[0] + region[0], origin[1] + region[1])
+                self._apply_overlays(patch, overlays, patch_origin)
+                self._draw_ops(patch, ImageDraw.Draw(patch), ops, patch_origin)
+                buffer.paste(patch, (region[0], region[1]))
+        self._output_dirty = band
+        return buffer
+
+    def is_shared_output(self, image: Image.Image) -> bool:
+        """True when image is the reusable band buffer rather than a fresh image."""
+        return image is self._output_buffer
+
+    @staticmethod
+    def _clamp_box(box: Optional[Box], size: Tuple[int, int]) -> Optional[Box]:
+        if box is None:
+            return None
+        x1 = max(0, min(int(box[0]), size[0]))
+        y1 = max(0, min(int(box[1]), size[1]))
+        x2 = max(x1, min(int(box[2]), size[0]))
+        y2 = max(y1, min(int(box[3]), size[1]))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    def _get_base_canvas(
+        self,
+        portrait_key: str,
+        bg_key: str,
+        crop_box: Optional[Box] = None,
+    ) -> Image.Image:
+        """Fetch the base canvas, optionally already cropped to crop_box."""
+        if crop_box:
+            return self._get_cropped_base(portrait_key, bg_key, crop_box)
+
         cache_key = (portrait_key, bg_key)
-        if self.use_memory_cache and cache_key in self._canvas_cache:
-            return self._canvas_cache[cache_key]
+        if self.use_memory_cache:
+            cached = self._canvas_cache.get(cache_key)
+            if cached is not None:
+                return cached
 
         filename = f"p_{portrait_key}__b_{bg_key}{self.cache_ext}"
-        cache_path = os.path.join(self.base_path, "cache", self.char_id, filename)
+        cache_path = os.path.join(self._cache_dir(), filename)
 
         if os.path.exists(cache_path):
-            img = Image.open(cache_path).convert("RGBA")
+            with PROFILER.stage("render.base.decode"):
+                img = _decode_image(cache_path)
             if self.use_memory_cache:
-                self._canvas_cache[cache_key] = img
+                self._canvas_cache.put(cache_key, img)
             return img
 
         # 兼容旧缓存扩展名
         legacy_path = cache_path[:-len(self.cache_ext)] + ".png"
         if not os.path.exists(cache_path) and os.path.exists(legacy_path):
-            img = Image.open(legacy_path).convert("RGBA")
+            with PROFILER.stage("render.base.decode"):
+                img = _decode_image(legacy_path)
             if self.use_memory_cache:
-                self._canvas_cache[cache_key] = img
+                self._canvas_cache.put(cache_key, img)
             return img
 
-        img = self._realtime_render(portrait_key, bg_key)
+        img = self._build_profile_base(portrait_key, bg_key, cache_path) if self.is_scaled else None
+        if img is None and self.cache_mode == "layered" and not self.is_scaled:
+            img = self._layered_base(portrait_key, bg_key)
+        if img is None:
+            with PROFILER.stage("render.base.realtime"):
+                img = self._realtime_render(portrait_key, bg_key)
+            if self.cache_mode == "lazy":
+                self._write_behind(portrait_key, bg_key, cache_path, img)
         if self.use_memory_cache:
-            self._canvas_cache[cache_key] = img
+            self._canvas_cache.put(cache_key, img)
         return img
 
+    def _get_cropped_base(self, portrait_key: str, bg_key: str, crop_box: Box) -> Image.Image:
+        """
+        Pre-cropped base canvas: prefer the variant written by prebuild
+        (cache/<char>/_crop/<x1_y1_x2_y2>/) or the layers of a layered cache,
+        otherwise crop the full base once.
+        """
+        cache_key = (portrait_key, bg_key, crop_box)
+        if self.use_memory_cache:
+            cached = self._canvas_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        filename = f"p_{portrait_key}__b_{bg_key}{self.cache_ext}"
+        crop_path = os.path.join(self._cache_dir(), "_crop", crop_cache_dirname(crop_box), filename)
+        img: Optional[Image.Image] = None
+        if os.path.exists(crop_path):
+            with PROFILER.stage("render.base.decode"):
+                img = _decode_image(crop_path)
+        elif self.cache_mode == "layered" and not self.is_scaled:
+            # 分层缓存：只在裁剪区域内合成
+            img = self._layered_base(portrait_key, bg_key, crop_box)
+        if img is None:
+            full = self._get_base_canvas(portrait_key, bg_key)
+            with PROFILER.stage("render.base.crop"):
+                img = full.crop(crop_box)
+            # 裁剪模式下只保留裁剪后的底图
+            self._canvas_cache.pop((portrait_key, bg_key))
+
+        if self.use_memory_cache:
+            self._canvas_cache.put(cache_key, img)
+        return img
+
+    def _build_profile_base(self, portrait_key: str, bg_key: str, save_path: str) -> Optional[Image.Image]:
+        """
+        Downscale the full-size cached base to the profile canvas and keep it on disk.
+        Baked names are undone first since text is drawn at the profile's font size.
+        Returns None when there is no full-size base to start from.
+        """
+        filename = os.path.basename(save_path)
+        full_path = os.path.join(self.base_path, "cache", self.char_id, filename)
+        if not os.path.exists(full_path):
+            return None
+        patch = self._read_name_patch(portrait_key, bg_key)
+        if patch is None:
+            with PROFILER.stage("render.base.decode"):
+                img = _decode_image(full_path, self.canvas_size)
+        else:
+            # 名字区域要在原始尺寸下还原，只能整张解码
+            with PROFILER.stage("render.base.decode"):
+                full = _decode_image(full_path)
+            full.paste(patch[0], patch[1])
+            with PROFILER.stage("render.base.scale"):
+                img = full.resize(self.canvas_size, Image.Resampling.LANCZOS)
+        try:
+            save_image_atomic(img, save_path, RENDER_OPTIONS["jpeg_quality"])
+        except OSError as e:
+            print(f"⚠️ 无法保存缩放后的底图 {save_path}: {e}")
+        return img
+
+    def _layered_base(
+        self,
+        portrait_key: str,
+        bg_key: str,
+        crop_box: Optional[Box] = None,
+    ) -> Optional[Image.Image]:
+        """
+        Layered cache mode: decode the background layer (cropped to crop_box when
+        given) and blend the trimmed portrait sprite, then the dialog box unless it
+        is baked in, over their own region only. Returns None when a layer is
+        missing or was built for another stand_on_top.
+        """
+        layers = self._load_layer_meta()
+        stand_on_top = bool(self.layout.get("stand_on_top", False))
+        if not layers or bool(layers.get("box_baked")) != stand_on_top:
+            return None
+        bg_path = os.path.join(self._cache_dir(), LAYER_DIR, f"b_{bg_key}{self.cache_ext}")
+        sprite = self._get_layer_sprite(portrait_key)
+        if sprite is None or not os.path.exists(bg_path):
+            return None
+
+        stand_pos = self.layout.get("stand_pos", (0, 0))
+        placements = [(sprite[0], (int(stand_pos[0]) + sprite[1][0], int(stand_pos[1]) + sprite[1][1]))]
+        if not stand_on_top:
+            fitted_box = self._get_dialog_box()
+            if fitted_box:
+                placements.append(fitted_box)
+
+        with PROFILER.stage("render.base.decode"):
+            img = _decode_image(bg_path)
+        origin = (0, 0)
+        if crop_box:
+            with PROFILER.stage("render.base.crop"):
+                img = img.crop(crop_box)
+            origin = (crop_box[0], crop_box[1])
+        with PROFILER.stage("render.base.layers"):
+            for layer, (x, y) in placements:
+                img.paste(layer, (x - origin[0], y - origin[1]), layer)
+        return img
+
+    def _get_layer_sprite(self, portrait_key: str) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """Trimmed portrait sprite of the layered cache and its offset from stand_pos."""
+        sprite = self._layer_sprites.get(portrait_key)
+        if sprite is None:
+            path = os.path.join(self._cache_dir(), LAYER_DIR, f"p_{portrait_key}.png")
+            if not os.path.exists(path):
+                return None
+            with PROFILER.stage("render.base.decode"):
+                img = Image.open(path)
+                img.load()
+            try:
+                x, y = (int(v) for v in str(img.info.get(SPRITE_OFFSET_KEY, "0,0")).split(","))
+            except ValueError:
+                return None
+            sprite = (img if img.mode == "RGBA" else img.convert("RGBA"), (x, y))
+            self._layer_sprites.put(portrait_key, sprite)
+        return sprite
+
+    def _write_behind(self, portrait_key: str, bg_key: str, cache_path: str, img: Image.Image) -> None:
+        """Lazy cache mode: hand a realtime-composited base to the background writer."""
+        if portrait_key not in self.assets["portraits"] or bg_key not in self.assets["backgrounds"]:
+            # 素材缺失时合成的是替代图，不能以这个组合的名字保存
+            return
+        on_saved = None if self.is_scaled else self._record_base
+        _cache_writer().submit(cache_path, img, on_saved)
+
+    def _record_base(self, path: str) -> None:
+        record_cached_bases(self.char_id, os.path.join(self.base_path, "cache"), [os.path.basename(path)])
+
     def _realtime_render(self, portrait_key: str, bg_key: str) -> Image.Image:
         canvas_w, canvas_h = self.canvas_size
         canvas = Image.new("RGBA", (canvas_w, canvas_h), (0, 0, 0, 0))
@@ -241,60 +901,74 @@ class CharacterRenderer:
                 new_h = int(portrait.height * stand_scale)
                 portrait = portrait.resize((new_w, new_h), Image.Resampling.LANCZOS)
 
-        # 对话框：拉满宽度并贴底
-        dialog_box = self.assets.get("dialog_box")
-        if dialog_box:
-            dialog_box, box_pos = self._fit_dialog_box_to_canvas(dialog_box)
-        else:
-            box_pos = (0, 0)
-
-        stand_on_top = layout.get("stand_on_top", False)
-        if not stand_on_top:
-            if portrait:
-                canvas.paste(portrait, stand_pos, portrait)
-            if dialog_box:
-                canvas.paste(dialog_box, box_pos, dialog_box)
+        # 对话框：拉满宽度，位置与预处理一致（layout.box_pos，缺省贴底）
+        fitted_box = self._get_dialog_box()
+        if fitted_box:
+            dialog_box, box_pos = fitted_box
         else:
-            if dialog_box:
-                canvas.paste(dialog_box, box_pos, dialog_box)
-            if portrait:
-                canvas.paste(portrait, stand_pos, portrait)
-
-        return canvas
-
-    def _resize_to_canvas(self, img: Image.Image) -> Image.Image:
-        if img.size == self.canvas_size:
-            return img
-        return img.resize(self.canvas_size, Image.Resampling.LANCZOS)
-
-    def _apply_crop(self, canvas: Image.Image) -> Image.Image:
-        """应用裁剪区域（如果启用）"""
-        layout = self.layout
-        enable_crop = layout.get("enable_crop", False)
-
-        if not enable_crop:
-            return canvas
-
-        crop_area = layout.get("crop_area")
-        if not crop_area or not isinstance(crop_area, (list, tuple)) or len(crop_area) != 4:
-            return canvas
-
-        x1, y1, x2, y2 = crop_area
-
-        # 确保裁剪区域在画布范围内
-        canvas_w, canvas_h = canvas.size
-        x1 = max(0, min(x1, canvas_w))
-        y1 = max(0, min(y1, canvas_h))
-        x2 = max(x1, min(x2, canvas_w))
-        y2 = max(y1, min(y2, canvas_h))
+            dialog_box, box_pos = None, (0, 0)
 
-        # 裁剪图片
-        if x2 > x1 and y2 > y1:
-            cropped = canvas.crop((x1, y1, x2, y2))
-            print(f"✂️ 已裁剪图片: ({x1}, {y1}) → ({x2}, {y2}), 输出尺寸: {cropped.size}")
-            return cropped
+        layers = []
+        if portrait:
+            layers.append((portrait, stand_pos))
+        if dialog_box:
+            layers.append((dialog_box, box_pos))
+        if layout.get("stand_on_top", False):
+            layers.reverse()
+        for img, pos in layers:
+            canvas.paste(img, pos, img)
+        return _drop_opaque_alpha(canvas)
+
+    def config_signature(self) -> str:
+        """
+        Hash of everything in the character config that affects the output image,
+        including the content of the font files (a font replaced under the same name
+        changes the signature).
+        """
+        hashes = _file_hashes(os.path.join(self.base_path, "cache"))
+        relevant = {
+            "meta": self.config.get("meta", {}),
+            "style": self.style,
+            "layout": self.layout,
+            "assets": self.config.get("assets", {}),
+            "fonts": {path: hashes.digest(path) for path in self._font_files()},
+        }
+        hashes.save()
+        raw = json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _font_files(self) -> List[str]:
+        """Resolved paths of every font the style can draw with (text, names, name layers, fallbacks)."""
+        names = [self.style.get("font_file"), self.style.get("name_font_file")]
+        layers_map = self.style.get("advanced", {}).get("name_layers")
+        for target_layers in layers_map.values() if isinstance(layers_map, dict) else []:
+            for entry in target_layers if isinstance(target_layers, list) else []:
+                if isinstance(entry, dict):
+                    names.append(entry.get("font_file"))
+        paths = [self._resolve_font_path(name) for name in names]
+        fallbacks = self.style.get("fallback_fonts") or []
+        paths += [self._find_font_file(str(name)) for name in (fallbacks if isinstance(fallbacks, list) else [])]
+        return sorted({path for path in paths if path})
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the renderer's in-memory caches."""
+        return {
+            "canvas": self._canvas_cache.stats(),
+            "portraits": self.assets["portraits"].stats(),
+            "backgrounds": self.assets["backgrounds"].stats(),
+            "wrap": self._wrapper.stats(),
+            "glyphs": self.glyph_atlas.stats(),
+            "writer": _CACHE_WRITER.stats() if _CACHE_WRITER is not None else None,
+        }
 
-        return canvas
+    def _resolve_box_position(self, box_img: Image.Image) -> Tuple[int, int]:
+        canvas_w, canvas_h = self.canvas_size
+        pos = self.layout.get("box_pos")
+        if isinstance(pos, (list, tuple)) and len(pos) == 2:
+            x = max(-box_img.width, min(int(pos[0]), canvas_w))
+            y = max(-box_img.height, min(int(pos[1]), canvas_h))
+            return x, y
+        return (0, canvas_h - box_img.height)
 
     def _fit_dialog_box_to_canvas(self, box_img: Image.Image) -> Tuple[Image.Image, Tuple[int, int]]:
         """Resize dialog box to canvas width and bottom align."""
@@ -306,61 +980,230 @@ class CharacterRenderer:
         box_pos = (0, canvas_h - box_img.height)
         return box_img, box_pos
 
+    # -----------------------
+    # 预烘焙名字
+    # -----------------------
+    def _message_ops(
+        self,
+        text: str,
+        speaker_name: Optional[str],
+        portrait_key: str,
+        bg_key: str,
+    ) -> Tuple[List[NameOverlay], List[TextOp], List[TextOp]]:
+        """
+        Split a message into (overlays pasted first, name ops, body ops).
+        With baked bases the default speaker needs nothing; other speakers get the
+        unbaked patch plus their cached name sprite instead of redrawn layers.
+        """
+        plan = self.plan
+        if speaker_name is None:
+            speaker_name = plan.default_speaker
+        body_ops = plan.layout(text, speaker_name, self._wrapper, include_name=False)
+        state = self._get_name_bake_state()
+        if state == "none":
+            return [], plan.name_ops(speaker_name), body_ops
+
+        patch = self._get_name_patch(portrait_key, bg_key)
+        if patch is None:
+            return [], plan.name_ops(speaker_name), body_ops
+        overlays: List[NameOverlay] = [(patch[0], patch[1], None)]
+        if state == "stale":
+            # 配置已改但缓存未重建：还原底图后照常绘制名字
+            return overlays, plan.name_ops(speaker_name), body_ops
+        if speaker_name == plan.default_speaker:
+            return [], [], body_ops
+        overlays.extend(self._get_name_sprite(speaker_name))
+        return overlays, [], body_ops
+
+    def _load_cache_meta(self) -> Dict[str, Any]:
+        """cache/<char>/_meta.json (read once)."""
+        if self._cache_meta is None:
+            meta_path = os.path.join(self.base_path, "cache", self.char_id, "_meta.json")
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                self._cache_meta = meta if isinstance(meta, dict) else {}
+            except (OSError, ValueError):
+                self._cache_meta = {}
+        return self._cache_meta
+
+    def _load_layer_meta(self) -> Optional[Dict[str, Any]]:
+        """layers entry of _meta.json when the cache was built in layered mode."""
+        meta = self._load_cache_meta()
+        layers = meta.get("layers") if meta.get("cache_mode") == "layered" else None
+        return layers if isinstance(layers, dict) else None
+
+    def _load_name_bake(self) -> Optional[Dict[str, Any]]:
+        """name_bake entry of cache/<char>/_meta.json (read once)."""
+        if not self._name_bake_loaded:
+            bake = self._load_cache_meta().get("name_bake")
+            self._name_bake = bake if isinstance(bake, dict) else None
+            self._name_bake_loaded = True
+        return self._name_bake
+
+    def _get_name_bake_state(self) -> str:
+        """"none" (not baked), "active" or "stale" (baked with an outdated name style)."""
+        plan = self.plan
+        if self._name_bake_state is not None and self._name_bake_state[0] is plan:
+            return self._name_bake_state[1]
+
+        # 输出配置下的底图在缩放前已还原名字区域
+        if self.is_scaled or not self._load_name_bake():
+            state = "none"
+        elif self._name_bake.get("signature") == plan.name_signature():
+            state = "active"
+        else:
+            state = "stale"
+        self._name_bake_state = (plan, state)
+        return state
+
+    def _get_name_patch(self, portrait_key: str, bg_key: str) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        """Unbaked pixels under the baked name, saved by prebuild in cache/<char>/_name."""
+        cache_key = (portrait_key, bg_key, "_name")
+        cached = self._canvas_cache.get(cache_key) if self.use_memory_cache else None
+        if cached is not None:
+            box = (self._name_bake or {})["box"]
+            return cached, (int(box[0]), int(box[1]))
+        patch = self._read_name_patch(portrait_key, bg_key)
+        if patch is not None and self.use_memory_cache:
+            self._canvas_cache.put(cache_key, patch[0])
+        return patch
+
+    def _read_name_patch(self, portrait_key: str, bg_key: str) -> Optional[Tuple[Image.Image, Tuple[int, int]]]:
+        box = (self._load_name_bake() or {}).get("box")
+        if not isinstance(box, list) or len(box) != 4:
+            return None
+        path = os.path.join(
+            self.base_path, "cache", self.char_id, "_name", f"p_{portrait_key}__b_{bg_key}.png"
+        )
+        if not os.path.exists(path):
+            return None
+        return _decode_image(path), (int(box[0]), int(box[1]))
+
+    def _get_name_sprite(self, speaker_name: Optional[str]) -> List[NameOverlay]:
+        """
+        Name layers of a speaker rasterized once into coverage masks.
+        Kept as (mask, xy, color) rather than one RGBA image: painting each mask with
+        its color reproduces draw.text exactly, also over the translucent dialog box.
+        """
+        sprite = self._name_sprites.get(speaker_name)
+        if sprite is not None:
+            return sprite
+        sprite = []
+        for (x, y), value, font, color in self.plan.name_ops(speaker_name):
+            box = self.glyph_atlas.text_bbox(self._measure_draw, (x, y), value, font)
+            if box is None or box[2] <= box[0] or box[3] <= box[1]:
+                continue
+            mask = Image.new("L", (box[2] - box[0], box[3] - box[1]), 0)
+            xy = (x - box[0], y - box[1])
+            self.glyph_atlas.draw_text(mask, ImageDraw.Draw(mask), xy, value, font, 255)
+            sprite.append((mask, (box[0], box[1]), color))
+        self._name_sprites.put(speaker_name, sprite)
+        return sprite
+
+    @staticmethod
+    def _apply_overlays(canvas: Image.Image, overlays: List[NameOverlay], origin: Tuple[int, int]) -> None:
+        for image, (x, y), color in overlays:
+            dx, dy = x - origin[0], y - origin[1]
+            if color is None:
+                canvas.paste(image, (dx, dy))
+            else:
+                canvas.paste(color, (dx, dy, dx + image.width, dy + image.height), image)
+
+    def name_bake_layer(self) -> Optional[Dict[str, Any]]:
+        """
+        Name block of the default speaker as prebuild bakes it: signature, speaker
+        and the patch box (ink bbox + NAME_BAKE_MARGIN, clamped to the canvas).
+        """
+        plan = self.plan
+        box = self._clamp_box(self._ops_bbox(plan.name_ops(plan.default_speaker)), self.canvas_size)
+        if box is None or box[2] <= box[0] or box[3] <= box[1]:
+            return None
+        margin = NAME_BAKE_MARGIN
+        box = self._clamp_box(
+            (box[0] - margin, box[1] - margin, box[2] + margin, box[3] + margin), self.canvas_size
+        )
+        return {
+            "signature": plan.name_signature(),
+            "speaker": plan.default_speaker,
+            "box": list(box),  # type: ignore[arg-type]
+        }
+
+    def draw_default_name(self, canvas: Image.Image) -> None:
+        """Draw the default speaker's name exactly as render() would (used by prebuild)."""
+        plan = self.plan
+        self._draw_ops(canvas, ImageDraw.Draw(canvas), plan.name_ops(plan.default_speaker))
+
     # -----------------------
     # 文本绘制
     # -----------------------
-    def _draw_text(self, draw: ImageDraw.ImageDraw, text: str, speaker_name: Optional[str]):
+    @property
+    def plan(self) -> RenderPlan:
+        """Compiled style/layout; rebuilt lazily after invalidate_plan()."""
+        if self._plan is None:
+            self._plan = self._compile_plan()
+        return self._plan
+
+    def invalidate_plan(self) -> None:
+        """Call after changing self.style / self.layout / fonts in place."""
+        self._plan = None
+        self._name_sprites.clear()
+
+    def _compile_plan(self) -> RenderPlan:
         style = self.style
         basic = style.get("basic", {})
-        text_color = self._color_tuple(basic.get("text_color"), (255, 255, 255))
-        name_color = self._color_tuple(basic.get("name_color"), (253, 145, 175))
         text_size = max(1, int(basic.get("font_size", 40)))
         name_size = max(1, int(basic.get("name_font_size", text_size)))
-
-        font_text_path = self._resolve_font_path(style.get("font_file"))
-        font_name_path = self._resolve_font_path(style.get("name_font_file"))
-        font_text: FontType = self._get_font(text_size, font_text_path)
-        font_name: FontType = self._get_font(name_size, font_name_path)
+        font_text = self._get_text_font(text_size, style.get("font_file"))
+        font_name = self._get_text_font(name_size, style.get("name_font_file"))
 
         layout = self.layout
-        text_area = layout.get("text_area", [100, 800, 1800, 1000])
-        name_pos: Tuple[float, float] = layout.get("name_pos", [100, 100])
+        x1, y1, x2, y2 = layout.get("text_area", [100, 800, 1800, 1000])
+        name_pos = layout.get("name_pos", [100, 100])
 
-        if speaker_name is None:
-            speaker_name = self.config.get("meta", {}).get("name", self.char_id)
+        wrapper = style.get("text_wrapper", {})
+        tokens = self._resolve_wrapper_tokens(wrapper) if isinstance(wrapper, dict) else ("", "")
 
-        # 名字
-        name_drawn = False
+        name_layers = None
         if style.get("mode") == "advanced":
-            name_drawn = self._draw_advanced_name(draw, speaker_name, name_pos)
-        if not name_drawn:
-            self._draw_basic_name(draw, speaker_name, name_pos, font_name, name_color)
-
-        # 正文
-        text = self._apply_text_wrapper(text, style)
-        x1, y1, x2, y2 = text_area
-        max_width = max(10, x2 - x1)
-        lines = self._wrap_text(text, draw, font_text, max_width)
-        line_height = self._line_height(font_text)
-
-        for i, line in enumerate(lines):
-            y = y1 + i * line_height
-            if y > y2 - line_height:
-                break
-            draw.text((x1, y), line, font=font_text, fill=text_color)
-
-    def _apply_text_wrapper(self, text: str, style: Dict[str, Any]) -> str:
-        wrapper = style.get("text_wrapper", {})
-        if not isinstance(wrapper, dict):
-            return text
-        prefix, suffix = self._resolve_wrapper_tokens(wrapper)
-        w_type = wrapper.get("type", "none")
-        if w_type == "none" or (not prefix and not suffix):
-            return text
+            name_layers = self._compile_name_layers((float(name_pos[0]), float(name_pos[1])))
+
+        return RenderPlan(
+            text_font=font_text,
+            text_color=self._color_tuple(basic.get("text_color"), (255, 255, 255)),
+            line_height=self._line_height(font_text),
+            text_area=(x1, y1, x2, y2),
+            name_pos=(name_pos[0], name_pos[1]),
+            name_font=font_name,
+            name_color=self._color_tuple(basic.get("name_color"), (253, 145, 175)),
+            wrapper_tokens=tokens,
+            default_speaker=self.config.get("meta", {}).get("name", self.char_id),
+            name_layers=name_layers,
+        )
+
+    def _draw_ops(
+        self,
+        canvas: Image.Image,
+        draw: ImageDraw.ImageDraw,
+        ops: List[TextOp],
+        origin: Tuple[int, int] = (0, 0),
+    ) -> None:
+        ox, oy = origin
+        width, height = canvas.size
+        for (x, y), value, font, color in ops:
+            xy = (x - ox, y - oy)
+            if origin != (0, 0):
+                # 裁剪后完全落在画面外的文字直接跳过
+                box = self.glyph_atlas.text_bbox(draw, xy, value, font)
+                if box is None or box[2] <= 0 or box[3] <= 0 or box[0] >= width or box[1] >= height:
+                    continue
+            self.glyph_atlas.draw_text(canvas, draw, xy, value, font, color)
 
-        if not text:
-            return f"{prefix}{suffix}" if (prefix or suffix) else text
-        return f"{prefix}{text}{suffix}"
+    def _ops_bbox(self, ops: List[TextOp]) -> Optional[Tuple[int, int, int, int]]:
+        box: Optional[Tuple[int, int, int, int]] = None
+        for xy, value, font, _ in ops:
+            box = _union_box(box, self.glyph_atlas.text_bbox(self._measure_draw, xy, value, font))
+        return box
 
     def _resolve_wrapper_tokens(self, wrapper: Dict[str, Any]) -> Tuple[str, str]:
         w_type = wrapper.get("type", "none")
@@ -375,93 +1218,47 @@ class CharacterRenderer:
             return str(prefix or ""), str(suffix or "")
         return "", ""
 
-    def _draw_basic_name(
-        self,
-        draw: ImageDraw.ImageDraw,
-        speaker_name: Optional[str],
-        name_pos: Tuple[float, float],
-        font: FontType,
-        color: Tuple[int, int, int],
-    ) -> None:
-        if speaker_name:
-            draw.text(name_pos, speaker_name, font=font, fill=color)
-
-    def _draw_advanced_name(
-        self,
-        draw: ImageDraw.ImageDraw,
-        speaker_name: Optional[str],
-        name_pos: Tuple[float, float],
-    ) -> bool:
+    def _compile_name_layers(self, name_pos: Tuple[float, float]) -> Optional[Dict[str, List[NameLayer]]]:
+        """Resolve advanced.name_layers into absolute-position templates per speaker."""
         advanced = self.style.get("advanced", {})
         layers_map = advanced.get("name_layers")
         if not isinstance(layers_map, dict):
-            return False
-
-        target_layers: Optional[List[Dict[str, Any]]] = None
-        if speaker_name and speaker_name in layers_map:
-            target_layers = layers_map[speaker_name]
-        elif "default" in layers_map:
-            target_layers = layers_map["default"]
-
-        if not isinstance(target_layers, list):
-            return False
+            return {}
 
-        base_x, base_y = float(name_pos[0]), float(name_pos[1])
+        base_x, base_y = name_pos
         basic = self.style.get("basic", {})
         fallback_color = self._color_tuple(basic.get("name_color"), (255, 255, 255))
         fallback_size = max(1, int(basic.get("name_font_size", 32)))
-        rendered = False
+        compiled: Dict[str, List[NameLayer]] = {}
 
-        for entry in target_layers:
-            if not isinstance(entry, dict):
-                continue
-            text_value = entry.get("text", "")
-            if speaker_name is not None:
-                text_value = str(text_value).replace("{name}", speaker_name)
-            else:
-                text_value = str(text_value)
-
-            position = entry.get("position", [0, 0])
-            if (
-                not isinstance(position, (list, tuple))
-                or len(position) != 2
-            ):
-                offset_x, offset_y = 0.0, 0.0
-            else:
-                offset_x = float(position[0])
-                offset_y = float(position[1])
-
-            abs_pos = (base_x + offset_x, base_y + offset_y)
-
-            font_size = entry.get("font_size", fallback_size)
-            font_size = max(1, int(font_size)) if isinstance(font_size, (int, float)) else fallback_size
-            font_file = entry.get("font_file")
-            font = self._get_font(font_size, self._resolve_font_path(font_file))
-
-            color = self._color_tuple(entry.get("font_color"), fallback_color)
-
-            draw.text(abs_pos, text_value, font=font, fill=color)
-            rendered = True
-
-        return rendered
-
-    def _wrap_text(self, text: str, draw: ImageDraw.ImageDraw, font: FontType, max_width: int):
-        lines = []
-        paragraphs = text.split("\n") if text else [""]
-        for para in paragraphs:
-            if not para:
-                lines.append("")
-                continue
-            current = ""
-            for ch in para:
-                if draw.textlength(current + ch, font=font) <= max_width:
-                    current += ch
+        for speaker, target_layers in layers_map.items():
+            layers: List[NameLayer] = []
+            # 非列表的配置视为没有图层（回退到 basic 名字）
+            for entry in target_layers if isinstance(target_layers, list) else []:
+                if not isinstance(entry, dict):
+                    continue
+                position = entry.get("position", [0, 0])
+                if (
+                    not isinstance(position, (list, tuple))
+                    or len(position) != 2
+                ):
+                    offset_x, offset_y = 0.0, 0.0
                 else:
-                    lines.append(current)
-                    current = ch
-            if current:
-                lines.append(current)
-        return lines
+                    offset_x = float(position[0])
+                    offset_y = float(position[1])
+
+                font_size = entry.get("font_size", fallback_size)
+                font_size = max(1, int(font_size)) if isinstance(font_size, (int, float)) else fallback_size
+                font = self._get_text_font(font_size, entry.get("font_file"))
+
+                layers.append((
+                    (base_x + offset_x, base_y + offset_y),
+                    str(entry.get("text", "")),
+                    font,
+                    self._color_tuple(entry.get("font_color"), fallback_color),
+                ))
+            compiled[speaker] = layers
+        return compiled
 
     def _line_height(self, font: FontType) -> Union[int, float]:
         bbox = font.getbbox("测试")
@@ -492,24 +1289,66 @@ class CharacterRenderer:
                 return w, h
         return None
 
-    def _resolve_font_path(self, font_file: Optional[str]) -> Optional[str]:
-        """Resolve a font path with fallbacks."""
-        if font_file:
-            if os.path.isabs(font_file) and os.path.exists(font_file):
-                return font_file
+    def _find_font_file(self, font_file: Optional[str]) -> Optional[str]:
+        """Look up a font file as an absolute path, in the character folder, then in common/fonts."""
+        if not font_file:
+            return None
+        if os.path.isabs(font_file) and os.path.exists(font_file):
+            return font_file
 
-            char_path = os.path.join(self.char_root, font_file)
-            if os.path.exists(char_path):
-                return char_path
+        char_path = os.path.join(self.char_root, font_file)
+        if os.path.exists(char_path):
+            return char_path
 
-            common_path = os.path.join(self.base_path, "common", "fonts", font_file)
-            if os.path.exists(common_path):
-                return common_path
+        common_path = os.path.join(self.base_path, "common", "fonts", font_file)
+        if os.path.exists(common_path):
+            return common_path
+        return None
 
+    def _resolve_font_path(self, font_file: Optional[str]) -> Optional[str]:
+        """Resolve a font path with fallbacks."""
+        found = self._find_font_file(font_file)
+        if found:
+            return found
         if self.default_font_path and os.path.exists(self.default_font_path):
             return self.default_font_path
         return None
 
+    def _get_text_font(self, size: int, font_file: Optional[str]) -> FontType:
+        """
+        Font used for drawing text: the resolved font, wrapped in a FontChain when
+        style.fallback_fonts lists fonts for characters it does not cover.
+        """
+        primary = self._get_font(size, self._resolve_font_path(font_file))
+        names = self.style.get("fallback_fonts") or []
+        fonts: List[FontType] = [primary]
+        for name in names if isinstance(names, list) else []:
+            path = self._find_font_file(str(name))
+            if not path:
+                if name not in self._missing_fonts:
+                    self._missing_fonts.add(name)
+                    print(f"⚠️ 找不到回退字体 {name}，已忽略")
+                continue
+            font = self._get_font(size, path)
+            # 加载失败时 _get_font 返回内置位图字体，不能作为回退
+            if isinstance(font, ImageFont.FreeTypeFont) and all(font is not f for f in fonts):
+                fonts.append(font)
+        if len(fonts) == 1:
+            return primary
+
+        key = tuple(id(font) for font in fonts)
+        chain = self._font_chains.get(key)
+        if chain is None:
+            cache_dir = os.path.join(self.base_path, "cache", "_fonts")
+            coverages = [
+                load_coverage(font.path, getattr(font, "index", 0), cache_dir)
+                if isinstance(font, ImageFont.FreeTypeFont) and isinstance(font.path, str) else None
+                for font in fonts
+            ]
+            chain = FontChain(fonts, coverages)
+            self._font_chains[key] = chain
+        return chain  # type: ignore[return-value]
+
     def _get_font(self, size: int, font_path: Optional[str]) -> FontType:
         """Load font with caching; fallback to default when missing."""
         cache_key = (size, font_path)
@@ -529,12 +1368,13 @@ class CharacterRenderer:
         return font
 
     @staticmethod
-    def _first_key(mapping: Dict[str, Image.Image]) -> Optional[str]:
+    def _first_key(mapping: Any) -> Optional[str]:
         return next(iter(mapping.keys()), None)
 
     @staticmethod
-    def _first_value(mapping: Dict[str, Image.Image]) -> Optional[Image.Image]:
-        return next(iter(mapping.values()), None)
+    def _first_value(mapping: Any) -> Optional[Image.Image]:
+        # 只解码第一项，避免遍历 values() 触发全部加载
+        return mapping.get(next(iter(mapping.keys()), None))
 
 
 if __name__ == "__main__":
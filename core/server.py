@@ -0,0 +1,359 @@
+# core/server.py
+"""
+本地渲染服务：角色只加载一次，多个聊天机器人进程通过 HTTP / Unix socket 共享。
+
+    python -m core.server [--host 127.0.0.1 --port 8765 | --unix /tmp/galgame.sock]
+        [--workers 4] [--queue 32] [--preload yuraa,other]
+
+    POST /render   {"character": "yuraa", "text": "...", "expression": "1",
+                    "background": "1", "speaker": "...", "format": "png"}
+                   -> 图片字节（image/png / image/jpeg / image/webp）
+    GET  /stats    -> 请求计数、排队情况与各阶段延迟分位数（JSON）
+    GET  /health   -> {"status": "ok"}
+
+渲染线程数有上限，排队请求超过 --queue 时直接返回 503，调用方可按 Retry-After 重试。
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .batch import OUTPUT_FORMATS
+from .prebuild import ensure_character_cache
+from .profiling import PROFILER
+from .renderer import CharacterRenderer, _encode_image
+
+# 请求体上限，台词 JSON 不会超过这个大小
+MAX_REQUEST_BYTES = 1024 * 1024
+LATENCY_WINDOW = 1024
+LATENCY_STAGES = ("total", "queue", "render", "encode")
+
+# Windows 上没有 socketserver.UnixStreamServer，只能使用 HTTP
+UNIX_SOCKET_SUPPORTED = hasattr(socketserver, "UnixStreamServer")
+
+_CONTENT_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp", "BMP": "image/bmp"}
+
+
+class ServiceBusy(Exception):
+    """Raised when every worker is busy and the queue is full."""
+
+
+class RequestError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyWindow:
+    """Latencies of the last ``size`` requests, summarized as percentiles."""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+
+        def pick(q: float) -> float:
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))], 2)
+
+        return {"count": len(samples), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": pick(1.0)}
+
+
+class RenderService:
+    """
+    Warm renderers shared by all clients. Renders run on a bounded thread pool
+    (assets stay decoded once per process); requests for the same character are
+    serialized because a renderer reuses its output buffer.
+    """
+
+    def __init__(self, base_path: str = "assets", workers: Optional[int] = None, queue_size: int = 32):
+        self.base_path = base_path
+        self.workers = max(1, workers or min(4, os.cpu_count() or 1))
+        self.queue_size = max(0, int(queue_size))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="render")
+        # 正在渲染 + 排队的请求总数上限，超出时拒绝而不是无限堆积
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._renderers: Dict[str, CharacterRenderer] = {}
+        self._char_locks: Dict[str, threading.Lock] = {}
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._latency = {stage: LatencyWindow() for stage in LATENCY_STAGES}
+        self._counters = {"requests": 0, "rendered": 0, "errors": 0, "rejected": 0, "pending": 0}
+        self._per_character: Dict[str, int] = {}
+        self.started = time.time()
+
+    def characters(self) -> List[str]:
+        root = os.path.join(self.base_path, "characters")
+        if not os.path.isdir(root):
+            return []
+        return sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+
+    def get_renderer(self, char_id: str) -> Tuple[CharacterRenderer, threading.Lock]:
+        renderer = self._renderers.get(char_id)
+        if renderer is not None:
+            return renderer, self._char_locks[char_id]
+        # 只接受 characters/ 下已有的目录名，避免请求里的路径穿越
+        if char_id not in self.characters():
+            raise RequestError(404, f"未找到角色 {char_id}")
+        with self._load_lock:
+            if char_id not in self._renderers:
+                ensure_character_cache(char_id, self.base_path, os.path.join(self.base_path, "cache"))
+                self._char_locks[char_id] = threading.Lock()
+                self._renderers[char_id] = CharacterRenderer(char_id, self.base_path)
+        return self._renderers[char_id], self._char_locks[char_id]
+
+    def preload(self, char_ids: List[str]) -> None:
+        for char_id in char_ids:
+            self.get_renderer(char_id)
+
+    def render(self, payload: Dict[str, Any]) -> Tuple[bytes, str]:
+        """Render one request; returns (image bytes, content type)."""
+        self._count("requests")
+        try:
+            job = self._parse(payload)
+        except RequestError:
+            self._count("errors")
+            raise
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise ServiceBusy("渲染队列已满")
+        self._count("pending")
+        try:
+            future = self._pool.submit(self._render_job, job, time.perf_counter())
+            return future.result()
+        except RequestError:
+            self._count("errors")
+            raise
+        except Exception as exc:
+            self._count("errors")
+            raise RequestError(500, f"渲染失败: {exc}") from exc
+        finally:
+            self._count("pending", -1)
+            self._slots.release()
+
+    @staticmethod
+    def _parse(payload: Any) -> Dict[str, Any]:
+        if not isinstance(payload, dict):
+            raise RequestError(400, "请求体必须是 JSON 对象")
+        char_id = payload.get("character")
+        if not char_id or not isinstance(char_id, str):
+            raise RequestError(400, "缺少 character")
+        fmt = str(payload.get("format") or "png").lower()
+        if fmt not in OUTPUT_FORMATS:
+            raise RequestError(400, f"不支持的输出格式: {fmt}（可选 {', '.join(OUTPUT_FORMATS)}）")
+        job = {"character": char_id, "format": fmt, "text": str(payload.get("text") or "")}
+        for key in ("expression", "background", "speaker"):
+            value = payload.get(key)
+            job[key] = str(value) if value not in (None, "") else None
+        return job
+
+    def _render_job(self, job: Dict[str, Any], submitted: float) -> Tuple[bytes, str]:
+        started = time.perf_counter()
+        renderer, lock = self.get_renderer(job["character"])
+        portrait, background = job["expression"], job["background"]
+        if portrait and portrait not in renderer.assets["portraits"]:
+            raise RequestError(400, f"角色 {job['character']} 没有立绘 {portrait}")
+        if background and background not in renderer.assets["backgrounds"]:
+            raise RequestError(400, f"角色 {job['character']} 没有背景 {background}")
+
+        with lock:
+            items = [(job["text"], portrait, background, job["speaker"])]
+            _, image = next(renderer.render_many(items))
+            # band 模式下输出缓冲会被同角色的下一次渲染覆盖，编码前复制一份以便尽早释放锁
+            if renderer.is_shared_output(image):  # type: ignore[arg-type]
+                image = image.copy()  # type: ignore[union-attr]
+        rendered = time.perf_counter()
+
+        pil_format, _, options = OUTPUT_FORMATS[job["format"]]
+        data = _encode_image(image, pil_format, **options)  # type: ignore[arg-type]
+        done = time.perf_counter()
+
+        self._latency["queue"].add((started - submitted) * 1000)
+        self._latency["render"].add((rendered - started) * 1000)
+        self._latency["encode"].add((done - rendered) * 1000)
+        self._latency["total"].add((done - submitted) * 1000)
+        with self._stats_lock:
+            self._counters["rendered"] += 1
+            self._per_character[job["character"]] = self._per_character.get(job["character"], 0) + 1
+        return data, _CONTENT_TYPES[pil_format]
+
+    def _count(self, key: str, delta: int = 1) -> None:
+        with self._stats_lock:
+            self._counters[key] += delta
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            counters = dict(self._counters)
+            per_character = dict(self._per_character)
+        stats: Dict[str, Any] = {
+            "uptime_s": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            **counters,
+            "latency_ms": {stage: window.summary() for stage, window in self._latency.items()},
+            "characters": {
+                char_id: {"rendered": per_character.get(char_id, 0), "cache": renderer.cache_stats()}
+                for char_id, renderer in list(self._renderers.items())
+            },
+        }
+        if PROFILER.enabled:
+            # render.profiling 开启时附带渲染器内部各阶段的耗时
+            stats["stages"] = PROFILER.summary()
+        return stats
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "GalGameRender/1.0"
+    protocol_version = "HTTP/1.1"
+    service: RenderService
+    verbose = False
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == "/stats":
+            self._send_json(200, self.service.stats())
+        elif path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"未知路径 {path}"})
+
+    def do_POST(self) -> None:
+        # 未读完请求体就返回时必须断开连接，否则剩余字节会被当成下一个请求解析
+        path = urlsplit(self.path).path
+        if path != "/render":
+            self._reject(404, f"未知路径 {path}")
+            return
+        if "Transfer-Encoding" in self.headers:
+            self._reject(411, "不支持分块传输，请提供 Content-Length")
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_REQUEST_BYTES:
+            self._reject(413, "请求体过大或 Content-Length 无效")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "请求体不是有效的 JSON"})
+            return
+
+        try:
+            data, content_type = self.service.render(payload)
+        except ServiceBusy as exc:
+            self._send_json(503, {"error": str(exc)}, {"Retry-After": "1"})
+            return
+        except RequestError as exc:
+            self._send_json(exc.status, {"error": str(exc)})
+            return
+        self._send(200, data, content_type)
+
+    def _reject(self, status: int, message: str) -> None:
+        """Reply with an error without reading the request body, then close the connection."""
+        self.close_connection = True
+        self._send_json(status, {"error": message}, {"Connection": "close"})
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self._send(status, data, "application/json; charset=utf-8", headers)
+
+    def _send(self, status: int, data: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # Unix socket 的 client_address 是空字符串
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+if UNIX_SOCKET_SUPPORTED:
+    class RenderUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):  # type: ignore[name-defined]
+        daemon_threads = True
+
+
+def create_server(
+    service: RenderService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_path: Optional[str] = None,
+    verbose: bool = False,
+) -> socketserver.BaseServer:
+    """
+    HTTP server bound to host:port, or to a Unix socket when unix_path is given.
+    Raises ValueError for unix_path on platforms without Unix sockets.
+    """
+    if unix_path and not UNIX_SOCKET_SUPPORTED:
+        raise ValueError("当前平台不支持 Unix socket，请改用 --host / --port")
+    handler = type("Handler", (RenderRequestHandler,), {"service": service, "verbose": verbose})
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.unlink(unix_path)
+        return RenderUnixServer(unix_path, handler)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="监听 Unix socket 路径（指定后忽略 host/port）")
+    parser.add_argument("--workers", type=int, default=None, help="渲染线程数（默认 min(4, CPU 核心数)）")
+    parser.add_argument("--queue", type=int, default=32, help="排队请求上限，超出时返回 503")
+    parser.add_argument("--preload", default="", help="启动时预加载的角色，逗号分隔")
+    parser.add_argument("--assets", default="assets", help="素材根目录")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求的访问日志")
+    args = parser.parse_args(argv)
+    if args.unix and not UNIX_SOCKET_SUPPORTED:
+        print("❌ 当前平台不支持 Unix socket（--unix），请改用 --host / --port")
+        return 1
+
+    service = RenderService(args.assets, args.workers, args.queue)
+    service.preload([c.strip() for c in args.preload.split(",") if c.strip()])
+    server = create_server(service, args.host, args.port, args.unix, args.verbose)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"🚀 渲染服务已启动: {where}（{service.workers} 个渲染线程，队列 {service.queue_size}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 渲染服务已停止")
+    finally:
+        server.server_close()
+        service.shutdown()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+# core/text_layout.py
+
+from bisect import bisect_right
+from typing import Dict, List, Tuple, Union
+
+from PIL import ImageFont
+
+from .lru import LRUCache
+
+FontType = Union[ImageFont.FreeTypeFont, ImageFont.ImageFont]
+
+# 宽度统一使用 FreeType 的 26.6 定点数（1/64 像素），避免浮点误差
+_UNITS = 64
+
+
+class _FontMetrics:
+    """Per-font advance / kerning tables, each entry measured only once."""
+
+    def __init__(self, font: FontType):
+        self.font = font
+        self.advances: Dict[str, int] = {}
+        self.kerning: Dict[Tuple[str, str], int] = {}
+
+    def _measure(self, text: str) -> int:
+        return int(round(self.font.getlength(text) * _UNITS))
+
+    def advance(self, ch: str) -> int:
+        value = self.advances.get(ch)
+        if value is None:
+            value = self._measure(ch)
+            self.advances[ch] = value
+        return value
+
+    def kern(self, left: str, right: str) -> int:
+        pair = (left, right)
+        value = self.kerning.get(pair)
+        if value is None:
+            value = self._measure(left + right) - self.advance(left) - self.advance(right)
+            self.kerning[pair] = value
+        return value
+
+
+class TextWrapper:
+    """
+    Greedy per-character line wrapper.
+    Builds cumulative glyph widths once per paragraph and finds break points by
+    binary search; results match the legacy ``draw.textlength(current + ch)`` loop.
+    """
+
+    def __init__(self, cache_size: int = 256):
+        self._metrics: Dict[FontType, _FontMetrics] = {}
+        self._results = LRUCache(cache_size)
+
+    def metrics(self, font: FontType) -> _FontMetrics:
+        metrics = self._metrics.get(font)
+        if metrics is None:
+            metrics = _FontMetrics(font)
+            self._metrics[font] = metrics
+        return metrics
+
+    def prefix_widths(self, text: str, font: FontType) -> Tuple[List[int], List[int], bool]:
+        """
+        Return ``(prefix, kern_in, monotonic)`` in 1/64 px units.
+        ``prefix[k]`` sums advances of ``text[:k]`` plus the kerning between them;
+        ``kern_in[k]`` is the kerning between ``text[k-1]`` and ``text[k]``.
+        """
+        # FontChain：每个字符用各自的回退字体测量，字距只在同一字体的相邻字符间生效
+        route = getattr(font, "font_for", None)
+        metrics = self.metrics(font) if route is None else None
+        prev_metrics = None
+        prefix = [0] * (len(text) + 1)
+        kern_in = [0] * (len(text) + 1)
+        monotonic = True
+        total = 0
+        prev = ""
+        for idx, ch in enumerate(text):
+            if route is not None:
+                metrics = self.metrics(route(ch))
+            step = metrics.advance(ch)  # type: ignore[union-attr]
+            if idx and (route is None or metrics is prev_metrics):
+                kern = metrics.kern(prev, ch)  # type: ignore[union-attr]
+                kern_in[idx] = kern
+                step += kern
+            if step < 0:
+                monotonic = False
+            total += step
+            prefix[idx + 1] = total
+            prev = ch
+            prev_metrics = metrics
+        return prefix, kern_in, monotonic
+
+    def wrap(self, text: str, font: FontType, max_width: Union[int, float]) -> List[str]:
+        cache_key = (text, font, max_width)
+        cached = self._results.get(cache_key)
+        if cached is not None:
+            return list(cached)
+
+        limit = int(max_width * _UNITS)
+        lines: List[str] = []
+        paragraphs = text.split("\n") if text else [""]
+        for para in paragraphs:
+            if not para:
+                lines.append("")
+                continue
+            lines.extend(self._wrap_paragraph(para, font, limit))
+
+        self._results.put(cache_key, tuple(lines))
+        return lines
+
+    def _wrap_paragraph(self, para: str, font: FontType, limit: int) -> List[str]:
+        prefix, kern_in, monotonic = self.prefix_widths(para, font)
+        n = len(para)
+        lines: List[str] = []
+
+        # 与旧实现保持一致：段首单字就超宽时会先输出一个空行
+        if prefix[1] > limit:
+            lines.append("")
+
+        start = 0
+        while start < n:
+            # 每行至少放入一个字符；width(start, j) = prefix[j] - prefix[start] - kern_in[start]
+            threshold = limit + prefix[start] + kern_in[start]
+            if monotonic:
+                end = bisect_right(prefix, threshold, start + 1) - 1
+            else:
+                end = start + 1
+                while end < n and prefix[end + 1] <= threshold:
+                    end += 1
+            end = max(end, start + 1)
+            lines.append(para[start:end])
+            start = end
+        return lines
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "fonts": len(self._metrics),
+            "results": self._results.stats(),
+        }
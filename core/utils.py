@@ -17,8 +17,30 @@ DEFAULT_CANVAS_SIZE: Tuple[int, int] = (2560, 1440)
 
 DEFAULT_RENDER_CONFIG: Dict[str, Any] = {
     "cache_format": "jpeg",
+    "cache_mode": "prebuild",
     "jpeg_quality": 90,
     "use_memory_canvas_cache": True,
+    "memo_cache_entries": 16,
+    "memo_cache_disk": False,
+    "memo_cache_mb": 64,
+    "compositing": "full",
+    "asset_cache_entries": 8,
+    "canvas_cache_mb": 512,
+    "canvas_cache_compress": False,
+    "typewriter_format": "gif",
+    "typewriter_frame_ms": 50,
+    "typewriter_max_frames": 60,
+    "typewriter_hold_ms": 1500,
+    "bake_name_layers": False,
+    "prebuild_jobs": 0,
+    "profiling": False,
+    "profiling_window": 512,
+    "profiling_output": "logs/render_profile.json",
+    "output_profile": "",
+    "output_profiles": {
+        "qq": {"max_width": 1280},
+        "discord": {"max_width": 1600},
+    },
 }
 
 DEFAULT_TEXT_WRAPPER: Dict[str, Any] = {
@@ -241,13 +263,113 @@ def normalize_style(style: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
     else:
         normalized["advanced"]["name_layers"] = {}
 
+    # 回退字体：主字体缺字时按顺序查找（可写单个文件名或列表）
+    fallback_fonts = src.get("fallback_fonts")
+    if isinstance(fallback_fonts, str):
+        fallback_fonts = [fallback_fonts]
+    if isinstance(fallback_fonts, list):
+        normalized["fallback_fonts"] = [f for f in fallback_fonts if isinstance(f, str) and f.strip()]
+
     for extra_key, extra_value in src.items():
-        if extra_key not in {"mode", "text_wrapper", "basic", "advanced"}:
+        if extra_key not in {"mode", "text_wrapper", "basic", "advanced", "fallback_fonts"}:
             normalized[extra_key] = extra_value
 
     return normalized
 
 
+def resolve_crop_box(
+    layout: Mapping[str, Any],
+    canvas_size: Tuple[int, int],
+) -> Optional[Tuple[int, int, int, int]]:
+    """Return the clamped crop box when layout.enable_crop is set, else None."""
+    if not layout.get("enable_crop", False):
+        return None
+    crop_area = layout.get("crop_area")
+    if not crop_area or not isinstance(crop_area, (list, tuple)) or len(crop_area) != 4:
+        return None
+
+    canvas_w, canvas_h = canvas_size
+    x1, y1, x2, y2 = [int(v) for v in crop_area]
+    x1 = max(0, min(x1, canvas_w))
+    y1 = max(0, min(y1, canvas_h))
+    x2 = max(x1, min(x2, canvas_w))
+    y2 = max(y1, min(y2, canvas_h))
+    if x2 > x1 and y2 > y1:
+        return x1, y1, x2, y2
+    return None
+
+
+def crop_cache_dirname(crop_box: Tuple[int, int, int, int]) -> str:
+    """Sub-directory (under assets/cache/<char>/_crop) holding pre-cropped bases."""
+    return "_".join(str(v) for v in crop_box)
+
+
+def load_output_profiles(render: Mapping[str, Any]) -> Dict[str, Dict[str, int]]:
+    """Valid entries of render.output_profiles: name -> {max_width, max_height} (either may be absent)."""
+    raw = render.get("output_profiles")
+    profiles: Dict[str, Dict[str, int]] = {}
+    if not isinstance(raw, Mapping):
+        return profiles
+    for name, spec in raw.items():
+        if not isinstance(spec, Mapping):
+            continue
+        limits = {
+            key: int(spec[key])
+            for key in ("max_width", "max_height")
+            if isinstance(spec.get(key), (int, float)) and int(spec[key]) > 0
+        }
+        if limits:
+            profiles[str(name)] = limits
+    return profiles
+
+
+def output_profile_size(canvas_size: Tuple[int, int], profile: Mapping[str, int]) -> Tuple[int, int]:
+    """Canvas size under an output profile: scaled down to fit max_width / max_height, never up."""
+    canvas_w, canvas_h = canvas_size
+    scale = 1.0
+    if profile.get("max_width"):
+        scale = min(scale, profile["max_width"] / canvas_w)
+    if profile.get("max_height"):
+        scale = min(scale, profile["max_height"] / canvas_h)
+    if scale >= 1.0:
+        return canvas_w, canvas_h
+    return max(1, int(round(canvas_w * scale))), max(1, int(round(canvas_h * scale)))
+
+
+def profile_cache_dirname(canvas_size: Tuple[int, int]) -> str:
+    """Sub-directory (under assets/cache/<char>/_profiles) holding bases prescaled to canvas_size."""
+    return f"{canvas_size[0]}x{canvas_size[1]}"
+
+
+def scale_style(style: Mapping[str, Any], scale: float) -> Dict[str, Any]:
+    """Copy of a normalized style with font sizes and name layer offsets multiplied by scale."""
+    scaled: Dict[str, Any] = deepcopy(dict(style))
+
+    def size(value: Any) -> Any:
+        return max(1, int(round(value * scale))) if isinstance(value, (int, float)) else value
+
+    basic = scaled.get("basic")
+    if isinstance(basic, dict):
+        for key in ("font_size", "name_font_size"):
+            if key in basic:
+                basic[key] = size(basic[key])
+
+    layers_map = (scaled.get("advanced") or {}).get("name_layers")
+    if isinstance(layers_map, dict):
+        for layers in layers_map.values():
+            for layer in layers if isinstance(layers, list) else []:
+                if not isinstance(layer, dict):
+                    continue
+                if "font_size" in layer:
+                    layer["font_size"] = size(layer["font_size"])
+                position = layer.get("position")
+                if isinstance(position, (list, tuple)) and len(position) == 2:
+                    layer["position"] = [
+                        v * scale if isinstance(v, (int, float)) else v for v in position
+                    ]
+    return scaled
+
+
 def _ensure_dict(config: Dict[str, Any], key: str, fallback: Dict[str, Any]) -> None:
     if key not in config or not isinstance(config[key], dict):
         config[key] = dict(fallback)
@@ -29,7 +29,6 @@ class PrebuildWorker(QThread):
                 self.char_id,
                 self.base_path,
                 self.cache_dir,
-                force=True,
                 progress=self._report,
             )
             self.finished_ok.emit()